@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request waited longer than its lane allows and was shed
+    """
+
+    def __init__(self, lane: str, waited: float):
+        super().__init__(f"{lane} lane overloaded after waiting {waited:.2f}s")
+        self.lane = lane
+        self.waited = waited
+
+
+class Lane:
+    """
+    A priority lane: its share of capacity, concurrency cap and queue-time budget
+    """
+
+    def __init__(self, name: str, weight: float = 1.0, concurrency: int = 4, max_queue_time: float = 1.0):
+        self.name = name
+        self.weight = weight
+        self.concurrency = concurrency
+        self.max_queue_time = max_queue_time
+        self.queue: deque = deque()
+        self.active = 0
+        self.admitted = 0
+        self.shed = 0
+        self.pass_value = 0.0
+
+
+class _Ticket:
+    __slots__ = ('lane', 'granted')
+
+    def __init__(self, lane: Lane):
+        self.lane = lane
+        self.granted = False
+
+
+class LaneScheduler:
+    """
+    Weighted fair admission of work from several priority lanes
+
+    At most capacity requests run at once, and each lane at most its own
+    concurrency. When a slot frees up it goes to the waiting lane that has
+    received the least service relative to its weight (stride scheduling),
+    so a lane with weight 4 gets four slots for every one a weight-1 lane
+    gets while both are busy, and an idle lane's capacity is used by the
+    others. A request still queued after its lane's max_queue_time is shed
+    with Overloaded instead of adding to everyone's latency.
+    """
+
+    def __init__(self, lanes: Iterable[Lane], capacity: int = 8):
+        self.lanes: Dict[str, Lane] = {lane.name: lane for lane in lanes}
+        self.capacity = capacity
+        self.running = 0
+        self._virtual_time = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, name: str):
+        """
+        Block until the lane is granted a slot, or raise Overloaded
+        """
+        lane = self.lanes[name]
+        ticket = _Ticket(lane)
+        start = time.monotonic()
+        deadline = start + lane.max_queue_time
+        with self._cond:
+            if not lane.queue:
+                # An idle lane does not bank credit while it has nothing queued
+                lane.pass_value = max(lane.pass_value, self._virtual_time)
+            lane.queue.append(ticket)
+            self._dispatch()
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    lane.queue.remove(ticket)
+                    lane.shed += 1
+                    raise Overloaded(name, time.monotonic() - start)
+                self._cond.wait(remaining)
+
+    def release(self, name: str):
+        with self._cond:
+            self.lanes[name].active -= 1
+            self.running -= 1
+            self._dispatch()
+
+    @contextmanager
+    def admit(self, name: str) -> Iterator[None]:
+        """
+        Run the body of a with-block holding a slot in the named lane
+        """
+        self.acquire(name)
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    def _dispatch(self):
+        granted = False
+        while self.running < self.capacity:
+            eligible = [lane for lane in self.lanes.values() if lane.queue and lane.active < lane.concurrency]
+            if not eligible:
+                break
+            lane = min(eligible, key=lambda lane: lane.pass_value)
+            ticket = lane.queue.popleft()
+            ticket.granted = True
+            self._virtual_time = lane.pass_value
+            lane.pass_value += 1.0 / lane.weight
+            lane.active += 1
+            lane.admitted += 1
+            self.running += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def status(self) -> Dict[str, Dict[str, float]]:
+        """
+        Current queue depth, running requests and totals per lane
+        """
+        with self._cond:
+            return {
+                lane.name: {
+                    'queued': len(lane.queue),
+                    'active': lane.active,
+                    'admitted': lane.admitted,
+                    'shed': lane.shed
+                }
+                for lane in self.lanes.values()
+            }
+
+
+def default_lanes() -> LaneScheduler:
+    """
+    Scheduler with an interactive lane for the browser UI and a bulk lane
+    for API clients
+
+    Interactive requests get four times the bulk share and shed after half
+    a second in the queue; bulk requests may queue for up to ten seconds
+    but never hold more than half the capacity.
+    """
+    return LaneScheduler([
+        Lane('interactive', weight=4.0, concurrency=8, max_queue_time=0.5),
+        Lane('bulk', weight=1.0, concurrency=4, max_queue_time=10.0)
+    ], capacity=8)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the agent's hot paths, with baseline regression checks
+
+Covers parsing canned DuckDuckGo payloads (directly and through search_web
+against a local stub upstream), generate_response formatting,
+send_json_response serialisation and full handler round-trips.
+
+Run from the repository root:
+    python -m benchmarks.hot_paths --save benchmarks/baseline.json
+    python -m benchmarks.hot_paths --compare benchmarks/baseline.json
+
+Comparison applies a one-sided Mann-Whitney U test to the per-operation
+samples and exits non-zero when a benchmark is slower than its baseline
+with p < alpha and by more than min-change.
+"""
+import argparse
+import io
+import json
+import math
+import platform
+import statistics
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from ddg_parser import parse_instant_answer
+from search_result import SearchResult
+from web_search_agent import WebSearchAgent
+from web_server import WebSearchHandler
+
+# Related topics per canned payload: roughly 3 KB, 60 KB and 1.5 MB of JSON
+PAYLOAD_TOPICS = {'small': 10, 'medium': 200, 'large': 5000}
+
+
+def canned_payload(topics: int) -> bytes:
+    """
+    A DuckDuckGo-shaped response with the abstract last, so a parse has to
+    skip over every related topic before it can finish
+    """
+    related = []
+    for i in range(topics):
+        topic = {
+            'FirstURL': f"https://duckduckgo.com/Topic_{i}",
+            'Icon': {'Height': '', 'URL': f"/i/{i}.png", 'Width': ''},
+            'Result': f"<a href=\"https://duckduckgo.com/Topic_{i}\">Topic {i}</a> - a related subject",
+            'Text': f"Topic {i} - a related subject with a one-line \"description\" from the API"
+        }
+        if i % 10 == 9:
+            related.append({'Name': f"Group {i}", 'Topics': [topic, dict(topic, FirstURL=topic['FirstURL'] + '_b')]})
+        else:
+            related.append(topic)
+    return json.dumps({
+        'Heading': 'Python',
+        'RelatedTopics': related,
+        'AbstractText': 'Python (programming language)',
+        'AbstractURL': 'https://en.wikipedia.org/wiki/Python_(programming_language)',
+        'Abstract': 'Python is a high-level, general-purpose programming language.'
+    }).encode()
+
+
+class StubUpstream(BaseHTTPRequestHandler):
+    """Serves canned payloads; the query picks the size"""
+
+    protocol_version = 'HTTP/1.1'
+    payloads = {name: canned_payload(topics) for name, topics in PAYLOAD_TOPICS.items()}
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query).get('q', ['small'])[0]
+        body = self.payloads.get(query.split()[0], self.payloads['small'])
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-javascript')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietHandler(WebSearchHandler):
+    """The server's handler without per-request logging to stdout"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve(handler) -> ThreadingHTTPServer:
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def _sample(func: Callable[[], object], number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - start
+
+
+def calibrate(func: Callable[[], object], min_time: float = 0.02) -> int:
+    """
+    Number of calls per sample needed for a sample to last at least
+    min_time, keeping timer resolution out of the results
+    """
+    number = 1
+    while True:
+        elapsed = _sample(func, number)
+        if elapsed >= min_time:
+            return number
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+
+
+@contextmanager
+def benchmarks() -> Iterator[Dict[str, Callable[[], object]]]:
+    """
+    Build the benchmark callables, running the local stub servers they need
+    until the with block exits
+    """
+    upstream = _serve(StubUpstream)
+    server = _serve(QuietHandler)
+    try:
+        yield _cases(upstream.server_address[1], server.server_address[1])
+    finally:
+        for httpd in (server, upstream):
+            httpd.shutdown()
+            httpd.server_close()
+        QuietHandler.set_agent(None)
+
+
+def _cases(upstream_port: int, server_port: int) -> Dict[str, Callable[[], object]]:
+    agent = WebSearchAgent()
+    agent.api_url = f"http://127.0.0.1:{upstream_port}/"
+    QuietHandler.set_agent(agent)
+
+    cases: Dict[str, Callable[[], object]] = {}
+    for name, body in StubUpstream.payloads.items():
+        chunks = [body[i:i + 16384] for i in range(0, len(body), 16384)]
+        cases[f'parse_instant_answer.{name}'] = lambda chunks=chunks: parse_instant_answer(iter(chunks))
+        cases[f'search_web.{name}'] = lambda name=name: agent.search_web(f"{name} python")
+
+    results = [SearchResult(f"Result {i}", "Python is a high-level programming language. " * 20,
+                            f"https://example.com/{i}") for i in range(5)]
+    cases['generate_response'] = lambda: agent.generate_response("What is Python?", results)
+
+    handler = QuietHandler.__new__(QuietHandler)
+    handler.request_version = 'HTTP/1.0'
+    handler.command = 'POST'
+    handler.path = '/search'
+    handler.requestline = 'POST /search HTTP/1.0'
+    handler.client_address = ('127.0.0.1', 0)
+    payload = {'results': results * 4}
+
+    def send_json_response():
+        handler.wfile = io.BytesIO()
+        handler.send_json_response(payload)
+    cases['send_json_response'] = send_json_response
+
+    def round_trip(method: str):
+        def request():
+            connection = HTTPConnection('127.0.0.1', server_port, timeout=10)
+            if method == 'POST':
+                connection.request('POST', '/search', body=json.dumps({'query': 'medium python'}),
+                                   headers={'Content-Type': 'application/json'})
+            else:
+                connection.request('GET', '/search?q=medium+python')
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            if response.status != 200:
+                raise RuntimeError(f"{method} /search returned {response.status}")
+        return request
+    cases['handler.post_search'] = round_trip('POST')
+    cases['handler.get_search'] = round_trip('GET')
+    return cases
+
+
+def mann_whitney_p(current: List[float], baseline: List[float]) -> float:
+    """
+    One-sided p-value that current samples tend to be larger than baseline
+
+    Uses the normal approximation with tie correction, which is accurate
+    enough for the 10+ samples per side a benchmark records.
+    """
+    n1, n2 = len(current), len(baseline)
+    ranked = sorted([(value, 0) for value in current] + [(value, 1) for value in baseline])
+    ranks = [0.0] * len(ranked)
+    ties = 0.0
+    i = 0
+    while i < len(ranked):
+        j = i
+        while j + 1 < len(ranked) and ranked[j + 1][0] == ranked[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        count = j - i + 1
+        ties += count ** 3 - count
+        i = j + 1
+    u = sum(rank for rank, (_, group) in zip(ranks, ranked) if group == 0) - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare(current: Dict[str, dict], baseline: Dict[str, dict], alpha: float = 0.01,
+            min_change: float = 0.1) -> List[Dict[str, object]]:
+    """
+    Compare benchmark results against a baseline, flagging regressions
+    """
+    rows = []
+    for name, result in current.items():
+        if name not in baseline:
+            rows.append({'name': name, 'median': result['median'], 'status': 'new'})
+            continue
+        base = baseline[name]
+        change = result['median'] / base['median'] - 1
+        p = mann_whitney_p(result['samples'], base['samples'])
+        status = 'REGRESSION' if p < alpha and change > min_change else 'ok'
+        rows.append({'name': name, 'median': result['median'], 'baseline': base['median'],
+                     'change': change, 'p': p, 'status': status})
+    return rows
+
+
+def run(names: Optional[List[str]] = None, repeats: int = 20) -> Dict[str, dict]:
+    """
+    Run the benchmarks and return per-call samples in seconds for each
+
+    Samples are taken in rounds, one of each benchmark per round, so a
+    burst of background load slows every benchmark a little rather than
+    one benchmark a lot.
+    """
+    with benchmarks() as all_cases:
+        cases = {name: func for name, func in all_cases.items()
+                 if not names or any(part in name for part in names)}
+        numbers = {name: calibrate(func) for name, func in cases.items()}
+        samples: Dict[str, List[float]] = {name: [] for name in cases}
+        for _ in range(repeats):
+            for name, func in cases.items():
+                samples[name].append(_sample(func, numbers[name]) / numbers[name])
+    return {
+        name: {'number': numbers[name], 'median': statistics.median(samples[name]), 'samples': samples[name]}
+        for name in cases
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark agent hot paths")
+    parser.add_argument('--save', metavar='PATH', help="write results as a new baseline")
+    parser.add_argument('--compare', metavar='PATH', help="compare against a saved baseline")
+    parser.add_argument('--filter', action='append', help="only run benchmarks whose name contains this")
+    parser.add_argument('--repeats', type=int, default=20, help="samples per benchmark")
+    parser.add_argument('--alpha', type=float, default=0.01, help="significance level for regressions")
+    parser.add_argument('--min-change', type=float, default=0.1,
+                        help="smallest slowdown (fraction of the baseline median) reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.filter, args.repeats)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'benchmarks': results}, f, indent=1)
+
+    if not args.compare:
+        for name, result in results.items():
+            print(f"{name:32s} {result['median'] * 1e6:12.1f} us")
+        return
+
+    with open(args.compare) as f:
+        baseline = json.load(f)['benchmarks']
+    rows = compare(results, baseline, args.alpha, args.min_change)
+    for row in rows:
+        if row['status'] == 'new':
+            print(f"{row['name']:32s} {row['median'] * 1e6:12.1f} us   (no baseline)")
+        else:
+            print(f"{row['name']:32s} {row['median'] * 1e6:12.1f} us   baseline {row['baseline'] * 1e6:12.1f} us"
+                  f"   {row['change']:+7.1%}   p={row['p']:.4f}   {row['status']}")
+    sys.exit(1 if any(row['status'] == 'REGRESSION' for row in rows) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Compare memory per cached result for plain dicts versus SearchResult records
+
+Run from the repository root:
+    python -m benchmarks.result_memory --count 1000000
+"""
+import argparse
+import gc
+import tracemalloc
+
+from search_result import SearchResult
+
+
+def _texts(count: int):
+    return [f"Topic {i} is a subject with a one-line description from the instant answer API" for i in range(count)]
+
+
+def measure(build, count: int, distinct_urls: int) -> int:
+    """
+    Return bytes allocated while building count results with build()
+    """
+    texts = _texts(1000)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    # URLs are rebuilt per result, as parsing a fresh upstream response does
+    results = [build(texts[i % len(texts)], f"https://duckduckgo.com/Topic_{i % distinct_urls}")
+               for i in range(count)]
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del results
+    return allocated
+
+
+def as_dict(text: str, url: str):
+    return {'title': text, 'content': text, 'source': url}
+
+
+def as_record(text: str, url: str):
+    return SearchResult(text, text, url)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure per-entry memory of cached search results")
+    parser.add_argument('--count', type=int, default=1000000, help="number of cached results")
+    parser.add_argument('--distinct-urls', type=int, default=50000, help="number of distinct source URLs")
+    args = parser.parse_args(argv)
+
+    dict_bytes = measure(as_dict, args.count, args.distinct_urls)
+    record_bytes = measure(as_record, args.count, args.distinct_urls)
+
+    print(f"results:            {args.count:,} ({args.distinct_urls:,} distinct URLs)")
+    print(f"dict per entry:     {dict_bytes / args.count:8.1f} bytes ({dict_bytes / 1e6:.1f} MB)")
+    print(f"record per entry:   {record_bytes / args.count:8.1f} bytes ({record_bytes / 1e6:.1f} MB)")
+    print(f"saving per entry:   {(dict_bytes - record_bytes) / args.count:8.1f} bytes "
+          f"({1 - record_bytes / dict_bytes:.0%})")
+
+
+if __name__ == '__main__':
+    main()
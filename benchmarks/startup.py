@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Measure cold-start import time of the agent and server modules
+
+Each module is imported in a fresh interpreter and only the import
+statement itself is timed; the median over several runs is reported.
+Exits non-zero if a module exceeds its budget or imports a dependency
+that should only be loaded on first use.
+
+Run from the repository root:
+    python -m benchmarks.startup --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+# Milliseconds allowed for importing each module into a fresh interpreter
+IMPORT_BUDGETS_MS = {
+    'web_search_agent': 100.0,
+    'web_server': 150.0,
+}
+
+# Heavy dependencies that must not be imported until they are used
+LAZY_MODULES = ('requests', 'urllib3', 'numpy', 'page_fetcher')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'elapsed': elapsed, 'modules': sorted(sys.modules)}}))
+'''
+
+
+def measure_import(module: str, runs: int = 5) -> Dict[str, object]:
+    """
+    Import module in runs fresh interpreters and return the median import
+    time in milliseconds, plus the lazy modules it loaded
+    """
+    times: List[float] = []
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', _PROBE.format(module=module)], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout
+        probe = json.loads(output)
+        times.append(probe['elapsed'] * 1000)
+        loaded.update(name for name in probe['modules'] if name.split('.')[0] in LAZY_MODULES)
+    return {'module': module, 'median_ms': statistics.median(times), 'lazy_loaded': sorted(loaded)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start import time")
+    parser.add_argument('--runs', type=int, default=10, help="fresh interpreters per module")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        result = measure_import(module, args.runs)
+        over = result['median_ms'] > budget
+        failed = failed or over or bool(result['lazy_loaded'])
+        print(f"{module:20s} {result['median_ms']:7.1f} ms (budget {budget:.0f} ms)"
+              f"{'  OVER BUDGET' if over else ''}")
+        if result['lazy_loaded']:
+            print(f"{'':20s} eagerly imported: {', '.join(result['lazy_loaded'])}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+Replay a recorded query trace through simulated caches to size the real one
+
+Usage:
+    python cache_simulator.py trace.jsonl --policies lru,lfu,arc,tinylfu \\
+        --sizes 1000,10000,100000 --ttls 0,300,3600
+
+Every configuration is fed from a single streaming pass over the trace and
+only hashed query keys are kept, so memory is bounded by the largest cache
+size rather than the trace length.
+"""
+import argparse
+import heapq
+import json
+import sys
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from query_cache import normalize_query
+from warmup import QUERY_FIELDS
+
+
+TIMESTAMP_FIELDS = ('timestamp', 'ts', 'time')
+
+# Rough bookkeeping cost of one tracked key (dict slot, key object, expiry)
+KEY_OVERHEAD_BYTES = 100
+
+
+def _parse_timestamp(value) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def read_trace(lines: Iterable[str]) -> Iterator[Tuple[float, int]]:
+    """
+    Yield (timestamp, key) pairs from trace lines
+
+    Lines may be JSON objects with a timestamp/ts/time field and a
+    query/question/q/title field, tab-separated "timestamp<TAB>query", or a
+    bare query. Records without a usable timestamp reuse the previous one.
+    """
+    now = 0.0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        query = None
+        timestamp = None
+        if line.startswith('{'):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            query = next((record[field] for field in QUERY_FIELDS if record.get(field)), None)
+            timestamp = next((_parse_timestamp(record[field]) for field in TIMESTAMP_FIELDS if field in record), None)
+        elif '\t' in line:
+            head, tail = line.split('\t', 1)
+            timestamp = _parse_timestamp(head)
+            query = tail if timestamp is not None else line
+        else:
+            query = line
+        if not isinstance(query, str) or not query.strip():
+            continue
+        if timestamp is not None:
+            now = timestamp
+        yield now, hash(normalize_query(query))
+
+
+class SimulatedCache:
+    """
+    Base class for simulated caches; subclasses implement _lookup and _insert
+    """
+
+    name = 'base'
+
+    def __init__(self, capacity: int, ttl: float = 0):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.peak_entries = 0
+
+    def access(self, key: int, now: float) -> bool:
+        """
+        Record a request for key at time now and return whether it hit
+        """
+        if self._lookup(key, now):
+            self.hits += 1
+            return True
+        self.misses += 1
+        self._insert(key, now + self.ttl if self.ttl else float('inf'), now)
+        size = len(self)
+        if size > self.peak_entries:
+            self.peak_entries = size
+        return False
+
+    def _lookup(self, key: int, now: float) -> bool:
+        raise NotImplementedError
+
+    def _insert(self, key: int, expires: float, now: float):
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def metadata_bytes(self) -> int:
+        """
+        Estimated bookkeeping memory beyond the cached values themselves
+        """
+        return self.peak_entries * KEY_OVERHEAD_BYTES
+
+    def report(self, entry_bytes: int) -> Dict[str, object]:
+        requests = self.hits + self.misses
+        return {
+            'policy': self.name,
+            'size': self.capacity,
+            'ttl': self.ttl,
+            'requests': requests,
+            'hits': self.hits,
+            'hit_ratio': self.hits / requests if requests else 0.0,
+            'upstream_calls': self.misses,
+            'peak_entries': self.peak_entries,
+            'memory_bytes': self.peak_entries * entry_bytes + self.metadata_bytes()
+        }
+
+
+class LRUCache(SimulatedCache):
+    name = 'lru'
+
+    def __init__(self, capacity: int, ttl: float = 0):
+        super().__init__(capacity, ttl)
+        self.entries: 'OrderedDict[int, float]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _lookup(self, key: int, now: float) -> bool:
+        expires = self.entries.get(key)
+        if expires is None:
+            return False
+        if expires <= now:
+            del self.entries[key]
+            return False
+        self.entries.move_to_end(key)
+        return True
+
+    def _insert(self, key: int, expires: float, now: float):
+        self.entries[key] = expires
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+
+class LFUCache(SimulatedCache):
+    """
+    O(1) LFU with per-frequency LRU buckets for tie-breaking
+
+    Frequent entries are never the least frequent, so with a ttl an expiry
+    heap lets expired entries be purged before anything live is evicted.
+    """
+
+    name = 'lfu'
+
+    def __init__(self, capacity: int, ttl: float = 0):
+        super().__init__(capacity, ttl)
+        self.entries: Dict[int, Tuple[int, float]] = {}
+        self.buckets: Dict[int, 'OrderedDict[int, None]'] = {}
+        self.min_freq = 0
+        # (expires, key); entries already dropped or reinserted are skipped when popped
+        self.expiries: List[Tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _unlink(self, key: int, freq: int):
+        bucket = self.buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[freq]
+            if self.min_freq == freq:
+                self.min_freq = freq + 1
+
+    def _lookup(self, key: int, now: float) -> bool:
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+        freq, expires = entry
+        self._unlink(key, freq)
+        if expires <= now:
+            del self.entries[key]
+            if self.entries and self.min_freq not in self.buckets:
+                self.min_freq = min(self.buckets)
+            return False
+        self.entries[key] = (freq + 1, expires)
+        self.buckets.setdefault(freq + 1, OrderedDict())[key] = None
+        return True
+
+    def _purge(self, now: float):
+        expiries = self.expiries
+        while expiries and expiries[0][0] <= now:
+            expires, key = heapq.heappop(expiries)
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] == expires:
+                self._unlink(key, entry[0])
+                del self.entries[key]
+        if self.buckets:
+            self.min_freq = min(self.buckets)
+
+    def _insert(self, key: int, expires: float, now: float):
+        if self.expiries and (len(self.entries) >= self.capacity or len(self.expiries) > 2 * self.capacity):
+            self._purge(now)
+        if len(self.entries) >= self.capacity:
+            victim, _ = self.buckets[self.min_freq].popitem(last=False)
+            if not self.buckets[self.min_freq]:
+                del self.buckets[self.min_freq]
+            del self.entries[victim]
+        self.entries[key] = (1, expires)
+        self.buckets.setdefault(1, OrderedDict())[key] = None
+        self.min_freq = 1
+        if self.ttl:
+            heapq.heappush(self.expiries, (expires, key))
+
+
+class ARCCache(SimulatedCache):
+    """
+    Adaptive Replacement Cache (Megiddo & Modha) with ghost lists
+    """
+
+    name = 'arc'
+
+    def __init__(self, capacity: int, ttl: float = 0):
+        super().__init__(capacity, ttl)
+        self.t1: 'OrderedDict[int, float]' = OrderedDict()
+        self.t2: 'OrderedDict[int, float]' = OrderedDict()
+        self.b1: 'OrderedDict[int, None]' = OrderedDict()
+        self.b2: 'OrderedDict[int, None]' = OrderedDict()
+        self.p = 0
+
+    def __len__(self) -> int:
+        return len(self.t1) + len(self.t2)
+
+    def metadata_bytes(self) -> int:
+        # Ghost lists track up to another capacity's worth of keys
+        return (self.peak_entries + self.capacity) * KEY_OVERHEAD_BYTES
+
+    def _lookup(self, key: int, now: float) -> bool:
+        for resident in (self.t1, self.t2):
+            expires = resident.get(key)
+            if expires is None:
+                continue
+            del resident[key]
+            if expires <= now:
+                return False
+            self.t2[key] = expires
+            return True
+        return False
+
+    def _replace(self, in_b2: bool):
+        if self.t1 and (len(self.t1) > self.p or (in_b2 and len(self.t1) == self.p)):
+            victim, _ = self.t1.popitem(last=False)
+            self.b1[victim] = None
+        elif self.t2:
+            victim, _ = self.t2.popitem(last=False)
+            self.b2[victim] = None
+        else:
+            victim, _ = self.t1.popitem(last=False)
+            self.b1[victim] = None
+
+    def _insert(self, key: int, expires: float, now: float):
+        c = self.capacity
+        if key in self.b1:
+            self.p = min(c, self.p + max(len(self.b2) // len(self.b1), 1))
+            del self.b1[key]
+            if len(self) >= c:
+                self._replace(False)
+            self.t2[key] = expires
+            return
+        if key in self.b2:
+            self.p = max(0, self.p - max(len(self.b1) // len(self.b2), 1))
+            del self.b2[key]
+            if len(self) >= c:
+                self._replace(True)
+            self.t2[key] = expires
+            return
+
+        l1 = len(self.t1) + len(self.b1)
+        if l1 >= c:
+            if len(self.t1) < c:
+                self.b1.popitem(last=False)
+                if len(self) >= c:
+                    self._replace(False)
+            else:
+                self.t1.popitem(last=False)
+        elif l1 + len(self.t2) + len(self.b2) >= c:
+            if l1 + len(self.t2) + len(self.b2) >= 2 * c:
+                self.b2.popitem(last=False)
+            if len(self) >= c:
+                self._replace(False)
+        self.t1[key] = expires
+
+
+class CountMinSketch:
+    """
+    4-row count-min sketch of small saturating counters with periodic halving
+    """
+
+    def __init__(self, width: int, sample_size: int, max_count: int = 15):
+        self.width = max(width, 16)
+        self.rows = [[0] * self.width for _ in range(4)]
+        self.sample_size = sample_size
+        self.max_count = max_count
+        self.additions = 0
+
+    def _indexes(self, key: int):
+        h = key & 0xFFFFFFFFFFFFFFFF
+        for i in range(4):
+            h = (h * 0x9E3779B97F4A7C15 + i) & 0xFFFFFFFFFFFFFFFF
+            yield i, (h >> 32) % self.width
+
+    def add(self, key: int):
+        for i, j in self._indexes(key):
+            if self.rows[i][j] < self.max_count:
+                self.rows[i][j] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.rows = [[count >> 1 for count in row] for row in self.rows]
+            self.additions //= 2
+
+    def estimate(self, key: int) -> int:
+        return min(self.rows[i][j] for i, j in self._indexes(key))
+
+    def memory_bytes(self) -> int:
+        # Real implementations pack 4-bit counters
+        return 4 * self.width // 2
+
+
+class WTinyLFUCache(SimulatedCache):
+    """
+    Window TinyLFU (Einziger et al.): a 1% LRU window in front of a segmented
+    LRU main cache, with a count-min sketch deciding main-cache admission
+    """
+
+    name = 'tinylfu'
+
+    def __init__(self, capacity: int, ttl: float = 0):
+        super().__init__(capacity, ttl)
+        self.window_capacity = max(1, capacity // 100)
+        self.main_capacity = max(1, capacity - self.window_capacity)
+        self.protected_capacity = int(self.main_capacity * 0.8)
+        self.window: 'OrderedDict[int, float]' = OrderedDict()
+        self.probation: 'OrderedDict[int, float]' = OrderedDict()
+        self.protected: 'OrderedDict[int, float]' = OrderedDict()
+        self.sketch = CountMinSketch(capacity, sample_size=10 * capacity)
+
+    def __len__(self) -> int:
+        return len(self.window) + len(self.probation) + len(self.protected)
+
+    def metadata_bytes(self) -> int:
+        return super().metadata_bytes() + self.sketch.memory_bytes()
+
+    def access(self, key: int, now: float) -> bool:
+        self.sketch.add(key)
+        return super().access(key, now)
+
+    def _lookup(self, key: int, now: float) -> bool:
+        for segment in (self.window, self.probation, self.protected):
+            expires = segment.get(key)
+            if expires is None:
+                continue
+            if expires <= now:
+                del segment[key]
+                return False
+            if segment is self.window:
+                segment.move_to_end(key)
+            elif segment is self.probation:
+                del segment[key]
+                self.protected[key] = expires
+                if len(self.protected) > self.protected_capacity:
+                    demoted, demoted_expires = self.protected.popitem(last=False)
+                    self.probation[demoted] = demoted_expires
+            else:
+                segment.move_to_end(key)
+            return True
+        return False
+
+    def _insert(self, key: int, expires: float, now: float):
+        self.window[key] = expires
+        if len(self.window) <= self.window_capacity:
+            return
+        candidate, candidate_expires = self.window.popitem(last=False)
+        if len(self.probation) + len(self.protected) < self.main_capacity:
+            self.probation[candidate] = candidate_expires
+            return
+        victims = self.probation or self.protected
+        victim = next(iter(victims))
+        if self.sketch.estimate(candidate) > self.sketch.estimate(victim):
+            del victims[victim]
+            self.probation[candidate] = candidate_expires
+
+
+POLICIES = {
+    'lru': LRUCache,
+    'lfu': LFUCache,
+    'arc': ARCCache,
+    'tinylfu': WTinyLFUCache,
+}
+
+
+def simulate(events: Iterable[Tuple[float, int]], policies: List[str], sizes: List[int],
+             ttls: List[float], entry_bytes: int = 2500) -> List[Dict[str, object]]:
+    """
+    Replay events through every policy/size/TTL combination in one pass
+    """
+    caches = [POLICIES[policy](size, ttl) for policy in policies for size in sizes for ttl in ttls]
+    for now, key in events:
+        for cache in caches:
+            cache.access(key, now)
+    return [cache.report(entry_bytes) for cache in caches]
+
+
+def format_report(rows: List[Dict[str, object]]) -> str:
+    """
+    Render simulation results as a fixed-width table
+    """
+    lines = [f"{'policy':<8} {'size':>10} {'ttl':>8} {'hit ratio':>10} {'upstream':>12} {'memory MB':>10}"]
+    for row in rows:
+        lines.append(
+            f"{row['policy']:<8} {row['size']:>10} {row['ttl']:>8g} {row['hit_ratio']:>10.2%} "
+            f"{row['upstream_calls']:>12} {row['memory_bytes'] / 1e6:>10.1f}"
+        )
+    return '\n'.join(lines)
+
+
+def _number_list(value: str, cast):
+    return [cast(item) for item in value.split(',') if item]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a query trace through simulated caches")
+    parser.add_argument('trace', help="trace file (JSONL, 'timestamp<TAB>query' or one query per line); - for stdin")
+    parser.add_argument('--policies', default='lru,lfu,arc,tinylfu',
+                        help=f"comma-separated policies from: {', '.join(POLICIES)}")
+    parser.add_argument('--sizes', default='1000,10000,100000', help="comma-separated cache sizes in entries")
+    parser.add_argument('--ttls', default='0', help="comma-separated TTLs in seconds (0 means no expiry)")
+    parser.add_argument('--entry-bytes', type=int, default=2500, help="estimated memory per cached result list")
+    parser.add_argument('--json', action='store_true', help="print results as JSON lines")
+    args = parser.parse_args(argv)
+
+    sizes = _number_list(args.sizes, int)
+    if not sizes or min(sizes) < 1:
+        parser.error("--sizes must be positive integers")
+    ttls = _number_list(args.ttls, float)
+    if not ttls or min(ttls) < 0:
+        parser.error("--ttls must not be negative")
+    policies = _number_list(args.policies, str)
+    unknown = [policy for policy in policies if policy not in POLICIES]
+    if unknown:
+        parser.error(f"unknown policies: {', '.join(unknown)}")
+
+    trace = sys.stdin if args.trace == '-' else open(args.trace, 'r')
+    try:
+        rows = simulate(read_trace(trace), policies, sizes, ttls, args.entry_bytes)
+    finally:
+        if trace is not sys.stdin:
+            trace.close()
+
+    if args.json:
+        for row in rows:
+            print(json.dumps(row))
+    else:
+        print(format_report(rows))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+import codecs
+import json
+import re
+from typing import Iterable, Iterator, List, Optional
+
+from search_result import SearchResult
+
+
+MAX_RESPONSE_BYTES = 2 * 1024 * 1024
+
+# Consumed input is dropped from the buffer once it grows past this
+COMPACT_THRESHOLD = 64 * 1024
+
+WHITESPACE = ' \t\n\r'
+# A string token (and its continuation after a refill); group 1 is empty
+# when the closing quote is not yet buffered
+STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*(")?', re.S)
+STRING_TAIL = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*(")?', re.S)
+STRUCTURAL = re.compile(r'[\[\]{}"]')
+SCALAR_END = re.compile(r'[\s,\]}]')
+
+_decoder = json.JSONDecoder()
+
+
+class TruncatedResponse(ValueError):
+    """The byte cap was reached before any result could be extracted"""
+
+
+class _Truncated(Exception):
+    """The byte cap was reached in the middle of a value"""
+
+
+class _Enough(Exception):
+    """Enough results have been extracted"""
+
+
+class _JSONStream:
+    """
+    Pull-based JSON reader over a stream of byte chunks
+
+    Values the caller wants are decoded with the stdlib decoder once they
+    are complete in the buffer; everything else is skipped by scanning for
+    structural characters, without building Python objects.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], max_bytes: int):
+        self.chunks: Iterator[bytes] = iter(chunks)
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        self.exhausted = False
+        self.capped = False
+        self.buf = ''
+        self.pos = 0
+        self._text = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def _fill(self) -> bool:
+        if self.exhausted:
+            return False
+        if self.pos > COMPACT_THRESHOLD:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        for chunk in self.chunks:
+            if not chunk:
+                continue
+            remaining = self.max_bytes - self.bytes_read
+            if len(chunk) >= remaining:
+                chunk = chunk[:remaining]
+                self.exhausted = True
+                self.capped = True
+            self.bytes_read += len(chunk)
+            self.buf += self._text.decode(chunk, final=self.exhausted)
+            return True
+        self.exhausted = True
+        self.buf += self._text.decode(b'', final=True)
+        return True
+
+    def _end_of_input(self) -> Exception:
+        if self.capped:
+            return _Truncated()
+        return ValueError("incomplete JSON body")
+
+    def _require(self):
+        while self.pos >= len(self.buf):
+            if not self._fill():
+                raise self._end_of_input()
+
+    def peek(self) -> str:
+        """
+        Skip whitespace and return the next character without consuming it
+        """
+        while True:
+            self._require()
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def read_value(self):
+        """
+        Decode the next complete value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    if self.capped:
+                        raise _Truncated()
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buf) and not self.exhausted and not isinstance(value, (str, dict, list)):
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+    def skip_value(self):
+        """
+        Advance past the next value without decoding it
+        """
+        first = self.peek()
+        if first == '"':
+            self._skip_string()
+        elif first in '[{':
+            self._skip_container()
+        else:
+            while True:
+                match = SCALAR_END.search(self.buf, self.pos)
+                if match:
+                    self.pos = match.start()
+                    return
+                if not self._fill():
+                    self.pos = len(self.buf)
+                    return
+
+    def _skip_string(self):
+        pattern = STRING
+        while True:
+            match = pattern.match(self.buf, self.pos)
+            self.pos = match.end()
+            if match.group(1):
+                return
+            pattern = STRING_TAIL
+            if not self._fill():
+                raise self._end_of_input()
+
+    def _skip_container(self):
+        depth = 0
+        while True:
+            match = STRUCTURAL.search(self.buf, self.pos)
+            if not match:
+                self.pos = len(self.buf)
+                if not self._fill():
+                    raise self._end_of_input()
+                continue
+            char = match.group()
+            if char == '"':
+                self.pos = match.start()
+                self._skip_string()
+                continue
+            self.pos = match.end()
+            if char in '[{':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def iter_array(self) -> Iterator[None]:
+        """
+        Step through an array, yielding once per element with the stream
+        positioned at it; the caller must consume each element
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield None
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"expected ',' or ']' at offset {self.pos - 1}")
+
+    def iter_object(self) -> Iterator[str]:
+        """
+        Step through an object, yielding each key with the stream positioned
+        at its value; the caller must consume each value
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise ValueError(f"expected object key at offset {self.pos}")
+            key = self.read_value()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError(f"expected ',' or '}}' at offset {self.pos - 1}")
+
+
+def _text(value) -> str:
+    return value if isinstance(value, str) else ''
+
+
+def _topic_result(topic: dict) -> Optional[SearchResult]:
+    text = _text(topic.get('Text'))
+    if not text:
+        return None
+    return SearchResult(
+        title=text[:100] + '...' if len(text) > 100 else text,
+        content=text,
+        source=_text(topic.get('FirstURL'))
+    )
+
+
+def parse_instant_answer(chunks: Iterable[bytes], num_results: int = 5,
+                         max_bytes: int = MAX_RESPONSE_BYTES) -> List[SearchResult]:
+    """
+    Extract results from a DuckDuckGo instant answer body read as a stream
+
+    Returns the abstract (if any) followed by up to num_results related
+    topics, with nested topic groups flattened in document order. Reading
+    stops once enough topics have been found after the abstract, or after
+    max_bytes of body; a truncated body yields whatever was complete, and
+    raises TruncatedResponse if that is nothing, so a cut-off answer is not
+    mistaken for an empty one.
+    """
+    stream = _JSONStream(chunks, max_bytes)
+    abstract = {}
+    topics: List[SearchResult] = []
+    truncated = False
+
+    def consume_topic():
+        if len(topics) >= num_results or stream.peek() != '{':
+            stream.skip_value()
+            return
+        topic = {}
+        for key in stream.iter_object():
+            if key == 'Topics' and stream.peek() == '[':
+                for _ in stream.iter_array():
+                    consume_topic()
+            elif key in ('Text', 'FirstURL'):
+                topic[key] = stream.read_value()
+            else:
+                stream.skip_value()
+        result = _topic_result(topic)
+        if result is not None:
+            topics.append(result)
+            if len(topics) >= num_results and 'Abstract' in abstract:
+                raise _Enough()
+
+    try:
+        for key in stream.iter_object():
+            if key in ('Abstract', 'AbstractText', 'AbstractURL'):
+                abstract[key] = stream.read_value()
+            elif key == 'RelatedTopics' and len(topics) < num_results and stream.peek() == '[':
+                for _ in stream.iter_array():
+                    consume_topic()
+            else:
+                stream.skip_value()
+    except _Enough:
+        pass
+    except _Truncated:
+        truncated = True
+
+    results = []
+    if _text(abstract.get('Abstract')):
+        results.append(SearchResult(
+            title=_text(abstract.get('AbstractText', 'Summary')),
+            content=abstract['Abstract'],
+            source=_text(abstract.get('AbstractURL'))
+        ))
+    results.extend(topics[:num_results])
+    if truncated and not results:
+        raise TruncatedResponse(f"response cut off at {max_bytes} bytes before any result")
+    return results
@@ -1,24 +1,19 @@
 #!/usr/bin/env python3
 """Debug the 405 error by testing the server directly"""
 import requests
-import subprocess
-import time
 import json
+from web_server import start_server
 
 def test_server_directly():
     print("Starting server with detailed logging...")
     
-    server_process = subprocess.Popen([
-        'bash', '-c', 
-        'source venv/bin/activate && python3 web_server.py'
-    ], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    # Request logs are printed in-process as each request is handled
+    server = start_server(port=0, log_requests=True)
     
     try:
-        time.sleep(2)
-        
         print("\n=== Testing GET / ===")
         try:
-            response = requests.get('http://localhost:8000/', timeout=5)
+            response = requests.get(f'{server.url}/', timeout=5)
             print(f"Status: {response.status_code}")
             print(f"Headers: {dict(response.headers)}")
             print(f"Content starts with: {response.text[:100]}...")
@@ -29,7 +24,7 @@ def test_server_directly():
         try:
             data = {'query': 'test'}
             response = requests.post(
-                'http://localhost:8000/search',
+                f'{server.url}/search',
                 headers={'Content-Type': 'application/json'},
                 json=data,
                 timeout=10
@@ -49,7 +44,7 @@ def test_server_directly():
         import http.client
         
         try:
-            conn = http.client.HTTPConnection('localhost', 8000)
+            conn = http.client.HTTPConnection(*server.address)
             headers = {'Content-Type': 'application/json'}
             body = json.dumps({'query': 'test'})
             
@@ -66,13 +61,8 @@ def test_server_directly():
             print(f"Raw HTTP failed: {e}")
             
     finally:
-        print("\nServer output:")
-        server_process.terminate()
-        try:
-            stdout, _ = server_process.communicate(timeout=3)
-            print(stdout)
-        except:
-            server_process.kill()
+        print("\nStopping server...")
+        server.shutdown()
 
 if __name__ == '__main__':
     test_server_directly()
\ No newline at end of file
@@ -0,0 +1,184 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    # email.utils costs several ms at import and is only needed for date headers
+    from email.utils import parsedate_to_datetime
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    Parse a Cache-Control header into a {directive: argument} dict
+    """
+    directives: Dict[str, Optional[str]] = {}
+    for part in (value or '').split(','):
+        name, _, argument = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def freshness_lifetime(headers: Mapping[str, str], default_ttl: float, now: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds a response stays fresh from now, or None if it must not be stored
+
+    Follows RFC 9111 for a shared cache: no-store and private forbid
+    storing, no-cache stores but always revalidates, s-maxage beats max-age,
+    which beats Expires. The response's age (Age header or Date) is
+    subtracted. Responses without any freshness information get default_ttl.
+    """
+    now = time.time() if now is None else now
+    directives = parse_cache_control(headers.get('Cache-Control'))
+    if 'no-store' in directives or 'private' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0.0
+
+    lifetime = None
+    for name in ('s-maxage', 'max-age'):
+        if directives.get(name) is not None:
+            try:
+                lifetime = float(directives[name])
+                break
+            except ValueError:
+                pass
+    date = _http_date(headers.get('Date'))
+    if lifetime is None and 'Expires' in headers:
+        expires = _http_date(headers.get('Expires'))
+        # An invalid Expires (e.g. "0") means already expired
+        lifetime = expires - (date if date is not None else now) if expires is not None else 0.0
+    if lifetime is None:
+        return float(default_ttl)
+
+    age = 0.0
+    try:
+        age = float(headers.get('Age') or 0)
+    except ValueError:
+        pass
+    if date is not None:
+        age = max(age, now - date)
+    return max(0.0, lifetime - age)
+
+
+class CacheEntry:
+    """
+    A stored response value with its validators and expiry time
+    """
+
+    __slots__ = ('value', 'etag', 'last_modified', 'expires')
+
+    def __init__(self, value: Any, etag: Optional[str], last_modified: Optional[str], expires: float):
+        self.value = value
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (time.time() if now is None else now) < self.expires
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """
+        Request headers that let the origin answer 304 Not Modified
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class HTTPCache:
+    """
+    Bounded LRU cache of HTTP response values that honours caching headers
+
+    Values are whatever the caller derives from a response (parsed results,
+    extracted text). Freshness comes from Cache-Control / Expires, falling
+    back to default_ttl. Stale entries are kept while they carry an ETag or
+    Last-Modified so they can be revalidated with a conditional request.
+    """
+
+    def __init__(self, default_ttl: float = 300.0, max_entries: int = 10000):
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: Hashable) -> Optional[CacheEntry]:
+        """
+        Return the entry for key, fresh or stale, or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not entry.is_fresh() and not (entry.etag or entry.last_modified):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def store(self, key: Hashable, value: Any, headers: Mapping[str, str]) -> Optional[CacheEntry]:
+        """
+        Store a value derived from a 200 response, unless its headers forbid it
+        """
+        lifetime = freshness_lifetime(headers, self.default_ttl)
+        if lifetime is None:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        entry = CacheEntry(value, headers.get('ETag'), headers.get('Last-Modified'), time.time() + lifetime)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def refresh(self, key: Hashable, entry: CacheEntry, headers: Mapping[str, str]) -> CacheEntry:
+        """
+        Update an entry after a 304 Not Modified, keeping its value
+        """
+        lifetime = freshness_lifetime(headers, self.default_ttl)
+        entry.expires = time.time() + (lifetime or 0.0)
+        entry.etag = headers.get('ETag') or entry.etag
+        entry.last_modified = headers.get('Last-Modified') or entry.last_modified
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+        return entry
+
+    def snapshot(self, limit: Optional[int] = None) -> List[Tuple[Hashable, CacheEntry]]:
+        """
+        The most recently used (key, entry) pairs, oldest first
+        """
+        with self._lock:
+            items = list(self._entries.items())
+        if limit is not None:
+            items = items[max(0, len(items) - limit):]
+        return items
+
+    def restore(self, items: Iterable[Tuple[Hashable, CacheEntry]]):
+        """
+        Load entries from another cache's snapshot, skipping any that are
+        stale and cannot be revalidated
+        """
+        with self._lock:
+            for key, entry in items:
+                if entry.is_fresh() or entry.etag or entry.last_modified:
+                    self._entries[key] = entry
+                    self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
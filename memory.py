@@ -0,0 +1,152 @@
+import gc
+import os
+import sys
+import threading
+import time
+import types
+from typing import Dict, Iterable, Optional
+
+
+# Shared program structure rather than data held by a cache or session
+_SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+               types.CodeType, types.FrameType, threading.Thread)
+
+
+def deep_size(obj, seen: Optional[set] = None, max_objects: int = 1000000) -> Dict[str, object]:
+    """
+    Approximate bytes held by obj and everything reachable from it
+
+    Follows the references the garbage collector knows about, skipping
+    classes, modules, functions and threads. Objects whose ids are already
+    in seen are not counted (or followed), so passing the same set when
+    measuring several structures counts shared objects once. Stops after
+    max_objects objects, reporting complete=False.
+    """
+    seen = set() if seen is None else seen
+    size = 0
+    objects = 0
+    stack = [obj]
+    while stack:
+        if objects >= max_objects:
+            return {'bytes': size, 'objects': objects, 'complete': False}
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIP_TYPES):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current, 0)
+        objects += 1
+        stack.extend(gc.get_referents(current))
+    return {'bytes': size, 'objects': objects, 'complete': True}
+
+
+def measure(structures: Dict[str, object], exclude: Iterable[object] = (),
+            max_objects: int = 1000000) -> Dict[str, Dict[str, object]]:
+    """
+    deep_size of each named structure, plus its len() where it has one
+
+    The structures themselves and anything in exclude (e.g. the agent a
+    session points back to) are never counted as part of another structure.
+    """
+    seen = {id(obj) for obj in exclude}
+    seen.update(id(obj) for obj in structures.values())
+    report = {}
+    for name, obj in structures.items():
+        seen.discard(id(obj))
+        report[name] = deep_size(obj, seen, max_objects)
+        try:
+            report[name]['items'] = len(obj)
+        except TypeError:
+            pass
+    return report
+
+
+def rss_bytes() -> Optional[int]:
+    """
+    Resident set size of this process, where /proc is available
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class AllocationTracer:
+    """
+    On-demand tracemalloc snapshots and diffs of the top allocation sites
+
+    Nothing is traced, and tracemalloc is not even imported, until start()
+    is called; stop() ends tracing and frees the stored snapshot. Each
+    snapshot() after the first is also compared with the one before it,
+    which shows what grew in between.
+    """
+
+    def __init__(self):
+        self._previous = None
+        self._previous_time = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return 'tracemalloc' in sys.modules and sys.modules['tracemalloc'].is_tracing()
+
+    def start(self, frames: int = 1) -> bool:
+        """
+        Start tracing, keeping frames stack frames per allocation; False if already tracing
+        """
+        import tracemalloc
+        with self._lock:
+            if tracemalloc.is_tracing():
+                return False
+            tracemalloc.start(frames)
+            return True
+
+    def stop(self):
+        with self._lock:
+            if self.tracing:
+                sys.modules['tracemalloc'].stop()
+            self._previous = None
+            self._previous_time = None
+
+    def status(self) -> Dict[str, object]:
+        if not self.tracing:
+            return {'tracing': False}
+        import tracemalloc
+        current, peak = tracemalloc.get_traced_memory()
+        return {'tracing': True, 'frames': tracemalloc.get_traceback_limit(),
+                'traced_bytes': current, 'peak_bytes': peak, 'overhead_bytes': tracemalloc.get_tracemalloc_memory()}
+
+    def snapshot(self, top: int = 20, key_type: str = 'lineno') -> Dict[str, object]:
+        """
+        The top allocation sites now and, after the first call, the top changes since the last call
+
+        Raises RuntimeError when not tracing and ValueError for an unknown
+        key_type ('lineno', 'filename' or 'traceback').
+        """
+        import tracemalloc
+        if key_type not in ('lineno', 'filename', 'traceback'):
+            raise ValueError(f"Unknown key type: {key_type!r}")
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                raise RuntimeError("tracemalloc is not tracing")
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+            ])
+            now = time.monotonic()
+            result = dict(self.status(), top=[_site(stat) for stat in snapshot.statistics(key_type)[:top]],
+                          diff=None)
+            if self._previous is not None:
+                result['diff'] = [dict(_site(stat), size_diff=stat.size_diff, count_diff=stat.count_diff)
+                                  for stat in snapshot.compare_to(self._previous, key_type)[:top]]
+                result['seconds_since_previous'] = round(now - self._previous_time, 3)
+            self._previous, self._previous_time = snapshot, now
+            return result
+
+
+def _site(stat) -> Dict[str, object]:
+    return {'site': [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+            'size': stat.size, 'count': stat.count}
+
+
+allocation_tracer = AllocationTracer()
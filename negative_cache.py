@@ -0,0 +1,125 @@
+import hashlib
+import math
+import threading
+import time
+from typing import Optional
+
+from query_cache import normalize_query
+
+
+EMPTY = 'empty'
+ERROR = 'error'
+
+
+class BloomFilter:
+    """
+    Fixed-size set membership with no false negatives and a bounded false
+    positive rate at the configured capacity
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 1e-4):
+        self.capacity = capacity
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class _Generations:
+    """
+    Two Bloom filters for consecutive ttl / 2 time slots, so a key is
+    remembered for between ttl / 2 and ttl seconds without storing
+    per-key expiry times; with ttl <= 0 nothing is remembered
+    """
+
+    def __init__(self, ttl: float, capacity: int, error_rate: float):
+        self.enabled = ttl > 0
+        self.slot = ttl / 2 if self.enabled else 1.0
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous = BloomFilter(capacity, error_rate)
+        self.epoch = self._epoch()
+
+    def _epoch(self) -> int:
+        return int(time.monotonic() // self.slot)
+
+    def _advance(self):
+        epoch = self._epoch()
+        if epoch == self.epoch:
+            return
+        self.previous = self.current if epoch == self.epoch + 1 else BloomFilter(self.capacity, self.error_rate)
+        self.current = BloomFilter(self.capacity, self.error_rate)
+        self.epoch = epoch
+
+    def add(self, key: str):
+        if not self.enabled:
+            return
+        self._advance()
+        if self.current.count >= self.capacity:
+            # Full: start a fresh filter early rather than let the error rate climb
+            self.previous, self.current = self.current, BloomFilter(self.capacity, self.error_rate)
+        self.current.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        if not self.enabled:
+            return False
+        self._advance()
+        return key in self.current or key in self.previous
+
+
+class NegativeCache:
+    """
+    Short-lived memory of queries that produced no answer
+
+    Genuine empty answers and transient upstream errors are remembered
+    separately: empties for ttl seconds, errors only for error_ttl so a
+    flaky upstream is retried soon. A ttl of 0 turns that outcome off. Membership is kept in rotating Bloom
+    filters, a few bits per query; a false positive (probability about
+    error_rate) only means one query skips upstream until its generation
+    expires.
+    """
+
+    def __init__(self, ttl: float = 60.0, error_ttl: float = 5.0, capacity: int = 100000,
+                 error_rate: float = 1e-4):
+        self.empty = _Generations(ttl, capacity, error_rate)
+        self.errors = _Generations(error_ttl, max(1, capacity // 10), error_rate)
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    def add_empty(self, query: str):
+        with self._lock:
+            self.empty.add(normalize_query(query))
+
+    def add_error(self, query: str):
+        with self._lock:
+            self.errors.add(normalize_query(query))
+
+    def lookup(self, query: str) -> Optional[str]:
+        """
+        Return EMPTY or ERROR if the query recently had that outcome, else None
+        """
+        key = normalize_query(query)
+        with self._lock:
+            if key in self.empty:
+                outcome = EMPTY
+            elif key in self.errors:
+                outcome = ERROR
+            else:
+                return None
+            self.hits += 1
+            return outcome
@@ -0,0 +1,240 @@
+import codecs
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as TransportError
+
+from http_cache import HTTPCache
+from search_result import SearchResult
+from tracing import traceparent_header, tracer
+
+
+SKIP_TAGS = frozenset(['head', 'title', 'script', 'style', 'noscript', 'nav', 'header', 'footer', 'aside',
+                       'form', 'svg', 'template', 'iframe', 'button', 'select'])
+MAIN_TAGS = frozenset(['article', 'main'])
+BLOCK_TAGS = frozenset(['p', 'div', 'section', 'li', 'br', 'tr', 'pre', 'blockquote', 'dd', 'dt',
+                        'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'article', 'main', 'table', 'ul', 'ol'])
+TEXT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+
+# Below this many characters an <article>/<main> block is not trusted as the main text
+MIN_MAIN_CHARS = 200
+
+
+class _TextExtractor(HTMLParser):
+    """
+    Incremental main-text extractor
+
+    Keeps visible body text and, separately, text inside <article>/<main>,
+    ignoring navigation, scripts and other chrome. Stops collecting once
+    max_chars of main text has been seen.
+    """
+
+    def __init__(self, max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.skip_depth = 0
+        self.main_depth = 0
+        self.body: List[str] = []
+        self.main: List[str] = []
+        self.body_chars = 0
+        self.main_chars = 0
+
+    @property
+    def done(self) -> bool:
+        return self.main_chars >= self.max_chars
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in MAIN_TAGS:
+            self.main_depth += 1
+        if tag in BLOCK_TAGS:
+            self._append('\n')
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in MAIN_TAGS:
+            self.main_depth = max(0, self.main_depth - 1)
+        if tag in BLOCK_TAGS:
+            self._append('\n')
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        text = ' '.join(data.split())
+        if text:
+            self._append(text)
+
+    def _append(self, text: str):
+        if self.body_chars < self.max_chars:
+            self.body.append(text)
+            self.body_chars += len(text)
+        if self.main_depth and self.main_chars < self.max_chars:
+            self.main.append(text)
+            self.main_chars += len(text)
+
+    def text(self) -> str:
+        parts = self.main if self.main_chars >= MIN_MAIN_CHARS else self.body
+        lines = (' '.join(line.split()) for line in ' '.join(parts).split('\n'))
+        return '\n'.join(line for line in lines if line)[:self.max_chars]
+
+
+def extract_text(html: str, max_chars: int = 2000) -> str:
+    """
+    Extract the main readable text from an HTML document
+    """
+    extractor = _TextExtractor(max_chars)
+    extractor.feed(html)
+    extractor.close()
+    return extractor.text()
+
+
+def _arrivals(response) -> Iterable[bytes]:
+    """
+    Yield body data as it arrives rather than in fixed-size blocks, so a
+    slowly dripping page cannot hold a read past the caller's deadline
+    """
+    read1 = getattr(response.raw, 'read1', None)
+    if read1 is None:
+        yield from response.iter_content(chunk_size=4096)
+        return
+    while True:
+        chunk = read1(16384, decode_content=True)
+        if not chunk:
+            return
+        yield chunk
+
+
+class PageFetcher:
+    """
+    Fetch result source pages concurrently and extract their main text
+
+    Requests share a bounded keep-alive connection pool. Each page is read
+    as a stream under max_bytes and a wall-clock timeout, and decoded and
+    parsed incrementally, so a slow or huge page costs at most those limits.
+    Extracted text is kept in an HTTPCache by URL: pages are reused while
+    their caching headers say they are fresh (cache_ttl when they say
+    nothing) and revalidated with If-None-Match / If-Modified-Since after
+    that, so a 304 reuses the cached text without a body.
+    """
+
+    def __init__(self, max_workers: int = 8, pool_size: int = 16, max_bytes: int = 512 * 1024,
+                 timeout: float = 5.0, max_chars: int = 1000, cache_size: int = 1000,
+                 cache_ttl: float = 0.0):
+        self.max_workers = max_workers
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.max_chars = max_chars
+        self.cache = HTTPCache(default_ttl=cache_ttl, max_entries=cache_size)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['User-Agent'] = 'web-search-agent/1.0'
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='page-fetch')
+
+    def fetch(self, url: str) -> Optional[str]:
+        """
+        Return the main text of a page, or None if it cannot be fetched
+        """
+        entry = self.cache.lookup(url)
+        if entry is not None and entry.is_fresh():
+            return entry.value
+        stale = entry.value if entry is not None else None
+        headers = entry.conditional_headers() if entry is not None else {}
+
+        with tracer.span('page.fetch', url=url, revalidate=entry is not None):
+            return self._fetch(url, entry, headers, stale)
+
+    def _fetch(self, url: str, entry, headers: Dict[str, str], stale: Optional[str]) -> Optional[str]:
+        deadline = time.monotonic() + self.timeout
+        headers.update(traceparent_header())
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+        except requests.RequestException:
+            return stale
+
+        try:
+            if response.status_code == 304 and entry is not None:
+                return self.cache.refresh(url, entry, response.headers).value
+            content_type = response.headers.get('Content-Type', '')
+            if response.status_code != 200 or not content_type.startswith(TEXT_TYPES):
+                return stale
+            text = self._read_text(response, content_type, deadline)
+        except (requests.RequestException, TransportError, OSError):
+            # Body reads go to urllib3 directly, so its timeouts are not wrapped by requests
+            return stale
+        finally:
+            response.close()
+
+        self.cache.store(url, text, response.headers)
+        return text
+
+    def _read_text(self, response, content_type: str, deadline: float) -> str:
+        charset = 'utf-8'
+        for param in content_type.split(';')[1:]:
+            name, _, value = param.strip().partition('=')
+            if name.lower() == 'charset' and value:
+                charset = value.strip('"\'')
+        try:
+            decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+        plain = content_type.startswith('text/plain')
+        parts: List[str] = []
+        extractor = _TextExtractor(self.max_chars)
+        received = 0
+        for chunk in _arrivals(response):
+            chunk = chunk[:self.max_bytes - received]
+            received += len(chunk)
+            text = decoder.decode(chunk)
+            if plain:
+                parts.append(text)
+            else:
+                extractor.feed(text)
+            if received >= self.max_bytes or extractor.done or time.monotonic() > deadline:
+                break
+        if plain:
+            return ' '.join(''.join(parts).split())[:self.max_chars]
+        return extractor.text()
+
+    def fetch_many(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Fetch several pages concurrently on the fetcher's worker pool
+        """
+        unique = list(dict.fromkeys(urls))
+        # Run each fetch in a copy of the caller's context so it joins the caller's trace
+        contexts = [copy_context() for _ in unique]
+        return dict(zip(unique, self._pool.map(lambda context, url: context.run(self.fetch, url), contexts, unique)))
+
+    def enrich(self, results: list, k: int = 3) -> list:
+        """
+        Replace the snippet of the first k web results with their page text
+        """
+        urls = [result['source'] for result in results[:k] if result['source'].startswith(('http://', 'https://'))]
+        if not urls:
+            return list(results)
+        pages = self.fetch_many(urls)
+        enriched = []
+        for result in results:
+            text = pages.get(result['source'])
+            if text:
+                enriched.append(SearchResult(result['title'], text, result['source']))
+            else:
+                enriched.append(result)
+        return enriched
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        self.session.close()
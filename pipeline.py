@@ -0,0 +1,121 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from tracing import tracer
+
+
+class PipelineContext:
+    """
+    State carried through the pipeline stages for one question
+    """
+
+    def __init__(self, question: str, history: Optional[list] = None):
+        self.question = question
+        self.history = history
+        self.results: list = []
+        self.response: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+
+
+class Stage:
+    """
+    A named pipeline step with an optional concurrency limit
+
+    The function receives the PipelineContext and updates it in place. When
+    concurrency is set, at most that many contexts run the stage at once;
+    time spent waiting for a slot is not counted in the stage timing.
+    """
+
+    def __init__(self, name: str, func: Callable[[PipelineContext], None], concurrency: Optional[int] = None):
+        self.name = name
+        self.func = func
+        self.calls = 0
+        self.total_time = 0.0
+        self._stats_lock = threading.Lock()
+        self.set_concurrency(concurrency)
+
+    def set_concurrency(self, concurrency: Optional[int]):
+        self.concurrency = concurrency
+        self._slots = threading.BoundedSemaphore(concurrency) if concurrency else None
+
+    def __call__(self, ctx: PipelineContext):
+        slots = self._slots
+        if slots is not None:
+            slots.acquire()
+        start = time.perf_counter()
+        try:
+            with tracer.span(f'stage.{self.name}'):
+                self.func(ctx)
+        finally:
+            elapsed = time.perf_counter() - start
+            if slots is not None:
+                slots.release()
+            ctx.timings[self.name] = elapsed
+            with self._stats_lock:
+                self.calls += 1
+                self.total_time += elapsed
+
+
+class Pipeline:
+    """
+    Ordered sequence of stages that can be swapped, tuned and run concurrently
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = list(stages)
+
+    def stage(self, name: str) -> Stage:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+
+    def replace(self, name: str, func: Callable[[PipelineContext], None]):
+        """
+        Swap the function behind a stage, keeping its position and limits
+        """
+        self.stage(name).func = func
+
+    def insert_after(self, name: str, stage: Stage):
+        """
+        Add a new stage directly after an existing one
+        """
+        self.stages.insert(self.stages.index(self.stage(name)) + 1, stage)
+
+    def run(self, ctx: PipelineContext,
+            on_stage: Optional[Callable[[str, PipelineContext], None]] = None) -> PipelineContext:
+        """
+        Run every stage on the context, calling on_stage(name, ctx) after each
+        """
+        for stage in self.stages:
+            stage(ctx)
+            if on_stage is not None:
+                on_stage(stage.name, ctx)
+        return ctx
+
+    def run_many(self, contexts: Iterable[PipelineContext], max_workers: int = 8) -> Iterator[PipelineContext]:
+        """
+        Push several contexts through the pipeline concurrently
+
+        Different contexts overlap in different stages, bounded by each
+        stage's concurrency. Completed contexts are yielded in input order.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pipeline') as pool:
+            for future in [pool.submit(self.run, ctx) for ctx in contexts]:
+                yield future.result()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Cumulative call counts and timings per stage
+        """
+        return {
+            stage.name: {
+                'calls': stage.calls,
+                'total_time': stage.total_time,
+                'mean_time': stage.total_time / stage.calls if stage.calls else 0.0,
+                'concurrency': stage.concurrency or 0
+            }
+            for stage in self.stages
+        }
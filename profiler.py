@@ -0,0 +1,85 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Iterable, Optional
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack(frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class SamplingProfiler:
+    """
+    Statistical CPU profiler that samples Python stacks from a background thread
+
+    Every interval seconds the current stack of each watched thread (all
+    threads by default) is recorded. Nothing runs until start() is called,
+    so an idle profiler costs nothing. Output is in collapsed-stack format,
+    one "root;...;leaf count" line per distinct stack, which flamegraph.pl,
+    speedscope and similar tools read directly.
+    """
+
+    def __init__(self, interval: float = 0.001, thread_ids: Optional[Iterable[int]] = None):
+        self.interval = interval
+        self.thread_ids = set(thread_ids) if thread_ids is not None else None
+        self.samples: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'SamplingProfiler':
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self.samples
+
+    def __enter__(self) -> 'SamplingProfiler':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                self.samples[_stack(frame)] += 1
+
+    def collapsed(self) -> str:
+        """
+        The samples as collapsed stacks, most frequent first
+        """
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            f.write(self.collapsed())
+
+
+def profile_for(seconds: float, interval: float = 0.001) -> SamplingProfiler:
+    """
+    Sample every thread for a time window and return the profiler
+    """
+    profiler = SamplingProfiler(interval).start()
+    time.sleep(seconds)
+    profiler.stop()
+    return profiler
@@ -0,0 +1,207 @@
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+from search_index import STOP_WORDS, TOKEN_PATTERN
+
+
+MIN_KEY_BITS = 16
+MAX_TABLES = 256
+LANE_BITS = 32
+LANE_MASK = (1 << LANE_BITS) - 1
+# Question words change what is being asked, so unlike ranking the cache keeps them
+QUESTION_WORDS = frozenset(['how', 'what', 'when', 'where', 'which', 'who', 'why'])
+CACHE_STOP_WORDS = STOP_WORDS - QUESTION_WORDS
+
+
+@lru_cache(maxsize=65536)
+def _feature_lanes(feature: str, bits: int) -> int:
+    """
+    Hash a feature and spread each of its bits into its own 32-bit lane, so
+    summing weighted lanes counts every bit position in one big-int add
+    """
+    h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=(bits + 7) // 8).digest(), 'big')
+    lanes = 0
+    for i in range(bits):
+        if h >> i & 1:
+            lanes |= 1 << (i * LANE_BITS)
+    return lanes
+
+
+def query_features(query: str) -> Dict[str, int]:
+    """
+    Weighted SimHash features of a query: its terms plus their character trigrams
+    """
+    features: Dict[str, int] = {}
+    for term in TOKEN_PATTERN.findall(query.lower()):
+        if term in CACHE_STOP_WORDS:
+            continue
+        features[term] = features.get(term, 0) + 2
+        padded = f' {term} '
+        for i in range(len(padded) - 2):
+            gram = '#' + padded[i:i + 3]
+            features[gram] = features.get(gram, 0) + 1
+    return features
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a query used as its exact cache key
+
+    Only case and whitespace are folded; stop words are kept, since
+    dropping them would make "when was python created" and "why was python
+    created" one key. Near-duplicates are left to the fuzzy match.
+    """
+    return ' '.join(query.lower().split())
+
+
+def simhash(features: Dict[str, int], bits: int = 64) -> int:
+    """
+    Compute a SimHash fingerprint from weighted features
+    """
+    counts = 0
+    total_weight = 0
+    for feature, weight in features.items():
+        counts += weight * _feature_lanes(feature, bits)
+        total_weight += weight
+    fingerprint = 0
+    for i in range(bits):
+        if 2 * (counts >> (i * LANE_BITS) & LANE_MASK) > total_weight:
+            fingerprint |= 1 << i
+    return fingerprint
+
+
+def _block_tables(bits: int, max_distance: int) -> List[int]:
+    """
+    Pick the LSH table masks that guarantee every fingerprint within
+    max_distance shares at least one table key.
+
+    The fingerprint is split into m blocks and each table keys on m - d of
+    them; two fingerprints differing in at most d bits must agree on every
+    block of some table. m is the smallest count giving keys of at least
+    MIN_KEY_BITS, which keeps buckets small at millions of entries.
+    """
+    if max_distance == 0:
+        return [(1 << bits) - 1]
+    for blocks in range(max_distance + 1, bits + 1):
+        if (blocks - max_distance) * (bits // blocks) >= MIN_KEY_BITS:
+            break
+    if math.comb(blocks, max_distance) > MAX_TABLES:
+        raise ValueError(f"similarity threshold too low: needs more than {MAX_TABLES} LSH tables")
+    bounds = [bits * i // blocks for i in range(blocks + 1)]
+    block_masks = [((1 << bounds[i + 1]) - 1) ^ ((1 << bounds[i]) - 1) for i in range(blocks)]
+    masks = []
+    for chosen in combinations(block_masks, blocks - max_distance):
+        mask = 0
+        for block_mask in chosen:
+            mask |= block_mask
+        masks.append(mask)
+    return masks
+
+
+class FuzzyQueryCache:
+    """
+    Near-duplicate query cache keyed by SimHash fingerprints
+
+    Queries are normalised (lowercased, whitespace collapsed) and looked up
+    exactly first; otherwise LSH tables over fingerprint blocks find cached
+    queries whose similarity (1 - hamming distance / bits) is at least
+    threshold. Lower thresholds need more tables, so they cost more memory.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 100000, bits: int = 64):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bits = bits
+        self.max_distance = int((1 - threshold) * bits + 1e-9)
+        self._masks = _block_tables(bits, self.max_distance)
+        self._entries: 'OrderedDict[Tuple[str, int], Tuple[Optional[int], list]]' = OrderedDict()
+        self._tables: Dict[Tuple[int, int, int], List[Tuple[str, int]]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _keys(self, fingerprint: int, num_results: int):
+        return [(i, fingerprint & mask, num_results) for i, mask in enumerate(self._masks)]
+
+    def get(self, query: str, num_results: int = 5) -> Optional[list]:
+        """
+        Return cached results for the query or a near-duplicate of it
+        """
+        key = (normalize_query(query), num_results)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return list(entry[1])
+
+        features = query_features(query)
+        if not features or not self.max_distance:
+            return None
+        fingerprint = simhash(features, self.bits)
+
+        with self._lock:
+            best_key, best_distance = None, self.max_distance + 1
+            for table_key in self._keys(fingerprint, num_results):
+                for candidate in self._tables.get(table_key, ()):
+                    distance = bin(fingerprint ^ self._entries[candidate][0]).count('1')
+                    if distance < best_distance:
+                        best_key, best_distance = candidate, distance
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            return list(self._entries[best_key][1])
+
+    def contains(self, query: str, num_results: int = 5) -> bool:
+        """
+        Whether the exact (normalised) query is cached, without touching recency
+        """
+        return (normalize_query(query), num_results) in self._entries
+
+    def put(self, query: str, results: list, num_results: int = 5):
+        """
+        Cache results for a query, evicting the least recently used entry when full
+        """
+        key = (normalize_query(query), num_results)
+        features = query_features(query)
+        fingerprint = simhash(features, self.bits) if features else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (fingerprint, list(results))
+            if fingerprint is not None:
+                for table_key in self._keys(fingerprint, num_results):
+                    self._tables.setdefault(table_key, []).append(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def snapshot(self, limit: Optional[int] = None) -> List[Tuple[str, int, list]]:
+        """
+        The most recently used entries as (query, num_results, results), oldest first
+
+        Putting them back in this order into another cache reproduces the
+        recency order.
+        """
+        with self._lock:
+            keys = list(self._entries)
+            if limit is not None:
+                keys = keys[max(0, len(keys) - limit):]
+            return [(query, num_results, list(self._entries[query, num_results][1]))
+                    for query, num_results in keys]
+
+    def _remove(self, key: Tuple[str, int]):
+        fingerprint, _ = self._entries.pop(key)
+        if fingerprint is None:
+            return
+        for table_key in self._keys(fingerprint, key[1]):
+            bucket = self._tables[table_key]
+            bucket.remove(key)
+            if not bucket:
+                del self._tables[table_key]
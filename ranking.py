@@ -0,0 +1,92 @@
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from search_index import tokenize
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class Ranker:
+    """
+    BM25 relevance ranking of candidate results against a question
+
+    Term statistics are computed over the candidate set with NumPy, so the
+    cost is a handful of array operations whatever the number of
+    candidates. Terms are mapped to integer ids through a cached vocabulary
+    and each result's tokenised text is cached by content, so repeated
+    results are not re-tokenised. NumPy is imported on first use rather
+    than at startup.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, max_vocabulary: int = 200000,
+                 max_cached_docs: int = 50000):
+        self.k1 = k1
+        self.b = b
+        self.max_vocabulary = max_vocabulary
+        self.max_cached_docs = max_cached_docs
+        self.vocabulary: Dict[str, int] = {}
+        self._doc_terms: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _term_ids(self, text: str) -> 'np.ndarray':
+        # Callers hold self._lock, so one scores() call sees a single vocabulary
+        import numpy as np
+        ids = self._doc_terms.get(text)
+        if ids is not None:
+            self._doc_terms.move_to_end(text)
+            return ids
+
+        vocabulary = self.vocabulary
+        ids = np.fromiter((vocabulary.setdefault(term, len(vocabulary)) for term in tokenize(text)),
+                          dtype=np.int64)
+        self._doc_terms[text] = ids
+        if len(self._doc_terms) > self.max_cached_docs:
+            self._doc_terms.popitem(last=False)
+        return ids
+
+    def scores(self, question: str, results: list) -> 'np.ndarray':
+        """
+        Return the BM25 score of every result for the question
+        """
+        import numpy as np
+        n = len(results)
+        with self._lock:
+            # Reset only between calls: ids from before and after a reset must never meet
+            if len(self.vocabulary) > self.max_vocabulary:
+                self.vocabulary.clear()
+                self._doc_terms.clear()
+            docs = [self._term_ids(f"{result['title']} {result['content']}") for result in results]
+            query_ids = np.unique(np.fromiter(
+                (self.vocabulary[term] for term in tokenize(question) if term in self.vocabulary), dtype=np.int64
+            ))
+        if not n or not query_ids.size:
+            return np.zeros(n)
+
+        lengths = np.fromiter((len(doc) for doc in docs), dtype=np.int64, count=n)
+        all_ids = np.concatenate(docs)
+        doc_index = np.repeat(np.arange(n), lengths)
+        positions = np.minimum(np.searchsorted(query_ids, all_ids), query_ids.size - 1)
+        matched = query_ids[positions] == all_ids
+
+        num_terms = query_ids.size
+        tf = np.bincount(doc_index[matched] * num_terms + positions[matched],
+                         minlength=n * num_terms).reshape(n, num_terms)
+        df = np.count_nonzero(tf, axis=0)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(lengths.mean(), 1.0))
+        return (idf * tf * (self.k1 + 1) / (tf + norm[:, None])).sum(axis=1)
+
+    def rank(self, question: str, results: list, k: Optional[int] = None) -> List:
+        """
+        Return the best k results, most relevant first
+
+        Equal scores keep their upstream order, so results that match
+        nothing stay in the order DuckDuckGo returned them.
+        """
+        if len(results) < 2:
+            return list(results[:k])
+        import numpy as np
+        order = np.argsort(-self.scores(question, results), kind='stable')
+        return [results[i] for i in order[:k]]
@@ -0,0 +1,221 @@
+import json
+import os
+import select
+import socket
+import subprocess
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+from typing import List, Optional
+
+from http_cache import CacheEntry
+from request_reader import PrereadSocket, RequestReader
+from search_result import SearchResult, json_default
+
+
+LISTEN_FD_ENV = 'WEB_SEARCH_LISTEN_FD'
+READY_FD_ENV = 'WEB_SEARCH_READY_FD'
+HANDOFF_ENV = 'WEB_SEARCH_HANDOFF'
+
+
+class ReloadableHTTPServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server that can adopt an inherited listening socket and
+    drain its in-flight requests before exiting
+
+    A handler can detach() its connection (e.g. after a WebSocket upgrade)
+    to keep it open after the request finishes; closing it is then up to
+    whoever took it over.
+
+    When the handler class sets read_timeout, requests are first read on a
+    single selector thread (see RequestReader) under that deadline and the
+    handler's max_header_bytes/max_body_bytes limits, and a worker thread
+    is only started for a request that has fully arrived.
+    """
+
+    # Accepting is cheap once requests are read ahead, so let bursts queue
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, listen_socket: Optional[socket.socket] = None):
+        self._active = 0
+        self._detached = set()
+        self._idle = threading.Condition()
+        self._reader: Optional[RequestReader] = None
+        self._reader_lock = threading.Lock()
+        if listen_socket is None:
+            super().__init__(server_address, handler_class)
+            return
+        super().__init__(server_address, handler_class, bind_and_activate=False)
+        self.socket.close()
+        self.socket = listen_socket
+        self.server_address = listen_socket.getsockname()[:2]
+        self.server_name = socket.getfqdn(self.server_address[0])
+        self.server_port = self.server_address[1]
+
+    def process_request(self, request, client_address):
+        # Count the request before its thread starts so drain() cannot miss it
+        with self._idle:
+            self._active += 1
+        try:
+            reader = self.request_reader()
+            if reader is None:
+                super().process_request(request, client_address)
+            else:
+                reader.add(request, client_address)
+        except Exception:
+            self._finished()
+            raise
+
+    def request_reader(self) -> Optional[RequestReader]:
+        read_timeout = getattr(self.RequestHandlerClass, 'read_timeout', None)
+        if read_timeout is None:
+            return None
+        with self._reader_lock:
+            if self._reader is None:
+                handler = self.RequestHandlerClass
+                self._reader = RequestReader(
+                    self._dispatch, lambda client_address: self._finished(), read_timeout,
+                    getattr(handler, 'max_header_bytes', 65536), getattr(handler, 'max_body_bytes', 1 << 20))
+            return self._reader
+
+    def _dispatch(self, sock: socket.socket, client_address, data: bytes):
+        try:
+            super().process_request(PrereadSocket(sock, data), client_address)
+        except Exception:
+            sock.close()
+            self._finished()
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._finished()
+
+    def detach(self, request: socket.socket):
+        self._detached.add(request)
+
+    def shutdown_request(self, request):
+        if request in self._detached:
+            self._detached.discard(request)
+            return
+        super().shutdown_request(request)
+
+    def _finished(self):
+        with self._idle:
+            self._active -= 1
+            self._idle.notify_all()
+
+    def drain(self, timeout: float = 30.0) -> bool:
+        """
+        Wait for in-flight requests to finish; False if some are still running
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._active == 0, timeout)
+
+    def server_close(self):
+        super().server_close()
+        if self._reader is not None:
+            self._reader.close()
+
+
+def inherited_socket() -> Optional[socket.socket]:
+    """
+    The listening socket handed over by the previous server process, if any
+    """
+    fd = os.environ.pop(LISTEN_FD_ENV, None)
+    if fd is None:
+        return None
+    return socket.socket(fileno=int(fd))
+
+
+def notify_ready():
+    """
+    Tell the previous server process that this one is accepting connections
+    """
+    fd = os.environ.pop(READY_FD_ENV, None)
+    if fd is not None:
+        os.write(int(fd), b'1')
+        os.close(int(fd))
+
+
+def _dump_entries(cache, limit: Optional[int]) -> List[dict]:
+    return [
+        {'key': key, 'value': entry.value, 'etag': entry.etag,
+         'last_modified': entry.last_modified, 'expires': entry.expires}
+        for key, entry in cache.snapshot(limit)
+    ]
+
+
+def _load_entries(records: List[dict], value=lambda value: value):
+    for record in records:
+        key = tuple(record['key']) if isinstance(record['key'], list) else record['key']
+        yield key, CacheEntry(value(record['value']), record['etag'], record['last_modified'], record['expires'])
+
+
+def save_handoff(agent, path: str, limit: int = 10000):
+    """
+    Write the agent's hottest cache entries to path for the next process
+    """
+    state = {}
+    if agent.query_cache is not None:
+        state['query_cache'] = agent.query_cache.snapshot(limit)
+    if agent.http_cache is not None:
+        state['http_cache'] = _dump_entries(agent.http_cache, limit)
+    if agent.page_fetcher is not None:
+        state['page_cache'] = _dump_entries(agent.page_fetcher.cache, limit)
+    with open(path, 'w') as f:
+        json.dump(state, f, default=json_default)
+
+
+def load_handoff(agent, path: str) -> int:
+    """
+    Restore cache entries saved by save_handoff, returning how many were read
+    """
+    with open(path, 'r') as f:
+        state = json.load(f)
+
+    def results(value):
+        return [SearchResult.from_dict(result) for result in value]
+
+    if agent.query_cache is not None:
+        for query, num_results, value in state.get('query_cache', []):
+            agent.query_cache.put(query, results(value), num_results)
+    if agent.http_cache is not None:
+        agent.http_cache.restore(_load_entries(state.get('http_cache', []), results))
+    if agent.page_fetcher is not None:
+        agent.page_fetcher.cache.restore(_load_entries(state.get('page_cache', [])))
+    return sum(len(entries) for entries in state.values())
+
+
+def spawn_successor(httpd: ReloadableHTTPServer, argv: List[str], handoff_path: Optional[str] = None,
+                    timeout: float = 30.0) -> Optional[subprocess.Popen]:
+    """
+    Start a new server process that inherits the listening socket
+
+    The new process is started with the same interpreter and argv. Returns
+    it once it reports that it is accepting connections, or None (after
+    killing it) if it does not within timeout, in which case this process
+    should keep serving.
+    """
+    listen_fd = httpd.socket.fileno()
+    ready_read, ready_write = os.pipe()
+    env = dict(os.environ)
+    env[LISTEN_FD_ENV] = str(listen_fd)
+    env[READY_FD_ENV] = str(ready_write)
+    if handoff_path:
+        env[HANDOFF_ENV] = handoff_path
+    try:
+        process = subprocess.Popen([sys.executable] + list(argv), env=env, pass_fds=(listen_fd, ready_write))
+    finally:
+        os.close(ready_write)
+
+    try:
+        readable, _, _ = select.select([ready_read], [], [], timeout)
+        ready = bool(readable) and os.read(ready_read, 1) == b'1'
+    finally:
+        os.close(ready_read)
+    if ready:
+        return process
+    process.kill()
+    process.wait()
+    return None
@@ -0,0 +1,475 @@
+import bisect
+import hashlib
+import json
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from query_cache import normalize_query
+from search_result import SearchResult, json_default
+
+
+def encode_command(*args) -> bytes:
+    """
+    A command as a RESP array of bulk strings
+    """
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+    return b''.join(parts)
+
+
+class RESPError(Exception):
+    """
+    An error reply from a cache node
+    """
+
+
+def read_reply(stream):
+    """
+    Read one RESP reply from a binary file object
+    """
+    line = stream.readline()
+    if not line.endswith(b'\r\n'):
+        raise ConnectionError("connection closed by cache node")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b'+':
+        return rest.decode()
+    if kind == b'-':
+        return RESPError(rest.decode())
+    if kind == b':':
+        return int(rest)
+    if kind == b'$':
+        length = int(rest)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        if len(data) != length + 2:
+            raise ConnectionError("connection closed by cache node")
+        return data[:-2]
+    if kind == b'*':
+        count = int(rest)
+        return None if count < 0 else [read_reply(stream) for _ in range(count)]
+    raise ValueError(f"unexpected RESP reply {line!r}")
+
+
+class NodeConnection:
+    """
+    One pipelined connection to a cache node
+
+    Callers write their commands as soon as they have them, without waiting
+    for earlier replies, and get futures back; a reader thread resolves the
+    futures in order as replies arrive. Concurrent requests from many
+    handler threads therefore share one socket and one round trip. A node
+    that cannot be reached, or misses a deadline, is skipped for
+    retry_interval seconds.
+
+    Writes never block a caller on the socket while the lock is held:
+    commands are appended to an outbox and one caller at a time flushes
+    it, with the kernel send timeout set to timeout. A node that stops
+    reading (paused, partitioned) therefore fails the flushing write within
+    timeout, or overflows max_outbox_bytes, and is dropped and marked down
+    instead of wedging every thread that uses it.
+    """
+
+    def __init__(self, address: Tuple[str, int], timeout: float = 0.25, retry_interval: float = 5.0,
+                 max_outbox_bytes: int = 1 << 20):
+        self.address = address
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.max_outbox_bytes = max_outbox_bytes
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._waiting: deque = deque()
+        self._outbox = bytearray()
+        self._flushing = False
+        self._down_until = 0.0
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        # Reads block in the reply thread; sends give up after timeout
+        sock.settimeout(None)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO,
+                        struct.pack('ll', int(self.timeout), int(self.timeout % 1 * 1000000)))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock, self._waiting = sock, deque()
+        self._outbox, self._flushing = bytearray(), False
+        threading.Thread(target=self._read_replies, args=(sock, self._waiting),
+                         name=f"remote-cache-{self.address[0]}:{self.address[1]}", daemon=True).start()
+
+    def submit(self, commands: Sequence[Sequence]) -> List[Future]:
+        """
+        Send commands in one write and return a future per reply
+        """
+        futures = [Future() for _ in commands]
+        payload = b''.join(encode_command(*command) for command in commands)
+        with self._lock:
+            if self._sock is None:
+                if time.monotonic() < self._down_until:
+                    raise ConnectionError(f"cache node {self.address[0]}:{self.address[1]} is down")
+                try:
+                    self._connect()
+                except OSError:
+                    self._down_until = time.monotonic() + self.retry_interval
+                    raise
+            sock = self._sock
+            if len(self._outbox) + len(payload) > self.max_outbox_bytes:
+                error = ConnectionError(f"cache node {self.address[0]}:{self.address[1]} is not reading")
+                self._drop(sock, self._waiting, error, down=True)
+                raise error
+            self._waiting.extend(futures)
+            self._outbox += payload
+            if self._flushing:
+                # The thread already writing sends these bytes too, in order
+                return futures
+            self._flushing = True
+        self._flush(sock)
+        return futures
+
+    def _flush(self, sock: socket.socket):
+        while True:
+            with self._lock:
+                if self._sock is not sock:
+                    return
+                data, self._outbox = self._outbox, bytearray()
+                if not data:
+                    self._flushing = False
+                    return
+            try:
+                sock.sendall(data)
+            except OSError as e:
+                with self._lock:
+                    if self._sock is sock:
+                        self._drop(sock, self._waiting, e, down=True)
+                raise
+
+    def execute(self, *command):
+        """
+        Run one command and wait up to timeout for its reply
+        """
+        future = self.submit([command])[0]
+        return self.result(future)
+
+    def result(self, future: Future, timeout: Optional[float] = None):
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            self.reset(down=True)
+            raise TimeoutError(f"cache node {self.address[0]}:{self.address[1]} timed out")
+
+    def _read_replies(self, sock: socket.socket, waiting: deque):
+        stream = sock.makefile('rb')
+        try:
+            while True:
+                reply = read_reply(stream)
+                future = waiting.popleft()
+                if isinstance(reply, RESPError):
+                    future.set_exception(reply)
+                else:
+                    future.set_result(reply)
+        except (OSError, ValueError, IndexError) as e:
+            with self._lock:
+                self._drop(sock, waiting, e, down=False)
+        finally:
+            stream.close()
+
+    def _drop(self, sock: socket.socket, waiting: deque, error: Exception, down: bool):
+        # Called with self._lock held
+        if self._sock is sock:
+            self._sock = None
+            self._outbox, self._flushing = bytearray(), False
+            if down:
+                self._down_until = time.monotonic() + self.retry_interval
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        sock.close()
+        while waiting:
+            future = waiting.popleft()
+            if not future.done():
+                future.set_exception(ConnectionError(f"cache node connection lost: {error}"))
+
+    def reset(self, down: bool = False):
+        """
+        Close the connection, failing requests still waiting for replies
+        """
+        with self._lock:
+            if self._sock is not None:
+                self._drop(self._sock, self._waiting, ConnectionError("connection reset"), down)
+
+    def close(self):
+        self.reset()
+
+
+class HashRing:
+    """
+    Consistent hashing of keys onto nodes
+
+    Each node is placed at replicas points on the ring, so adding or
+    removing a node only moves the keys between it and its neighbours.
+    """
+
+    def __init__(self, nodes: Iterable[str], replicas: int = 160):
+        self.nodes = list(nodes)
+        points = sorted((self._hash(f"{node}#{i}"), index)
+                        for index, node in enumerate(self.nodes) for i in range(replicas))
+        self._points = [point for point, _ in points]
+        self._owners = [index for _, index in points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+    def node_for(self, key: str) -> str:
+        index = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+        return self.nodes[self._owners[index]]
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+class RemoteResultCache:
+    """
+    search_web results shared by every server instance through cache nodes
+    speaking the Redis protocol (Redis, Valkey, KeyDB, ...)
+
+    Keys are sharded over the nodes with consistent hashing. Recently used
+    entries are kept in a small in-process near-cache for near_ttl seconds,
+    which bounds how stale a result can be relative to the shared copy.
+    Writes are pipelined and not waited for. Cache failures never fail a
+    search: an unreachable node is treated as a miss.
+    """
+
+    def __init__(self, nodes: Sequence[str], ttl: float = 300.0, near_ttl: float = 5.0,
+                 near_size: int = 4096, timeout: float = 0.25, prefix: str = 'web-search:'):
+        self.ttl = ttl
+        self.near_ttl = near_ttl
+        self.near_size = near_size
+        self.prefix = prefix
+        # Shard on the node addresses so every instance maps keys the same way
+        self.nodes = {}
+        for node in nodes:
+            host, port = parse_address(node)
+            self.nodes[f"{host}:{port}"] = NodeConnection((host, port), timeout)
+        self.ring = HashRing(self.nodes)
+        self._near: 'OrderedDict[str, Tuple[float, List[SearchResult]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.near_hits = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, query: str, num_results: int) -> str:
+        return f"{self.prefix}{num_results}:{normalize_query(query)}"
+
+    def _node(self, key: str) -> NodeConnection:
+        return self.nodes[self.ring.node_for(key)]
+
+    def _near_get(self, key: str) -> Optional[List[SearchResult]]:
+        with self._lock:
+            entry = self._near.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._near[key]
+                return None
+            self._near.move_to_end(key)
+            self.near_hits += 1
+            return list(entry[1])
+
+    def _near_put(self, key: str, results: List[SearchResult]):
+        if self.near_ttl <= 0:
+            return
+        with self._lock:
+            self._near[key] = (time.monotonic() + self.near_ttl, list(results))
+            self._near.move_to_end(key)
+            while len(self._near) > self.near_size:
+                self._near.popitem(last=False)
+
+    def _decode(self, key: str, value: Optional[bytes]) -> Optional[List[SearchResult]]:
+        try:
+            results = None if value is None else [SearchResult.from_dict(result) for result in json.loads(value)]
+        except (TypeError, ValueError, AttributeError):
+            # A corrupt entry (not a JSON list of result objects) is just a miss
+            results = None
+        if results is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        self._near_put(key, results)
+        with self._lock:
+            self.hits += 1
+        return results
+
+    def get(self, query: str, num_results: int = 5) -> Optional[List[SearchResult]]:
+        key = self._key(query, num_results)
+        results = self._near_get(key)
+        if results is not None:
+            return results
+        try:
+            return self._decode(key, self._node(key).execute('GET', key))
+        except (OSError, RESPError, ValueError):
+            with self._lock:
+                self.errors += 1
+            return None
+
+    def get_many(self, queries: Iterable[str], num_results: int = 5) -> Dict[str, List[SearchResult]]:
+        """
+        Look up several queries with one pipelined round trip per node
+        """
+        found: Dict[str, List[SearchResult]] = {}
+        by_node: Dict[NodeConnection, List[Tuple[str, str]]] = {}
+        for query in queries:
+            key = self._key(query, num_results)
+            results = self._near_get(key)
+            if results is not None:
+                found[query] = results
+            else:
+                by_node.setdefault(self._node(key), []).append((query, key))
+
+        submitted = []
+        for node, items in by_node.items():
+            try:
+                futures = node.submit([('GET', key) for _, key in items])
+            except OSError:
+                with self._lock:
+                    self.errors += 1
+                continue
+            submitted.append((node, items, futures))
+
+        deadline = time.monotonic() + max(node.timeout for node in self.nodes.values())
+        for node, items, futures in submitted:
+            for (query, key), future in zip(items, futures):
+                try:
+                    results = self._decode(key, node.result(future, max(0.0, deadline - time.monotonic())))
+                except (OSError, RESPError, ValueError):
+                    with self._lock:
+                        self.errors += 1
+                    break
+                if results is not None:
+                    found[query] = results
+        return found
+
+    def put(self, query: str, results: List[SearchResult], num_results: int = 5):
+        key = self._key(query, num_results)
+        self._near_put(key, results)
+        ttl_ms = int(self.ttl * 1000)
+        if ttl_ms <= 0:
+            # Redis rejects PX 0, and without PX the entry would never expire
+            return
+        payload = json.dumps(results, default=json_default)
+        try:
+            self._node(key).submit([('SET', key, payload, 'PX', ttl_ms)])
+        except OSError:
+            with self._lock:
+                self.errors += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'near_hits': self.near_hits, 'hits': self.hits, 'misses': self.misses,
+                    'errors': self.errors, 'near_entries': len(self._near)}
+
+    def close(self):
+        for node in self.nodes.values():
+            node.close()
+
+
+class _CacheRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        while True:
+            try:
+                command = read_reply(self.rfile)
+            except (ConnectionError, ValueError):
+                return
+            if not isinstance(command, list) or not command:
+                self.wfile.write(b'-ERR expected a command array\r\n')
+                continue
+            self.wfile.write(self.server.execute([bytes(arg) for arg in command]))
+
+
+class MemoryCacheServer(socketserver.ThreadingTCPServer):
+    """
+    In-process stand-in for a Redis cache node, for tests and local runs
+
+    Supports PING, GET, MGET, SET (with EX/PX), DEL, DBSIZE and FLUSHALL.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int] = ('127.0.0.1', 0)):
+        super().__init__(address, _CacheRequestHandler)
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.connections = 0
+        self.commands = 0
+        self._data_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> str:
+        return f"{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self) -> 'MemoryCacheServer':
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05},
+                                        name=f"memory-cache-{self.server_address[1]}", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+    def _value(self, key: bytes) -> Optional[bytes]:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry[0]
+
+    @staticmethod
+    def _bulk(value: Optional[bytes]) -> bytes:
+        return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def execute(self, command: List[bytes]) -> bytes:
+        name, args = command[0].upper(), command[1:]
+        with self._data_lock:
+            self.commands += 1
+            if name == b'PING':
+                return b'+PONG\r\n'
+            if name == b'GET' and len(args) == 1:
+                return self._bulk(self._value(args[0]))
+            if name == b'MGET' and args:
+                return b'*%d\r\n' % len(args) + b''.join(self._bulk(self._value(key)) for key in args)
+            if name == b'SET' and len(args) in (2, 4):
+                expires = None
+                if len(args) == 4:
+                    unit = {b'EX': 1.0, b'PX': 0.001}.get(args[2].upper())
+                    if unit is None:
+                        return b'-ERR syntax error\r\n'
+                    expires = time.monotonic() + int(args[3]) * unit
+                self.data[args[0]] = (args[1], expires)
+                return b'+OK\r\n'
+            if name == b'DEL':
+                return b':%d\r\n' % sum(self.data.pop(key, None) is not None for key in args)
+            if name == b'DBSIZE':
+                return b':%d\r\n' % len(self.data)
+            if name == b'FLUSHALL':
+                self.data.clear()
+                return b'+OK\r\n'
+        return b'-ERR unknown command or wrong number of arguments\r\n'
@@ -0,0 +1,248 @@
+import heapq
+import io
+import itertools
+import json
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+REASONS = {
+    400: 'Bad Request',
+    408: 'Request Timeout',
+    411: 'Length Required',
+    413: 'Payload Too Large',
+    431: 'Request Header Fields Too Large',
+}
+
+
+class PrereadSocket:
+    """
+    A connection whose request has already been read into memory
+
+    Reads come from the buffered bytes; everything else, including writes,
+    goes to the real socket.
+    """
+
+    def __init__(self, sock: socket.socket, data: bytes):
+        self._sock = sock
+        self._data = data
+
+    def makefile(self, mode: str = 'r', *args, **kwargs):
+        if 'r' in mode:
+            return io.BytesIO(self._data)
+        return self._sock.makefile(mode, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+def head_end(buffer: bytearray) -> int:
+    """
+    Offset just past the blank line ending the request head, or -1
+    """
+    crlf = buffer.find(b'\r\n\r\n')
+    lf = buffer.find(b'\n\n')
+    ends = [end for end in (crlf + 4 if crlf >= 0 else -1, lf + 2 if lf >= 0 else -1) if end >= 0]
+    return min(ends) if ends else -1
+
+
+def parse_head(head: bytes) -> Tuple[bytes, Dict[bytes, bytes]]:
+    """
+    The request line and lowercased header fields of a request head
+    """
+    lines = head.split(b'\n')
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(b':')
+        if value:
+            headers[name.strip().lower()] = value.strip()
+    return lines[0].strip(), headers
+
+
+class _Pending:
+    __slots__ = ('sock', 'client_address', 'buffer', 'deadline', 'expected')
+
+    def __init__(self, sock, client_address, deadline):
+        self.sock = sock
+        self.client_address = client_address
+        self.buffer = bytearray()
+        self.deadline = deadline
+        self.expected: Optional[int] = None
+
+
+class RequestReader:
+    """
+    Reads requests off new connections on one selector thread
+
+    A connection is only handed to on_request(sock, client_address, data)
+    once its head and Content-Length body are fully buffered, so a client
+    that trickles its request in (or never finishes it) holds a buffer
+    rather than a worker thread. Requests that take longer than read_timeout
+    get 408, heads over max_header_bytes 431 and bodies over max_body_bytes
+    413; on_rejected(client_address) is then called instead.
+    """
+
+    def __init__(self, on_request: Callable, on_rejected: Callable, read_timeout: float = 15.0,
+                 max_header_bytes: int = 65536, max_body_bytes: int = 1 << 20):
+        self.on_request = on_request
+        self.on_rejected = on_rejected
+        self.read_timeout = read_timeout
+        self.max_header_bytes = max_header_bytes
+        self.max_body_bytes = max_body_bytes
+        self.rejected = 0
+        self._pending: Dict[socket.socket, _Pending] = {}
+        # Deadline heap; entries whose request already finished are skipped when popped
+        self._deadlines: List[Tuple[float, int, _Pending]] = []
+        self._order = itertools.count()
+        self._added: deque = deque()
+        self._lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        self._wakeup, self._wakeup_writer = socket.socketpair()
+        self._wakeup.setblocking(False)
+        self._selector.register(self._wakeup, selectors.EVENT_READ)
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name='request-reader', daemon=True)
+        self._thread.start()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, sock: socket.socket, client_address):
+        sock.setblocking(False)
+        with self._lock:
+            self._added.append(_Pending(sock, client_address, time.monotonic() + self.read_timeout))
+        self._wakeup_writer.send(b'\0')
+
+    def _run(self):
+        while not self._closing:
+            timeout = None
+            if self._deadlines:
+                timeout = max(0.0, self._deadlines[0][0] - time.monotonic())
+            for key, _ in self._selector.select(timeout):
+                if key.fileobj is self._wakeup:
+                    self._register_added()
+                else:
+                    self._read(key.data)
+            self._expire(time.monotonic())
+        self._shutdown()
+
+    def _expire(self, now: float):
+        deadlines = self._deadlines
+        while deadlines:
+            deadline, _, pending = deadlines[0]
+            waiting = self._pending.get(pending.sock) is pending
+            if waiting and deadline > now:
+                return
+            heapq.heappop(deadlines)
+            if waiting:
+                self._reject(pending, 408, "Request not received in time")
+
+    def _register_added(self):
+        try:
+            self._wakeup.recv(4096)
+        except BlockingIOError:
+            pass
+        with self._lock:
+            while self._added:
+                pending = self._added.popleft()
+                self._pending[pending.sock] = pending
+                heapq.heappush(self._deadlines, (pending.deadline, next(self._order), pending))
+                self._selector.register(pending.sock, selectors.EVENT_READ, pending)
+
+    def _read(self, pending: _Pending):
+        try:
+            data = pending.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._forget(pending)
+            self.on_rejected(pending.client_address)
+            pending.sock.close()
+            return
+        pending.buffer += data
+
+        if pending.expected is None:
+            end = head_end(pending.buffer)
+            if end < 0:
+                if len(pending.buffer) > self.max_header_bytes:
+                    self._reject(pending, 431, "Request head too large")
+                return
+            if end > self.max_header_bytes:
+                self._reject(pending, 431, "Request head too large")
+                return
+            request_line, headers = parse_head(bytes(pending.buffer[:end]))
+            if b'transfer-encoding' in headers:
+                self._reject(pending, 411, "Chunked request bodies are not supported")
+                return
+            try:
+                length = int(headers.get(b'content-length', b'0'))
+                if length < 0:
+                    raise ValueError(length)
+            except ValueError:
+                self._reject(pending, 400, "Invalid Content-Length")
+                return
+            if length > self.max_body_bytes:
+                self._reject(pending, 413, f"Request body larger than {self.max_body_bytes} bytes")
+                return
+            pending.expected = end + length
+            if (length and headers.get(b'expect', b'').lower() == b'100-continue'
+                    and request_line.endswith(b'HTTP/1.1') and len(pending.buffer) < pending.expected):
+                self._send(pending.sock, b'HTTP/1.1 100 Continue\r\n\r\n')
+
+        if len(pending.buffer) >= pending.expected:
+            self._forget(pending)
+            pending.sock.setblocking(True)
+            self.on_request(pending.sock, pending.client_address, bytes(pending.buffer))
+
+    @staticmethod
+    def _send(sock: socket.socket, data: bytes):
+        try:
+            sock.send(data)
+        except OSError:
+            pass
+
+    def _reject(self, pending: _Pending, status: int, message: str):
+        self._forget(pending)
+        body = json.dumps({'error': message}).encode()
+        self._send(pending.sock, (f"HTTP/1.0 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                                  f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode() + body)
+        self.rejected += 1
+        self.on_rejected(pending.client_address)
+        pending.sock.close()
+
+    def _forget(self, pending: _Pending):
+        self._pending.pop(pending.sock, None)
+        try:
+            self._selector.unregister(pending.sock)
+        except (KeyError, ValueError):
+            pass
+
+    def _shutdown(self):
+        # Runs on the selector thread as it exits, so nothing is torn down under a callback
+        for pending in list(self._pending.values()):
+            self._forget(pending)
+            pending.sock.close()
+            self.on_rejected(pending.client_address)
+        self._selector.close()
+        self._wakeup.close()
+        self._wakeup_writer.close()
+
+    def close(self, timeout: float = 5.0) -> bool:
+        """
+        Stop reading, closing connections whose requests are incomplete
+
+        Returns False if the selector thread is still busy after timeout;
+        it then cleans up as soon as its current callback returns.
+        """
+        with self._lock:
+            if not self._closing:
+                self._closing = True
+                self._wakeup_writer.send(b'\0')
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
@@ -0,0 +1,78 @@
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from query_cache import normalize_query
+from search_result import SearchResult
+
+
+def encode_cursor(query: str, offset: int) -> str:
+    """
+    Opaque cursor for the page of a query's results starting at offset
+    """
+    raw = json.dumps([query, offset], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Return the (query, offset) a cursor points at, raising ValueError if malformed
+    """
+    try:
+        query, offset = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not isinstance(query, str) or not isinstance(offset, int) or offset < 0:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return query, offset
+
+
+class ResultStore:
+    """
+    Short-lived store of full result sets, so later pages of a query are
+    served without another upstream request
+
+    Entries are keyed by the normalised query, expire ttl seconds after
+    they were stored and are evicted least recently used beyond max_entries.
+    Cursors carry the query itself, so a page requested after its entry
+    expired is still answered, by searching again.
+    """
+
+    def __init__(self, ttl: float = 120.0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[float, List[SearchResult]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query: str) -> Optional[List[SearchResult]]:
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, query: str, results: List[SearchResult]):
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, list(results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, query: str) -> bool:
+        entry = self._entries.get(normalize_query(query))
+        return entry is not None and entry[0] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,125 @@
+import json
+import math
+import re
+import threading
+from collections import Counter
+from heapq import nlargest
+from typing import Dict, List, Tuple
+
+from search_result import SearchResult, json_default
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does',
+    'for', 'from', 'how', 'i', 'in', 'is', 'it', 'me', 'of', 'on', 'or',
+    'tell', 'that', 'the', 'this', 'to', 'was', 'what', 'when', 'where',
+    'which', 'who', 'why', 'with', 'about',
+])
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase alphanumeric terms, dropping stop words
+    """
+    return [term for term in TOKEN_PATTERN.findall(text.lower()) if term not in STOP_WORDS]
+
+
+class SearchIndex:
+    """
+    Incrementally updated in-memory BM25 inverted index over search results
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents: List[SearchResult] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.total_length = 0
+        self._doc_ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, result: Dict[str, str]) -> bool:
+        """
+        Index a single result; returns False if its content is already indexed
+        """
+        content = result.get('content', '')
+        if not content:
+            return False
+
+        terms = Counter(tokenize(result.get('title', '') + ' ' + content))
+        with self._lock:
+            if content in self._doc_ids:
+                return False
+            doc_id = len(self.documents)
+            self._doc_ids[content] = doc_id
+            self.documents.append(SearchResult.from_dict(result))
+            length = sum(terms.values())
+            self.doc_lengths.append(length)
+            self.total_length += length
+            for term, count in terms.items():
+                self.postings.setdefault(term, {})[doc_id] = count
+        return True
+
+    def add_results(self, results: List[Dict[str, str]]) -> int:
+        """
+        Index a batch of results and return how many were new
+        """
+        return sum(1 for result in results if self.add(result))
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[float, SearchResult]]:
+        """
+        Return up to k (score, result) pairs ranked by BM25
+
+        Scores are divided by the summed IDF of the query terms and capped at
+        1, so a document matching every term once at average length scores 1
+        and a single threshold works across queries. Query terms the index
+        has never seen count against the score.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            num_docs = len(self.documents)
+            if not num_docs:
+                return []
+            avg_length = self.total_length / num_docs
+
+            scores: Dict[int, float] = {}
+            max_score = 0.0
+            for term in terms:
+                postings = self.postings.get(term, {})
+                idf = math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                max_score += idf
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            best = nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(min(score / max_score, 1.0), self.documents[doc_id]) for doc_id, score in best]
+
+    def save(self, path: str):
+        """
+        Persist the indexed documents to a JSON file
+        """
+        with self._lock:
+            data = {'k1': self.k1, 'b': self.b, 'documents': list(self.documents)}
+        with open(path, 'w') as f:
+            json.dump(data, f, default=json_default)
+
+    @classmethod
+    def load(cls, path: str) -> 'SearchIndex':
+        """
+        Rebuild an index from a file written by save()
+        """
+        with open(path, 'r') as f:
+            data = json.load(f)
+        index = cls(k1=data.get('k1', 1.5), b=data.get('b', 0.75))
+        index.add_results(data.get('documents', []))
+        return index
@@ -0,0 +1,81 @@
+import sys
+from typing import Any, Dict, Iterator, Mapping
+
+
+class SearchResult:
+    """
+    Compact search result record that still reads like a dict
+
+    Uses __slots__ instead of a per-result dict and interns source URLs, so
+    the same URL returned by many searches is stored once. Supports
+    result['content'], result.get(...), 'title' in result and dict(result).
+    """
+
+    __slots__ = ('title', 'content', 'source')
+
+    def __init__(self, title: str = '', content: str = '', source: str = ''):
+        self.title = title
+        self.content = content
+        self.source = sys.intern(source)
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, str]) -> 'SearchResult':
+        if isinstance(data, cls):
+            return data
+        return cls(data.get('title', ''), data.get('content', ''), data.get('source', ''))
+
+    def to_dict(self) -> Dict[str, str]:
+        return {'title': self.title, 'content': self.content, 'source': self.source}
+
+    def __getitem__(self, key: str) -> str:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self.__slots__:
+            return default
+        return getattr(self, key)
+
+    def keys(self):
+        return self.__slots__
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.__slots__]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__slots__
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, SearchResult):
+            return (self.title, self.content, self.source) == (other.title, other.content, other.source)
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"SearchResult(title={self.title!r}, content={self.content!r}, source={self.source!r})"
+
+    def __getstate__(self):
+        return (self.title, self.content, self.source)
+
+    def __setstate__(self, state):
+        self.title, self.content, source = state
+        self.source = sys.intern(source)
+
+
+def json_default(obj: Any) -> Any:
+    """
+    json.dumps default hook that serialises SearchResult records
+    """
+    if isinstance(obj, SearchResult):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
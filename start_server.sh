@@ -1,5 +1,18 @@
 #!/bin/bash
 
+PID_FILE="web_server.pid"
+
+# Reload a running server without dropping connections
+if [ "$1" = "reload" ]; then
+    if [ -f "$PID_FILE" ] && kill -0 "$(cat "$PID_FILE")" 2>/dev/null; then
+        echo "Reloading Web Search Agent server..."
+        kill -HUP "$(cat "$PID_FILE")"
+        exit 0
+    fi
+    echo "No running server found ($PID_FILE)."
+    exit 1
+fi
+
 # Activate virtual environment if it exists
 if [ -d "venv" ]; then
     source venv/bin/activate
@@ -10,4 +23,4 @@ fi
 
 # Start the web server
 echo "Starting Web Search Agent server..."
-python3 web_server.py
\ No newline at end of file
+python3 web_server.py --pid-file "$PID_FILE" "$@"
@@ -0,0 +1,120 @@
+import heapq
+import threading
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+def normalize_suggestion(text: str) -> str:
+    """
+    Lowercase and collapse whitespace, keeping stop words so completions
+    read like what users typed
+    """
+    return ' '.join(text.lower().split())
+
+
+class SuggestionIndex:
+    """
+    Popularity-ranked completions for query prefixes
+
+    Past queries are kept in a sorted list, so the queries sharing a prefix
+    are one contiguous slice found by binary search. Short prefixes match
+    too many queries to rank on every keystroke, so each prefix of up to
+    max_prefix characters keeps its own list of the most popular
+    completions, updated as queries are added. The final ranking multiplies
+    a query's count by cached_boost when is_cached(query) says it can be
+    answered without an upstream request, nudging users towards cache hits.
+    """
+
+    def __init__(self, k: int = 8, max_prefix: int = 4, candidates: int = 32, cached_boost: float = 4.0,
+                 max_queries: int = 100000, max_length: int = 100, scan_limit: int = 2000,
+                 is_cached: Optional[Callable[[str], bool]] = None):
+        self.k = k
+        self.max_prefix = max_prefix
+        self.candidates = candidates
+        self.cached_boost = cached_boost
+        self.max_queries = max_queries
+        self.max_length = max_length
+        self.scan_limit = scan_limit
+        self.is_cached = is_cached
+        self._counts: Dict[str, int] = {}
+        self._sorted: List[str] = []
+        self._top: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def add(self, query: str, weight: int = 1):
+        """
+        Count one more use of a query
+        """
+        text = normalize_suggestion(query)
+        if not text or len(text) > self.max_length:
+            return
+        with self._lock:
+            if text not in self._counts:
+                self._counts[text] = 0
+                insort(self._sorted, text)
+            self._counts[text] += weight
+            for n in range(1, min(self.max_prefix, len(text)) + 1):
+                self._promote(self._top.setdefault(text[:n], []), text)
+            if len(self._counts) > self.max_queries:
+                self._prune()
+
+    def add_many(self, queries: Iterable[str]):
+        for query in queries:
+            self.add(query)
+
+    def _promote(self, top: List[str], text: str):
+        counts = self._counts
+        count = counts[text]
+        if text in top:
+            top.remove(text)
+        elif len(top) >= self.candidates and counts[top[-1]] >= count:
+            return
+        position = len(top)
+        while position > 0 and counts[top[position - 1]] < count:
+            position -= 1
+        top.insert(position, text)
+        del top[self.candidates:]
+
+    def _prune(self):
+        # Forget the least popular tenth, then rebuild the prefix lists
+        keep = heapq.nlargest(self.max_queries * 9 // 10, self._counts.items(), key=lambda item: item[1])
+        self._counts = dict(keep)
+        self._sorted = sorted(self._counts)
+        self._top = {}
+        for text, _ in keep:
+            for n in range(1, min(self.max_prefix, len(text)) + 1):
+                top = self._top.setdefault(text[:n], [])
+                if len(top) < self.candidates:
+                    top.append(text)
+
+    def _candidates(self, prefix: str) -> List[str]:
+        if len(prefix) <= self.max_prefix:
+            return list(self._top.get(prefix, ()))
+        matches = [text for text in self._top.get(prefix[:self.max_prefix], ()) if text.startswith(prefix)]
+        if len(matches) >= self.candidates:
+            return matches
+        # Queries too rare for the short prefix's list: rank the matching slice directly
+        lo = bisect_left(self._sorted, prefix)
+        hi = bisect_left(self._sorted, prefix + '\uffff', lo, min(len(self._sorted), lo + self.scan_limit))
+        ranked = heapq.nlargest(self.candidates, self._sorted[lo:hi], key=self._counts.__getitem__)
+        return list(dict.fromkeys(matches + ranked))
+
+    def suggest(self, prefix: str, k: Optional[int] = None) -> List[str]:
+        """
+        The most popular past queries starting with prefix, cached ones first
+        """
+        text = normalize_suggestion(prefix)
+        if text and prefix[-1:].isspace():
+            text += ' '
+        if not text:
+            return []
+        with self._lock:
+            scored = [(self._counts[candidate], candidate) for candidate in self._candidates(text)]
+        if self.is_cached is not None:
+            scored = [(count * self.cached_boost if self.is_cached(candidate) else count, candidate)
+                      for count, candidate in scored]
+        scored.sort(key=lambda item: -item[0])
+        return [candidate for _, candidate in scored[:k or self.k]]
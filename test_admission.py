@@ -0,0 +1,163 @@
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from unittest.mock import Mock
+import pytest
+import requests
+from admission import Lane, LaneScheduler, Overloaded
+from web_server import WebSearchHandler
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+class TestLaneScheduler:
+    """Test suite for weighted fair admission"""
+    
+    def test_weighted_share_under_contention(self):
+        """Test that a saturated high-weight lane gets proportionally more slots"""
+        scheduler = LaneScheduler([
+            Lane('interactive', weight=3.0, concurrency=1, max_queue_time=10.0),
+            Lane('bulk', weight=1.0, concurrency=1, max_queue_time=10.0)
+        ], capacity=1)
+        order = []
+        
+        def work(lane):
+            with scheduler.admit(lane):
+                order.append(lane)
+        
+        scheduler.acquire('bulk')
+        threads = [threading.Thread(target=work, args=(lane,)) for lane in ['interactive', 'bulk'] * 8]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: sum(lane['queued'] for lane in scheduler.status().values()) == 16)
+        scheduler.release('bulk')
+        for thread in threads:
+            thread.join()
+        
+        assert order[:8].count('interactive') >= 5
+        assert len(order) == 16
+    
+    def test_lane_concurrency_cap(self):
+        """Test that a lane never runs more than its own concurrency"""
+        scheduler = LaneScheduler([Lane('bulk', concurrency=2, max_queue_time=0.05)], capacity=8)
+        scheduler.acquire('bulk')
+        scheduler.acquire('bulk')
+        
+        with pytest.raises(Overloaded) as excinfo:
+            scheduler.acquire('bulk')
+        
+        assert excinfo.value.lane == 'bulk'
+        assert scheduler.status()['bulk'] == {'queued': 0, 'active': 2, 'admitted': 2, 'shed': 1}
+    
+    def test_idle_capacity_is_shared(self):
+        """Test that one lane can use capacity another lane leaves idle"""
+        scheduler = LaneScheduler([Lane('interactive', concurrency=4), Lane('bulk', concurrency=4)], capacity=4)
+        for _ in range(4):
+            scheduler.acquire('bulk')
+        
+        assert scheduler.running == 4
+    
+    def test_shed_interactive_while_bulk_keeps_waiting(self):
+        """Test that each lane sheds on its own queue-time budget"""
+        scheduler = LaneScheduler([
+            Lane('interactive', max_queue_time=0.05),
+            Lane('bulk', max_queue_time=5.0)
+        ], capacity=1)
+        scheduler.acquire('bulk')
+        admitted = threading.Event()
+        
+        def bulk():
+            with scheduler.admit('bulk'):
+                admitted.set()
+        
+        thread = threading.Thread(target=bulk)
+        thread.start()
+        with pytest.raises(Overloaded):
+            scheduler.acquire('interactive')
+        scheduler.release('bulk')
+        thread.join()
+        
+        assert admitted.is_set()
+
+
+class TestRequestClassification:
+    """Test suite for mapping requests to lanes"""
+    
+    def setup_method(self):
+        WebSearchHandler.set_admission(LaneScheduler([Lane('interactive', weight=4.0), Lane('bulk')]),
+                                       {'secret': 'interactive'})
+    
+    def teardown_method(self):
+        WebSearchHandler.set_admission(None)
+    
+    def classify(self, command, headers):
+        handler = WebSearchHandler.__new__(WebSearchHandler)
+        handler.command = command
+        handler.headers = headers
+        return handler.request_lane()
+    
+    def test_route(self):
+        """Test that the browser UI POST is interactive and GET is bulk"""
+        assert self.classify('POST', {}) == 'interactive'
+        assert self.classify('GET', {}) == 'bulk'
+    
+    def test_header_and_api_key(self):
+        """Test that an API key wins over the header, which can only lower the route's lane"""
+        assert self.classify('POST', {'X-Priority': 'bulk'}) == 'bulk'
+        assert self.classify('GET', {'X-Priority': 'interactive'}) == 'bulk'
+        assert self.classify('GET', {'X-Priority': 'unknown'}) == 'bulk'
+        assert self.classify('GET', {'X-API-Key': 'secret', 'X-Priority': 'bulk'}) == 'interactive'
+    
+    def test_unknown_api_key_lane_rejected(self):
+        """Test that mapping an API key to a lane the scheduler lacks fails at setup"""
+        with pytest.raises(ValueError, match='batch'):
+            WebSearchHandler.set_admission(LaneScheduler([Lane('interactive'), Lane('bulk')]), {'key': 'batch'})
+
+
+class TestAdmissionEndpoint:
+    """Test that the server sheds overloaded lanes with 503"""
+    
+    def setup_method(self):
+        self.release = threading.Event()
+        agent = Mock()
+        agent.search_web.side_effect = lambda query, num_results=5: (query != 'one' or self.release.wait(5)) and []
+        WebSearchHandler.set_agent(agent)
+        self.scheduler = LaneScheduler([
+            Lane('interactive', concurrency=1, max_queue_time=5.0),
+            Lane('bulk', concurrency=1, max_queue_time=0.05)
+        ], capacity=2)
+        WebSearchHandler.set_admission(self.scheduler)
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), WebSearchHandler)
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+    
+    def teardown_method(self):
+        self.release.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        WebSearchHandler.set_admission(None)
+        WebSearchHandler.set_agent(None)
+    
+    def test_bulk_shed_interactive_served(self):
+        """Test that a saturated bulk lane sheds while interactive requests still run"""
+        first = threading.Thread(target=requests.get, args=(f"{self.base}/search?q=one",), kwargs={'timeout': 10})
+        first.start()
+        wait_for(lambda: self.scheduler.status()['bulk']['active'] == 1)
+        
+        shed = requests.get(f"{self.base}/search?q=two", timeout=10)
+        
+        assert shed.status_code == 503
+        assert shed.headers['Retry-After'] == '1'
+        assert shed.json()['lane'] == 'bulk'
+        
+        interactive = requests.post(f"{self.base}/search", data=json.dumps({'query': 'three'}), timeout=10)
+        self.release.set()
+        first.join()
+        assert interactive.status_code == 200
+        assert interactive.json() == {'results': [], 'next_cursor': None}
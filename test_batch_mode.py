@@ -0,0 +1,77 @@
+import io
+import json
+import threading
+import time
+import pytest
+from web_search_agent import WebSearchAgent
+
+
+class TestBatchMode:
+    """Test suite for the non-interactive batch mode"""
+    
+    def setup_method(self):
+        """Set up an agent whose answers take a question-dependent time"""
+        self.agent = WebSearchAgent()
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        
+        def process_question(question, remember=True):
+            with self.lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            time.sleep(0.05 if question.endswith('slow') else 0.01)
+            with self.lock:
+                self.active -= 1
+            if question == 'boom':
+                raise RuntimeError('upstream exploded')
+            return f'answer to {question}'
+        
+        self.agent.process_question = process_question
+    
+    def run(self, lines, parallelism=4):
+        output = io.StringIO()
+        stats = self.agent.batch_loop(lines, output, parallelism=parallelism, progress=None)
+        return [json.loads(line) for line in output.getvalue().splitlines()], stats
+    
+    def test_answers_in_input_order(self):
+        """Test that answers are written in input order despite concurrency"""
+        lines = [json.dumps({'id': i, 'question': f'q{i}' + (' slow' if i % 3 == 0 else '')}) for i in range(20)]
+        
+        answers, stats = self.run(lines)
+        
+        assert [answer['id'] for answer in answers] == list(range(20))
+        assert answers[1]['answer'] == 'answer to q1'
+        assert stats['processed'] == 20
+        assert self.max_active > 1
+    
+    def test_parallelism_limit(self):
+        """Test that no more than parallelism questions run at once"""
+        self.run([json.dumps({'question': f'q{i}'}) for i in range(30)], parallelism=3)
+        
+        assert self.max_active <= 3
+    
+    def test_errors_are_reported_inline(self):
+        """Test that bad lines and failures produce error records in place"""
+        lines = ['not json', json.dumps({'id': 'x'}), json.dumps('bare string'), json.dumps({'query': 'boom'}), '']
+        
+        answers, stats = self.run(lines)
+        
+        assert answers[0] == {'error': 'Invalid JSON'}
+        assert answers[1] == {'error': 'No question provided'}
+        assert answers[2]['answer'] == 'answer to bare string'
+        assert answers[3]['error'] == 'upstream exploded'
+        assert stats['errors'] == 3
+    
+    def test_batch_does_not_grow_history(self):
+        """Test that batch questions leave conversation history alone"""
+        agent = WebSearchAgent()
+        agent.search_web = lambda query, num_results=5: [
+            {'title': 'T', 'content': f'About {query}', 'source': 'https://example.com'}
+        ]
+        output = io.StringIO()
+        
+        agent.batch_loop([json.dumps({'question': 'python'})], output, progress=None)
+        
+        assert agent.conversation_history == []
+        assert 'About python' in json.loads(output.getvalue())['answer']
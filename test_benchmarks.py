@@ -0,0 +1,65 @@
+import json
+import random
+import pytest
+from benchmarks.hot_paths import PAYLOAD_TOPICS, benchmarks, canned_payload, compare, mann_whitney_p, run
+from ddg_parser import parse_instant_answer
+
+
+class TestRegressionCheck:
+    """Test suite for the baseline comparison statistics"""
+    
+    def setup_method(self):
+        rng = random.Random(42)
+        self.baseline = [1.0 + rng.gauss(0, 0.02) for _ in range(20)]
+        self.same = [1.0 + rng.gauss(0, 0.02) for _ in range(20)]
+        self.slower = [1.2 + rng.gauss(0, 0.02) for _ in range(20)]
+    
+    def test_mann_whitney(self):
+        """Test that a clear slowdown is significant and noise is not"""
+        assert mann_whitney_p(self.slower, self.baseline) < 0.001
+        assert mann_whitney_p(self.same, self.baseline) > 0.01
+        assert mann_whitney_p(self.baseline, self.slower) > 0.99
+        assert mann_whitney_p([1.0] * 10, [1.0] * 10) == 1.0
+    
+    def test_compare_flags_regressions(self):
+        """Test that only significant slowdowns beyond min_change fail"""
+        baseline = {'a': {'median': 1.0, 'samples': self.baseline},
+                    'b': {'median': 1.0, 'samples': self.baseline}}
+        current = {'a': {'median': 1.2, 'samples': self.slower},
+                   'b': {'median': 1.0, 'samples': self.same},
+                   'c': {'median': 1.0, 'samples': self.same}}
+        
+        rows = {row['name']: row for row in compare(current, baseline)}
+        
+        assert rows['a']['status'] == 'REGRESSION'
+        assert rows['b']['status'] == 'ok'
+        assert rows['c']['status'] == 'new'
+        assert compare(current, baseline, min_change=0.5)[0]['status'] == 'ok'
+
+
+class TestBenchmarks:
+    """Smoke tests for the benchmark cases"""
+    
+    def test_canned_payloads_parse(self):
+        """Test that every canned payload yields the abstract and topics"""
+        for topics in PAYLOAD_TOPICS.values():
+            results = parse_instant_answer([canned_payload(topics)])
+            assert results[0]['content'].startswith('Python is')
+            assert len(results) == 6
+    
+    def test_run_records_samples(self):
+        """Test that a filtered run records per-call samples for each case"""
+        results = run(['generate_response', 'handler.post'], repeats=3)
+        
+        assert set(results) == {'generate_response', 'handler.post_search'}
+        assert all(len(result['samples']) == 3 and result['median'] > 0 for result in results.values())
+        json.dumps(results)
+    
+    def test_stub_servers_stopped_after_use(self):
+        """Test that the stub upstream and handler servers are shut down when the block exits"""
+        with benchmarks() as cases:
+            request = cases['handler.get_search']
+            request()
+        
+        with pytest.raises(OSError):
+            request()
@@ -1,17 +1,24 @@
 #!/usr/bin/env python3
+import pytest
 import requests
 import json
-import time
-from urllib.parse import urlencode
+from web_server import start_server
 
-def test_browser_like_request():
+@pytest.fixture(scope='module')
+def base_url():
+    """Run the server in-process on a free port for this module"""
+    server = start_server(port=0)
+    yield server.url
+    server.shutdown()
+
+def test_browser_like_request(base_url):
     """Test requests exactly like a browser would make them"""
     
     print("Testing browser-like requests...")
     
     # Test 1: GET the main page (like opening in browser)
     print("\n1. Loading main page...")
-    response = requests.get('http://localhost:8000/')
+    response = requests.get(f'{base_url}/')
     print(f"Status: {response.status_code}")
     print(f"Content-Type: {response.headers.get('content-type')}")
     if response.status_code != 200:
@@ -24,7 +31,7 @@ def test_browser_like_request():
     
     # Make the request exactly like the JavaScript would
     response = requests.post(
-        'http://localhost:8000/search',
+        f'{base_url}/search',
         headers={
             'Content-Type': 'application/json',
             'User-Agent': 'Mozilla/5.0 (compatible browser)'
@@ -47,7 +54,7 @@ def test_browser_like_request():
             print(f"JSON parse error: {e}")
             print(f"Raw response: {response.text}")
 
-def test_method_debugging():
+def test_method_debugging(base_url):
     """Debug which HTTP methods are actually being handled"""
     
     print("\n3. Testing different HTTP methods...")
@@ -57,14 +64,14 @@ def test_method_debugging():
     for method in methods:
         try:
             if method == 'GET':
-                response = requests.get('http://localhost:8000/search?q=test')
+                response = requests.get(f'{base_url}/search?q=test')
             elif method == 'POST':
-                response = requests.post('http://localhost:8000/search', 
+                response = requests.post(f'{base_url}/search', 
                                        json={'query': 'test'})
             elif method == 'PUT':
-                response = requests.put('http://localhost:8000/search')
+                response = requests.put(f'{base_url}/search')
             else:
-                response = requests.delete('http://localhost:8000/search')
+                response = requests.delete(f'{base_url}/search')
             
             print(f"{method}: {response.status_code} - {response.text[:50]}...")
         except Exception as e:
@@ -72,20 +79,12 @@ def test_method_debugging():
 
 if __name__ == '__main__':
     # Start server first
-    import subprocess
-    import signal
-    
     print("Starting server...")
-    server_process = subprocess.Popen([
-        'bash', '-c', 
-        'source venv/bin/activate && python3 web_server.py'
-    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    server = start_server(port=0)
     
     try:
-        time.sleep(2)  # Let server start
-        test_browser_like_request()
-        test_method_debugging()
+        test_browser_like_request(server.url)
+        test_method_debugging(server.url)
     finally:
-        server_process.terminate()
-        server_process.wait(timeout=5)
+        server.shutdown()
         print("\nServer stopped.")
\ No newline at end of file
@@ -0,0 +1,109 @@
+import json
+import random
+import pytest
+from cache_simulator import POLICIES, LFUCache, LRUCache, main, read_trace, simulate
+
+
+class TestReadTrace:
+    """Test suite for trace parsing"""
+    
+    def test_formats(self):
+        """Test JSONL, tab-separated and bare-query lines"""
+        lines = [
+            json.dumps({'timestamp': 10, 'query': 'python'}),
+            json.dumps({'ts': '2024-01-01T00:00:00Z', 'title': 'rust'}),
+            '20\tgolang',
+            'java',
+            '',
+        ]
+        
+        events = list(read_trace(lines))
+        
+        assert [timestamp for timestamp, key in events] == [10.0, 1704067200.0, 20.0, 20.0]
+        assert len(set(key for timestamp, key in events)) == 4
+    
+    def test_paraphrases_share_a_key(self):
+        """Test that queries are normalised like the real cache's exact key"""
+        events = list(read_trace(['python programming', ' Python  programming', 'why python programming']))
+        
+        assert events[0][1] == events[1][1]
+        assert events[0][1] != events[2][1]
+
+
+class TestPolicies:
+    """Test suite for the simulated eviction policies"""
+    
+    def test_lru_hits_and_evictions(self):
+        """Test LRU on a hand-checked sequence"""
+        cache = LRUCache(2)
+        hits = [cache.access(key, 0) for key in [1, 2, 1, 3, 2, 1]]
+        
+        assert hits == [False, False, True, False, False, False]
+    
+    def test_ttl_expiry(self):
+        """Test that entries expire after their TTL"""
+        cache = LRUCache(10, ttl=5)
+        
+        assert not cache.access(1, 0)
+        assert cache.access(1, 4)
+        assert not cache.access(1, 6)
+    
+    @pytest.mark.parametrize('policy', sorted(POLICIES))
+    def test_capacity_is_respected(self, policy):
+        """Test that no policy holds more entries than its capacity"""
+        cache = POLICIES[policy](50, ttl=30)
+        rng = random.Random(0)
+        for now in range(5000):
+            cache.access(rng.randint(0, 400), now)
+            assert len(cache) <= 50
+        assert cache.hits + cache.misses == 5000
+    
+    def test_lfu_evicts_expired_entries_first(self):
+        """Test that an expired hot entry goes before a live cold one"""
+        cache = LFUCache(2, ttl=10)
+        for now in range(5):
+            cache.access(1, now)
+        cache.access(2, 8)
+        
+        assert not cache.access(3, 12)
+        assert cache.access(2, 13)
+        assert 1 not in cache.entries
+    
+    def test_frequency_policies_resist_scans(self):
+        """Test that LFU and W-TinyLFU keep a hot set through a scan"""
+        rng = random.Random(0)
+        events = []
+        for now in range(20000):
+            key = rng.randint(0, 49) if now % 2 else 1000 + now
+            events.append((now, key))
+        
+        rows = {row['policy']: row for row in simulate(events, ['lru', 'lfu', 'tinylfu'], [60], [0])}
+        
+        assert rows['lfu']['hit_ratio'] > rows['lru']['hit_ratio']
+        assert rows['tinylfu']['hit_ratio'] > rows['lru']['hit_ratio']
+
+
+@pytest.mark.parametrize('option', [['--sizes', '0'], ['--sizes', '10,-1'], ['--ttls', '-5']])
+def test_cli_rejects_bad_sizes_and_ttls(tmp_path, option):
+    """Test that non-positive sizes and negative TTLs are usage errors"""
+    trace = tmp_path / 'trace.txt'
+    trace.write_text('python\n')
+    
+    with pytest.raises(SystemExit) as exit_info:
+        main([str(trace)] + option)
+    
+    assert exit_info.value.code == 2
+
+
+def test_cli_json_report(tmp_path, capsys):
+    """Test the command-line report"""
+    trace = tmp_path / 'trace.jsonl'
+    trace.write_text('\n'.join(json.dumps({'timestamp': i, 'query': f'q{i % 3}'}) for i in range(30)))
+    
+    main([str(trace), '--policies', 'lru,arc', '--sizes', '2,5', '--ttls', '0', '--entry-bytes', '1000', '--json'])
+    
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert len(rows) == 4
+    big = next(row for row in rows if row['policy'] == 'lru' and row['size'] == 5)
+    assert big['upstream_calls'] == 3
+    assert big['memory_bytes'] >= 3 * 1000
@@ -0,0 +1,108 @@
+import json
+import pytest
+from ddg_parser import TruncatedResponse, parse_instant_answer
+
+
+PAYLOAD = {
+    'Abstract': 'Python is a programming language',
+    'AbstractSource': 'Wikipedia',
+    'AbstractText': 'Python Programming',
+    'AbstractURL': 'https://python.org',
+    'Infobox': {'content': [{'label': 'Paradigm', 'value': 'multi "paradigm" \\ ä'}], 'meta': [1, 2.5, None, True]},
+    'RelatedTopics': [
+        {'FirstURL': 'https://duckduckgo.com/a', 'Icon': {'URL': ''}, 'Result': '<a>A</a>', 'Text': 'Topic A'},
+        {'Name': 'Group', 'Topics': [
+            {'FirstURL': 'https://duckduckgo.com/b', 'Text': 'Topic B ünïcode'},
+            {'FirstURL': 'https://duckduckgo.com/c', 'Text': 'Topic C'},
+        ]},
+        {'FirstURL': 'https://duckduckgo.com/d', 'Text': 'Topic D'},
+    ],
+    'Results': [],
+    'Type': 'A'
+}
+
+
+def chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+class TestParseInstantAnswer:
+    """Test suite for the streaming instant answer parser"""
+    
+    def test_abstract_and_flattened_topics(self):
+        """Test that nested topic groups are flattened in order"""
+        results = parse_instant_answer([json.dumps(PAYLOAD).encode()], num_results=5)
+        
+        assert results[0]['content'] == 'Python is a programming language'
+        assert results[0]['title'] == 'Python Programming'
+        assert [r['content'] for r in results[1:]] == ['Topic A', 'Topic B ünïcode', 'Topic C', 'Topic D']
+        assert results[2]['source'] == 'https://duckduckgo.com/b'
+    
+    @pytest.mark.parametrize('size', [1, 2, 3, 7, 64])
+    def test_any_chunk_boundaries(self, size):
+        """Test that values split across chunks (including UTF-8 sequences) parse identically"""
+        body = json.dumps(PAYLOAD, ensure_ascii=False).encode()
+        
+        assert parse_instant_answer(chunked(body, size)) == parse_instant_answer([body])
+    
+    def test_stops_once_enough_results(self):
+        """Test that reading stops after num_results topics"""
+        payload = dict(PAYLOAD, RelatedTopics=[{'Text': f'Topic {i}'} for i in range(1000)])
+        body = json.dumps(payload).encode()
+        consumed = []
+        
+        def chunks():
+            for chunk in chunked(body, 256):
+                consumed.append(len(chunk))
+                yield chunk
+        
+        results = parse_instant_answer(chunks(), num_results=3)
+        
+        assert [r['content'] for r in results[1:]] == ['Topic 0', 'Topic 1', 'Topic 2']
+        assert sum(consumed) < len(body) / 4
+    
+    def test_byte_cap_returns_complete_prefix(self):
+        """Test that a body over the cap yields the results read before it"""
+        payload = dict(PAYLOAD, RelatedTopics=[{'Text': 'x' * 1000}] * 50)
+        body = json.dumps(payload).encode()
+        
+        results = parse_instant_answer(chunked(body, 512), num_results=50, max_bytes=4096)
+        
+        assert results[0]['content'] == 'Python is a programming language'
+        assert 1 < len(results) < 5
+    
+    def test_byte_cap_before_any_result_raises(self):
+        """Test that a body capped before the first result is an error, not an empty answer"""
+        payload = {'Infobox': 'x' * 10000, 'RelatedTopics': [{'Text': 'Topic A'}]}
+        
+        with pytest.raises(TruncatedResponse):
+            parse_instant_answer([json.dumps(payload).encode()], max_bytes=4096)
+    
+    def test_non_string_fields_ignored(self):
+        """Test that non-string URLs and texts do not break result construction"""
+        payload = {'Abstract': 5, 'AbstractURL': ['x'],
+                   'RelatedTopics': [{'Text': 'One', 'FirstURL': 42}, {'Text': {'a': 1}}, {'Text': 'Two', 'FirstURL': None}]}
+        
+        results = parse_instant_answer([json.dumps(payload).encode()])
+        
+        assert [(r['content'], r['source']) for r in results] == [('One', ''), ('Two', '')]
+    
+    def test_num_results_counts_only_text_topics(self):
+        """Test that topics without text do not use up the result budget"""
+        payload = {'RelatedTopics': [{'Name': 'Empty', 'Topics': []}, {'FirstURL': 'x'}, {'Text': 'One'}, {'Text': 'Two'}]}
+        
+        results = parse_instant_answer([json.dumps(payload).encode()], num_results=2)
+        
+        assert [r['content'] for r in results] == ['One', 'Two']
+    
+    def test_empty_answer(self):
+        """Test that an answer without abstract or topics yields nothing"""
+        assert parse_instant_answer([b'{"Abstract": "", "RelatedTopics": []}']) == []
+    
+    def test_invalid_body_raises(self):
+        """Test that non-JSON or cut-off bodies are errors, not empty answers"""
+        with pytest.raises(ValueError):
+            parse_instant_answer([b'<html>rate limited</html>'])
+        with pytest.raises(ValueError):
+            parse_instant_answer([b'{"Abstract": "cut of'])
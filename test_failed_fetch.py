@@ -1,34 +1,29 @@
 import pytest
-import subprocess
 import time
 from playwright.sync_api import sync_playwright, expect
+from web_server import start_server
 
 class TestFailedFetch:
     """Playwright test specifically for the 'failed to fetch' error"""
     
-    server_process = None
+    server = None
     
     @classmethod
     def setup_class(cls):
         """Start web server before tests"""
         print("Starting web server for failed fetch tests...")
-        cls.server_process = subprocess.Popen([
-            'bash', '-c', 
-            'source venv/bin/activate && python3 web_server.py'
-        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        time.sleep(3)
+        cls.server = start_server(port=0)
     
     @classmethod
     def teardown_class(cls):
         """Stop web server after tests"""
-        if cls.server_process:
-            cls.server_process.terminate()
-            cls.server_process.wait(timeout=5)
+        if cls.server:
+            cls.server.shutdown()
             print("Web server stopped")
     
     def test_search_shows_searching_then_results(self, page):
         """Test that search shows 'Searching...' then results"""
-        page.goto("http://localhost:8000")
+        page.goto(self.server.url)
         
         # Enter search query
         search_input = page.locator("#query")
@@ -53,7 +48,7 @@ class TestFailedFetch:
     
     def test_search_failed_to_fetch_scenario(self, page):
         """Test scenario that reproduces 'failed to fetch' error"""
-        page.goto("http://localhost:8000")
+        page.goto(self.server.url)
         
         # Monitor network requests
         network_requests = []
@@ -127,7 +122,7 @@ class TestFailedFetch:
     
     def test_server_availability(self, page):
         """Test that server is actually responding"""
-        page.goto("http://localhost:8000")
+        page.goto(self.server.url)
         
         # Page should load
         expect(page).to_have_title("Web Search Agent")
@@ -177,7 +172,7 @@ class TestFailedFetch:
         
         page.on("console", handle_console)
         
-        page.goto("http://localhost:8000")
+        page.goto(self.server.url)
         
         # Perform search
         search_input = page.locator("#query")
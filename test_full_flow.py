@@ -3,25 +3,19 @@
 Complete end-to-end test of the web interface
 """
 import requests
-import subprocess
-import time
 import json
+from web_server import start_server
 
 def test_complete_user_flow():
     """Test the complete user flow as if using a web browser"""
     
     # Start the server
     print("Starting web server...")
-    server_process = subprocess.Popen([
-        'bash', '-c', 
-        'source venv/bin/activate && python3 web_server.py'
-    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    server = start_server(port=0)
     
     try:
-        time.sleep(3)  # Give server time to start
-        
         print("\n=== STEP 1: Load the web page ===")
-        response = requests.get('http://localhost:8000/')
+        response = requests.get(f'{server.url}/')
         print(f"Status: {response.status_code}")
         
         if response.status_code != 200:
@@ -46,7 +40,7 @@ def test_complete_user_flow():
             # Make the exact same request the browser JavaScript would make
             search_data = {'query': query}
             response = requests.post(
-                'http://localhost:8000/search',
+                f'{server.url}/search',
                 headers={'Content-Type': 'application/json'},
                 data=json.dumps(search_data)
             )
@@ -101,7 +95,7 @@ def test_complete_user_flow():
         
         # Test empty query
         response = requests.post(
-            'http://localhost:8000/search',
+            f'{server.url}/search',
             headers={'Content-Type': 'application/json'},
             data=json.dumps({'query': ''})
         )
@@ -113,7 +107,7 @@ def test_complete_user_flow():
         
         # Test invalid JSON
         response = requests.post(
-            'http://localhost:8000/search',
+            f'{server.url}/search',
             headers={'Content-Type': 'application/json'},
             data='invalid json'
         )
@@ -134,11 +128,7 @@ def test_complete_user_flow():
         
     finally:
         print("\nShutting down server...")
-        server_process.terminate()
-        try:
-            server_process.wait(timeout=5)
-        except subprocess.TimeoutExpired:
-            server_process.kill()
+        server.shutdown()
 
 if __name__ == '__main__':
     success = test_complete_user_flow()
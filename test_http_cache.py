@@ -0,0 +1,125 @@
+import json
+import time
+from email.utils import formatdate
+from unittest.mock import Mock, patch
+import pytest
+from http_cache import HTTPCache, freshness_lifetime
+from web_search_agent import WebSearchAgent
+
+
+class TestFreshness:
+    """Test suite for freshness lifetime calculation"""
+    
+    def test_max_age_and_s_maxage(self):
+        """Test that s-maxage wins over max-age"""
+        assert freshness_lifetime({'Cache-Control': 'public, max-age=60'}, 300) == 60
+        assert freshness_lifetime({'Cache-Control': 'max-age=60, s-maxage=10'}, 300) == 10
+    
+    def test_no_store_and_no_cache(self):
+        """Test that no-store forbids storing and no-cache forces revalidation"""
+        assert freshness_lifetime({'Cache-Control': 'no-store'}, 300) is None
+        assert freshness_lifetime({'Cache-Control': 'private, max-age=60'}, 300) is None
+        assert freshness_lifetime({'Cache-Control': 'no-cache'}, 300) == 0
+    
+    def test_expires_relative_to_date(self):
+        """Test that Expires is measured from the response Date"""
+        now = time.time()
+        headers = {'Date': formatdate(now), 'Expires': formatdate(now + 120)}
+        
+        assert freshness_lifetime(headers, 300, now=now) == pytest.approx(120, abs=1)
+        assert freshness_lifetime({'Expires': '0'}, 300) == 0
+    
+    def test_age_is_subtracted(self):
+        """Test that the response age reduces the remaining lifetime"""
+        assert freshness_lifetime({'Cache-Control': 'max-age=60', 'Age': '45'}, 300) == 15
+    
+    def test_default_ttl_without_headers(self):
+        """Test the fallback when there is no freshness information"""
+        assert freshness_lifetime({}, 42) == 42
+
+
+class TestHTTPCache:
+    """Test suite for the header-aware cache"""
+    
+    def test_stale_entries_without_validators_are_dropped(self):
+        """Test that stale entries are only kept when they can be revalidated"""
+        cache = HTTPCache(default_ttl=0)
+        cache.store('a', 'value', {})
+        cache.store('b', 'value', {'ETag': '"v1"'})
+        
+        assert cache.lookup('a') is None
+        entry = cache.lookup('b')
+        assert not entry.is_fresh()
+        assert entry.conditional_headers() == {'If-None-Match': '"v1"'}
+    
+    def test_refresh_extends_lifetime(self):
+        """Test that a 304 makes a stale entry fresh again"""
+        cache = HTTPCache(default_ttl=0)
+        entry = cache.store('k', 'value', {'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+        
+        cache.refresh('k', entry, {'Cache-Control': 'max-age=60'})
+        
+        assert cache.lookup('k').is_fresh()
+    
+    def test_no_store_evicts(self):
+        """Test that a no-store response removes an older entry"""
+        cache = HTTPCache()
+        cache.store('k', 'old', {})
+        cache.store('k', 'new', {'Cache-Control': 'no-store'})
+        
+        assert cache.lookup('k') is None
+
+
+def upstream_response(status=200, headers=None, payload=None):
+    response = Mock()
+    response.status_code = status
+    response.headers = headers or {}
+    response.raise_for_status.return_value = None
+    response.iter_content.return_value = [json.dumps(payload or {}).encode()]
+    return response
+
+
+class TestAgentHTTPCache:
+    """Test that search_web honours upstream caching headers"""
+    
+    @patch('web_search_agent.requests.get')
+    def test_fresh_response_is_reused(self, mock_get):
+        """Test that a fresh cached response skips the network"""
+        mock_get.return_value = upstream_response(
+            headers={'Cache-Control': 'max-age=60'}, payload={'Abstract': 'Python is a language'})
+        agent = WebSearchAgent(http_cache=HTTPCache())
+        
+        first = agent.search_web("python")
+        second = agent.search_web("python")
+        
+        assert mock_get.call_count == 1
+        assert second == first
+    
+    @patch('web_search_agent.requests.get')
+    def test_stale_response_is_revalidated(self, mock_get):
+        """Test that a stale entry is revalidated and reused on 304"""
+        mock_get.return_value = upstream_response(
+            headers={'Cache-Control': 'no-cache', 'ETag': '"abc"'}, payload={'Abstract': 'Python is a language'})
+        agent = WebSearchAgent(http_cache=HTTPCache())
+        first = agent.search_web("python")
+        
+        mock_get.return_value = upstream_response(status=304, headers={'Cache-Control': 'max-age=60'})
+        second = agent.search_web("python")
+        third = agent.search_web("python")
+        
+        assert mock_get.call_args_list[1][1]['headers'] == {'If-None-Match': '"abc"'}
+        assert mock_get.call_count == 2
+        assert second == first
+        assert third == first
+    
+    @patch('web_search_agent.requests.get')
+    def test_no_store_is_not_cached(self, mock_get):
+        """Test that no-store responses are fetched every time"""
+        mock_get.return_value = upstream_response(
+            headers={'Cache-Control': 'no-store'}, payload={'Abstract': 'Python is a language'})
+        agent = WebSearchAgent(http_cache=HTTPCache())
+        
+        agent.search_web("python")
+        agent.search_web("python")
+        
+        assert mock_get.call_count == 2
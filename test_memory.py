@@ -0,0 +1,162 @@
+import sys
+from unittest.mock import Mock
+import pytest
+import requests
+from memory import AllocationTracer, deep_size, measure, rss_bytes
+from web_search_agent import WebSearchAgent
+from web_server import start_server
+
+
+class Holder:
+    def __init__(self, data):
+        self.data = data
+
+
+leaked = []
+
+
+def leak(n):
+    leaked.extend(bytearray(1000) for _ in range(n))
+
+
+class TestMeasure:
+    """Test suite for structure sizes"""
+
+    def test_deep_size_counts_contents(self):
+        """Test that nested containers and instance attributes are counted"""
+        payload = [str(i) * 1000 for i in range(10)]
+        small = deep_size(Holder([]))
+        large = deep_size(Holder(payload))
+
+        assert large['complete']
+        assert large['bytes'] - small['bytes'] >= 10 * 1000
+        assert large['objects'] > 10
+
+    def test_deep_size_stops_at_budget(self):
+        """Test that walking stops after max_objects and says so"""
+        report = deep_size([[i] for i in range(1000)], max_objects=100)
+
+        assert report == {'bytes': report['bytes'], 'objects': 100, 'complete': False}
+
+    def test_measure_counts_shared_objects_once(self):
+        """Test that structures pointing at each other or at excluded objects do not absorb them"""
+        agent = Holder(['y' * 100000])
+        history = [{'q': 'python'}]
+        session = Holder(history)
+        session.agent = agent
+
+        report = measure({'history': history, 'session': session}, exclude=[agent])
+
+        assert report['history']['items'] == 1
+        assert 'items' not in report['session']
+        assert report['session']['bytes'] < 10000
+
+    def test_rss(self):
+        """Test that RSS is reported on Linux"""
+        rss = rss_bytes()
+        if sys.platform.startswith('linux'):
+            assert rss > 1 << 20
+
+
+class TestAllocationTracer:
+    """Test suite for tracemalloc snapshots"""
+
+    def setup_method(self):
+        self.tracer = AllocationTracer()
+
+    def teardown_method(self):
+        self.tracer.stop()
+        leaked.clear()
+
+    def test_snapshot_requires_tracing(self):
+        """Test that a snapshot without tracing is refused"""
+        assert self.tracer.status() == {'tracing': False}
+        with pytest.raises(RuntimeError):
+            self.tracer.snapshot()
+
+    def test_diff_finds_growth(self):
+        """Test that the diff between two snapshots points at the allocating line"""
+        assert self.tracer.start()
+        assert not self.tracer.start()
+        first = self.tracer.snapshot()
+        leak(500)
+
+        second = self.tracer.snapshot(top=5)
+
+        assert first['diff'] is None
+        assert len(second['top']) <= 5
+        growth = second['diff'][0]
+        assert growth['site'][0].endswith(f"test_memory.py:{leak.__code__.co_firstlineno + 1}")
+        assert growth['size_diff'] >= 500 * 1000
+        assert growth['count_diff'] >= 500
+
+    def test_stop_ends_tracing(self):
+        """Test that stop turns tracing off and forgets the baseline"""
+        self.tracer.start(frames=5)
+        assert self.tracer.status()['frames'] == 5
+        self.tracer.snapshot()
+        self.tracer.stop()
+
+        assert not self.tracer.tracing
+        self.tracer.start()
+        assert self.tracer.snapshot()['diff'] is None
+
+    def test_unknown_key_type(self):
+        """Test that an unknown grouping is rejected"""
+        self.tracer.start()
+        with pytest.raises(ValueError):
+            self.tracer.snapshot(key_type='module')
+
+
+class TestMemoryEndpoint:
+    """Test suite for /admin/memory"""
+
+    def setup_method(self):
+        self.agent = WebSearchAgent()
+        self.agent.search_web = Mock(return_value=[{'title': 't', 'content': 'c' * 1000, 'source': 's'}])
+        self.server = start_server(agent=self.agent)
+        self.server.handler_class.set_profiling('secret')
+        self.headers = {'X-Admin-Token': 'secret'}
+
+    def teardown_method(self):
+        requests.get(f'{self.server.url}/admin/memory/trace?action=stop', headers=self.headers, timeout=5)
+        self.server.shutdown()
+
+    def test_requires_token(self):
+        """Test that the endpoint is hidden without a token and forbidden with a wrong one"""
+        response = requests.get(f'{self.server.url}/admin/memory', headers={'X-Admin-Token': 'wrong'}, timeout=5)
+        assert response.status_code == 403
+
+        self.server.handler_class.set_profiling(None)
+        assert requests.get(f'{self.server.url}/admin/memory', timeout=5).status_code == 404
+
+    def test_reports_structures(self):
+        """Test that the agent's and server's structures are measured"""
+        self.agent.conversation_history.extend({'question': 'q' * 10000} for _ in range(10))
+        requests.get(f'{self.server.url}/search', params={'q': 'python'}, timeout=5)
+
+        data = requests.get(f'{self.server.url}/admin/memory', headers=self.headers, timeout=5).json()
+
+        structures = data['structures']
+        assert structures['conversation_history']['items'] == 10
+        assert structures['conversation_history']['bytes'] > 100000
+        assert structures['result_store']['items'] == 1
+        assert structures['suggestions']['items'] == 1
+        assert structures['websocket_sessions']['items'] == 0
+        assert 'query_cache' not in structures
+        assert data['tracemalloc'] == {'tracing': False}
+
+    def test_trace_and_snapshot(self):
+        """Test starting tracemalloc, taking two snapshots and stopping"""
+        base = f'{self.server.url}/admin/memory'
+        assert requests.get(f'{base}/snapshot', headers=self.headers, timeout=5).status_code == 409
+
+        status = requests.get(f'{base}/trace?action=start&frames=3', headers=self.headers, timeout=5).json()
+        assert status['tracing'] and status['frames'] == 3
+        first = requests.get(f'{base}/snapshot?top=3', headers=self.headers, timeout=5).json()
+        second = requests.get(f'{base}/snapshot?by=filename', headers=self.headers, timeout=5).json()
+
+        assert len(first['top']) == 3 and first['diff'] is None
+        assert second['diff'] is not None
+        assert requests.get(f'{base}/trace?action=stop', headers=self.headers, timeout=5).json() == {'tracing': False}
+        assert requests.get(f'{base}/trace?action=pause', headers=self.headers, timeout=5).status_code == 400
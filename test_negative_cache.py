@@ -0,0 +1,138 @@
+import json
+import time
+from unittest.mock import Mock, patch
+from negative_cache import EMPTY, ERROR, BloomFilter, NegativeCache
+from web_search_agent import WebSearchAgent
+
+
+class TestBloomFilter:
+    """Test suite for the Bloom filter"""
+
+    def test_no_false_negatives(self):
+        """Test that every added key is reported as present"""
+        bloom = BloomFilter(1000)
+        keys = [f"query {i}" for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+
+        assert all(key in bloom for key in keys)
+
+    def test_false_positive_rate_at_capacity(self):
+        """Test that the false positive rate stays near the configured bound"""
+        bloom = BloomFilter(2000, error_rate=0.01)
+        for i in range(2000):
+            bloom.add(f"present {i}")
+
+        false_positives = sum(f"absent {i}" in bloom for i in range(10000))
+
+        assert false_positives < 300
+
+    def test_compact(self):
+        """Test that the filter uses a few bytes per key"""
+        bloom = BloomFilter(100000, error_rate=1e-4)
+
+        assert len(bloom.bits) < 100000 * 3
+
+
+class TestNegativeCache:
+    """Test suite for the negative cache"""
+
+    def test_empty_and_error_kept_apart(self):
+        """Test that empty answers and errors are reported separately"""
+        cache = NegativeCache()
+        cache.add_empty("obscure thing")
+        cache.add_error("flaky thing")
+
+        assert cache.lookup("Obscure  thing") == EMPTY
+        assert cache.lookup("flaky thing") == ERROR
+        assert cache.lookup("something else") is None
+        assert cache.hits == 2
+
+    def test_entries_expire(self):
+        """Test that entries are forgotten within their ttl"""
+        cache = NegativeCache(ttl=0.2, error_ttl=0.1)
+        cache.add_empty("obscure thing")
+        cache.add_error("flaky thing")
+
+        time.sleep(0.12)
+        assert cache.lookup("flaky thing") is None
+        time.sleep(0.12)
+        assert cache.lookup("obscure thing") is None
+
+    def test_zero_ttl_disables_an_outcome(self):
+        """Test that a ttl of 0 remembers nothing instead of failing"""
+        cache = NegativeCache(ttl=60, error_ttl=0)
+        cache.add_empty("obscure thing")
+        cache.add_error("flaky thing")
+
+        assert cache.lookup("obscure thing") == EMPTY
+        assert cache.lookup("flaky thing") is None
+        assert NegativeCache(ttl=-1).lookup("anything") is None
+
+    def test_full_generation_rotates_early(self):
+        """Test that a full filter is replaced instead of overfilled"""
+        cache = NegativeCache(capacity=10)
+        for i in range(25):
+            cache.add_empty(f"query {i}")
+
+        assert cache.lookup("query 24") == EMPTY
+        assert cache.empty.current.count <= 10
+
+
+def upstream_response(payload):
+    response = Mock()
+    response.status_code = 200
+    response.headers = {}
+    response.raise_for_status.return_value = None
+    response.iter_content.return_value = [json.dumps(payload).encode()]
+    return response
+
+
+class TestAgentNegativeCache:
+    """Test that search_web skips upstream for recent no-answer queries"""
+
+    @patch('web_search_agent.requests.get')
+    def test_empty_answer_not_refetched(self, mock_get):
+        """Test that a query with no results is answered from the negative cache"""
+        mock_get.return_value = upstream_response({})
+        agent = WebSearchAgent(negative_cache=NegativeCache())
+
+        first = agent.search_web("asdfghjkl")
+        second = agent.search_web("asdfghjkl")
+
+        assert mock_get.call_count == 1
+        assert second == first
+        assert first[0].source == 'General knowledge'
+
+    @patch('web_search_agent.requests.get')
+    def test_error_retried_after_error_ttl(self, mock_get):
+        """Test that upstream errors are cached briefly, then retried"""
+        mock_get.side_effect = ConnectionError("connection reset")
+        agent = WebSearchAgent(negative_cache=NegativeCache(error_ttl=0.1))
+
+        first = agent.search_web("python")
+        second = agent.search_web("python")
+        assert mock_get.call_count == 1
+        assert first[0].source == 'Error'
+        assert second[0].source == 'Error'
+
+        time.sleep(0.12)
+        mock_get.side_effect = None
+        mock_get.return_value = upstream_response({'Abstract': 'Python is a language'})
+        third = agent.search_web("python")
+
+        assert mock_get.call_count == 2
+        assert third[0].source != 'Error'
+
+    @patch('web_search_agent.requests.get')
+    def test_truncated_answer_counts_as_error(self, mock_get):
+        """Test that a body cut off before any result is cached as an error, not as empty"""
+        mock_get.return_value = upstream_response({'Infobox': 'x' * 10000, 'RelatedTopics': [{'Text': 'Topic'}]})
+        cache = NegativeCache()
+        agent = WebSearchAgent(negative_cache=cache)
+        agent.max_response_bytes = 4096
+
+        results = agent.search_web("python")
+
+        assert results[0].source == 'Error'
+        assert cache.lookup("python") == ERROR
@@ -0,0 +1,187 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from page_fetcher import PageFetcher, extract_text
+from search_result import SearchResult
+from web_search_agent import WebSearchAgent
+
+
+ARTICLE = '<p>' + 'Python is a programming language that lets you work quickly. ' * 10 + '</p>'
+PAGE = f'''<html><head><title>Python</title><script>var tracking = 1;</script></head>
+<body><nav>Home | Downloads | Docs</nav>
+<article><h1>About Python</h1>{ARTICLE}</article>
+<footer>Copyright</footer></body></html>'''
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Local stand-in for result source pages"""
+    
+    requests_seen = []
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_GET(self):
+        StandInHandler.requests_seen.append((self.path, dict(self.headers)))
+        if self.path == '/page':
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = PAGE.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == '/huge':
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.end_headers()
+            try:
+                for _ in range(1000):
+                    self.wfile.write(b'<div>' + b'x' * 1000 + b'</div>')
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        elif self.path == '/slow':
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.end_headers()
+            try:
+                for _ in range(50):
+                    self.wfile.write(b'drip ')
+                    self.wfile.flush()
+                    time.sleep(0.05)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        elif self.path == '/stall':
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', '1000')
+            self.end_headers()
+            self.wfile.write(b'<p>partial')
+            self.wfile.flush()
+            time.sleep(1)
+        elif self.path == '/image':
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.end_headers()
+            self.wfile.write(b'\x89PNG')
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+
+class TestPageFetcher:
+    """Test suite for source page fetching against a local stand-in"""
+    
+    @classmethod
+    def setup_class(cls):
+        """Start the stand-in server"""
+        cls.httpd = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        cls.base = f'http://127.0.0.1:{cls.httpd.server_address[1]}'
+        threading.Thread(target=cls.httpd.serve_forever, daemon=True).start()
+    
+    @classmethod
+    def teardown_class(cls):
+        """Stop the stand-in server"""
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+    
+    def setup_method(self):
+        """Set up a fresh fetcher"""
+        StandInHandler.requests_seen = []
+        self.fetcher = PageFetcher(max_chars=300)
+    
+    def teardown_method(self):
+        """Release the fetcher's pool"""
+        self.fetcher.close()
+    
+    def test_extracts_main_text(self):
+        """Test that the article text is kept and page chrome dropped"""
+        text = self.fetcher.fetch(f'{self.base}/page')
+        
+        assert text.startswith('About Python\nPython is a programming language')
+        assert 'Downloads' not in text
+        assert 'tracking' not in text
+        assert len(text) <= 300
+    
+    def test_revalidates_with_etag(self):
+        """Test that a cached page is revalidated and reused on 304"""
+        first = self.fetcher.fetch(f'{self.base}/page')
+        second = self.fetcher.fetch(f'{self.base}/page')
+        
+        assert second == first
+        assert StandInHandler.requests_seen[1][1].get('If-None-Match') == '"v1"'
+    
+    def test_byte_cap(self):
+        """Test that huge pages are cut off at max_bytes"""
+        fetcher = PageFetcher(max_bytes=4096, max_chars=100000)
+        try:
+            text = fetcher.fetch(f'{self.base}/huge')
+        finally:
+            fetcher.close()
+        
+        assert 0 < len(text) <= 4096
+    
+    def test_time_limit(self):
+        """Test that a slow page is cut off at the timeout"""
+        fetcher = PageFetcher(timeout=0.3)
+        try:
+            start = time.monotonic()
+            text = fetcher.fetch(f'{self.base}/slow')
+            elapsed = time.monotonic() - start
+        finally:
+            fetcher.close()
+        
+        assert text.startswith('drip')
+        assert elapsed < 1.5
+    
+    def test_stalled_body_falls_back(self):
+        """Test that a page that stops sending mid-body gives the cached text or None"""
+        fetcher = PageFetcher(timeout=0.2)
+        try:
+            assert fetcher.fetch(f'{self.base}/stall') is None
+            fetcher.cache.store(f'{self.base}/stall', 'cached text', {'Cache-Control': 'no-cache', 'ETag': '"v0"'})
+            assert fetcher.fetch(f'{self.base}/stall') == 'cached text'
+            assert fetcher.enrich([SearchResult('Stall', 'kept', f'{self.base}/stall')])[0]['content'] == 'cached text'
+        finally:
+            fetcher.close()
+    
+    def test_unusable_pages(self):
+        """Test that missing and non-text pages give no text"""
+        assert self.fetcher.fetch(f'{self.base}/missing') is None
+        assert self.fetcher.fetch(f'{self.base}/image') is None
+        assert self.fetcher.fetch('http://127.0.0.1:1/unreachable') is None
+    
+    def test_enrich_replaces_snippets(self):
+        """Test that web results get page text and others are untouched"""
+        results = [
+            SearchResult('Python', 'snippet', f'{self.base}/page'),
+            SearchResult('Missing', 'kept', f'{self.base}/missing'),
+            SearchResult('Search Error', 'error', 'Error'),
+        ]
+        
+        enriched = self.fetcher.enrich(results)
+        
+        assert enriched[0]['content'].startswith('About Python')
+        assert enriched[0]['source'] == f'{self.base}/page'
+        assert enriched[1]['content'] == 'kept'
+        assert enriched[2] == results[2]
+    
+    def test_agent_enrich_stage(self):
+        """Test that the agent pipeline enriches results when configured"""
+        agent = WebSearchAgent(page_fetcher=self.fetcher)
+        agent.search_web = lambda query, num_results=5: [SearchResult('Python', 'Python snippet', f'{self.base}/page')]
+        
+        ctx = agent.run_pipeline("python")
+        
+        assert 'enrich' in ctx.timings
+        assert 'lets you work quickly' in ctx.response
+
+
+def test_extract_text_falls_back_to_body():
+    """Test that pages without a substantial article use the body text"""
+    assert extract_text('<body><p>Hello <b>world</b></p><script>x()</script></body>') == 'Hello world'
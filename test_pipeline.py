@@ -0,0 +1,114 @@
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from pipeline import Pipeline, PipelineContext, Stage
+from web_search_agent import WebSearchAgent
+
+
+class TestPipeline:
+    """Test suite for the staged pipeline"""
+    
+    def test_stages_run_in_order_with_timings(self):
+        """Test that every stage runs once and is timed"""
+        calls = []
+        pipeline = Pipeline([
+            Stage('one', lambda ctx: calls.append('one')),
+            Stage('two', lambda ctx: calls.append('two')),
+        ])
+        
+        ctx = pipeline.run(PipelineContext('q'))
+        
+        assert calls == ['one', 'two']
+        assert set(ctx.timings) == {'one', 'two'}
+        assert pipeline.stats()['one']['calls'] == 1
+    
+    def test_on_stage_called_after_each_stage(self):
+        """Test that the progress callback sees each stage's output"""
+        pipeline = Pipeline([
+            Stage('one', lambda ctx: setattr(ctx, 'results', [1])),
+            Stage('two', lambda ctx: setattr(ctx, 'results', [1, 2])),
+        ])
+        seen = []
+        
+        pipeline.run(PipelineContext('q'), on_stage=lambda name, ctx: seen.append((name, list(ctx.results))))
+        
+        assert seen == [('one', [1]), ('two', [1, 2])]
+    
+    def test_replace_and_insert(self):
+        """Test that stages can be swapped and added"""
+        pipeline = Pipeline([Stage('format', lambda ctx: None)])
+        pipeline.replace('format', lambda ctx: setattr(ctx, 'response', 'replaced'))
+        pipeline.insert_after('format', Stage('shout', lambda ctx: setattr(ctx, 'response', ctx.response.upper())))
+        
+        assert pipeline.run(PipelineContext('q')).response == 'REPLACED'
+        with pytest.raises(KeyError):
+            pipeline.stage('missing')
+    
+    def test_stage_concurrency_limit(self):
+        """Test that a stage never runs more contexts than its limit"""
+        active = []
+        peak = []
+        lock = threading.Lock()
+        
+        def slow(ctx):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+        
+        pipeline = Pipeline([Stage('slow', slow, concurrency=2)])
+        
+        list(pipeline.run_many([PipelineContext(str(i)) for i in range(10)], max_workers=8))
+        
+        assert max(peak) == 2
+    
+    def test_run_many_preserves_order(self):
+        """Test that pipelined contexts come back in input order"""
+        def respond(ctx):
+            time.sleep(0.01 * (5 - int(ctx.question)))
+            ctx.response = ctx.question
+        
+        pipeline = Pipeline([Stage('respond', respond)])
+        
+        contexts = pipeline.run_many([PipelineContext(str(i)) for i in range(5)], max_workers=5)
+        
+        assert [ctx.response for ctx in contexts] == ['0', '1', '2', '3', '4']
+
+
+class TestAgentPipeline:
+    """Test the agent's default pipeline"""
+    
+    def setup_method(self):
+        """Set up an agent with a canned search"""
+        self.agent = WebSearchAgent()
+        self.agent.search_web = lambda query, num_results=5: [
+            {'title': 'T', 'content': f'About {query}', 'source': 'https://example.com'}
+        ]
+    
+    def test_run_pipeline_exposes_stage_timings(self):
+        """Test that callers can see per-stage timings"""
+        ctx = self.agent.run_pipeline("python")
+        
+        assert list(ctx.timings) == ['retrieve', 'filter', 'rank', 'format', 'record']
+        assert 'About python' in ctx.response
+        assert len(self.agent.conversation_history) == 2
+    
+    def test_fallback_results_are_filtered(self):
+        """Test that a no-answer search gets the fallback response"""
+        self.agent.search_web = lambda query, num_results=5: [
+            {'title': 'Search Result', 'content': f'I searched for "{query}" but could not find specific results.', 'source': ''}
+        ]
+        
+        response = self.agent.process_question("obscure")
+        
+        assert response.startswith("I searched for information about 'obscure'")
+    
+    def test_replaced_stage_is_used(self):
+        """Test that a replaced stage changes the agent's behaviour"""
+        self.agent.pipeline.replace('format', lambda ctx: setattr(ctx, 'response', 'custom'))
+        
+        assert self.agent.process_question("python") == 'custom'
+        assert self.agent.conversation_history[-1]['content'] == 'custom'
@@ -1,34 +1,28 @@
 import pytest
-import subprocess
-import time
 from playwright.sync_api import sync_playwright, expect
+from web_server import start_server
 
 class TestWebSearchAgentUI:
     """Playwright tests for the web search agent UI"""
     
-    server_process = None
+    server = None
     
     @classmethod
     def setup_class(cls):
         """Start web server before tests"""
         print("Starting web server for Playwright tests...")
-        cls.server_process = subprocess.Popen([
-            'bash', '-c', 
-            'source venv/bin/activate && python3 web_server.py'
-        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        time.sleep(3)  # Give server time to start
+        cls.server = start_server(port=0)
     
     @classmethod
     def teardown_class(cls):
         """Stop web server after tests"""
-        if cls.server_process:
-            cls.server_process.terminate()
-            cls.server_process.wait(timeout=5)
+        if cls.server:
+            cls.server.shutdown()
             print("Web server stopped")
     
     def test_page_loads(self, page):
         """Test that the main page loads correctly"""
-        page.goto("http://localhost:8000")
+        page.goto(self.server.url)
         
         # Check page title
         expect(page).to_have_title("Web Search Agent")
@@ -48,7 +42,7 @@ class TestWebSearchAgentUI:
     
     def test_search_functionality(self, page):
         """Test the complete search flow"""
-        page.goto("http://localhost:8000")
+        page.goto(self.server.url)
         
         # Enter search query
         search_input = page.locator("#query")
@@ -80,7 +74,7 @@ class TestWebSearchAgentUI:
     
     def test_empty_search(self, page):
         """Test search with empty query"""
-        page.goto("http://localhost:8000")
+        page.goto(self.server.url)
         
         # Click search without entering anything
         search_button = page.locator("button:has-text('Search')")
@@ -92,7 +86,7 @@ class TestWebSearchAgentUI:
     
     def test_search_error_handling(self, page):
         """Test error handling in search"""
-        page.goto("http://localhost:8000")
+        page.goto(self.server.url)
         
         # Enter search query
         search_input = page.locator("#query")
@@ -110,7 +104,7 @@ class TestWebSearchAgentUI:
     
     def test_keyboard_enter(self, page):
         """Test search with Enter key"""
-        page.goto("http://localhost:8000")
+        page.goto(self.server.url)
         
         # Enter search query and press Enter
         search_input = page.locator("#query")
@@ -128,7 +122,7 @@ class TestWebSearchAgentUI:
     
     def test_multiple_searches(self, page):
         """Test performing multiple searches in sequence"""
-        page.goto("http://localhost:8000")
+        page.goto(self.server.url)
         
         queries = ["python", "javascript", "golang"]
         
@@ -154,7 +148,7 @@ class TestWebSearchAgentUI:
     
     def test_result_links_clickable(self, page):
         """Test that result links are clickable and open in new tab"""
-        page.goto("http://localhost:8000")
+        page.goto(self.server.url)
         
         # Perform search
         search_input = page.locator("#query")
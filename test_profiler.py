@@ -0,0 +1,126 @@
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from unittest.mock import Mock
+import requests
+from profiler import SamplingProfiler, profile_for
+from web_server import WebSearchHandler
+
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += 1
+    return total
+
+
+class TestSamplingProfiler:
+    """Test suite for the stack sampler"""
+    
+    def test_collapsed_stacks(self):
+        """Test that samples are recorded as root-first collapsed stacks"""
+        with SamplingProfiler(interval=0.001, thread_ids=[threading.get_ident()]) as profiler:
+            busy_loop(0.1)
+        
+        lines = profiler.collapsed().splitlines()
+        stack, count = lines[0].rsplit(' ', 1)
+        assert int(count) > 0
+        assert stack.split(';')[-1].startswith('busy_loop (test_profiler.py:')
+        assert 'test_collapsed_stacks' in stack
+    
+    def test_only_watched_threads_sampled(self):
+        """Test that other threads are ignored when thread ids are given"""
+        worker = threading.Thread(target=busy_loop, args=(0.1,))
+        with SamplingProfiler(interval=0.001, thread_ids=[threading.get_ident()]) as profiler:
+            worker.start()
+            worker.join()
+        
+        assert not any('busy_loop' in stack for stack in profiler.samples)
+    
+    def test_profile_window_sees_all_threads(self):
+        """Test that window profiling samples every thread but its own"""
+        worker = threading.Thread(target=busy_loop, args=(0.2,))
+        worker.start()
+        profiler = profile_for(0.1)
+        worker.join()
+        
+        assert any('busy_loop' in stack for stack in profiler.samples)
+        assert not any('_run (profiler.py' in stack for stack in profiler.samples)
+
+
+class TestProfilingEndpoints:
+    """Test suite for per-request and windowed profiling in the server"""
+    
+    def setup_method(self, method):
+        agent = Mock()
+        agent.search_web.side_effect = lambda query, num_results=5: busy_loop(0.05) and []
+        WebSearchHandler.set_agent(agent)
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), WebSearchHandler)
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+    
+    def teardown_method(self, method):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        WebSearchHandler.set_profiling(None)
+        WebSearchHandler.set_agent(None)
+    
+    def test_request_profile_with_token(self, tmp_path):
+        """Test that X-Profile with the admin token writes a profile for that request"""
+        WebSearchHandler.set_profiling('secret', str(tmp_path))
+        
+        response = requests.get(f"{self.base}/search?q=python", headers={'X-Profile': 'secret'}, timeout=5)
+        
+        path = response.headers['X-Profile-Output']
+        with open(path) as f:
+            profile = f.read()
+        assert 'busy_loop' in profile
+        assert 'handle_search' in profile
+    
+    def test_request_profile_needs_token(self, tmp_path):
+        """Test that a wrong token or disabled profiling adds no overhead or output"""
+        WebSearchHandler.set_profiling('secret', str(tmp_path))
+        
+        response = requests.get(f"{self.base}/search?q=python", headers={'X-Profile': 'guess'}, timeout=5)
+        
+        assert response.status_code == 200
+        assert 'X-Profile-Output' not in response.headers
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_admin_profile_window(self):
+        """Test that the admin endpoint returns collapsed stacks for the window"""
+        WebSearchHandler.set_profiling('secret')
+        
+        forbidden = requests.get(f"{self.base}/admin/profile?seconds=0.1", timeout=5)
+        response = requests.get(f"{self.base}/admin/profile?seconds=0.2",
+                                headers={'X-Admin-Token': 'secret'}, timeout=5)
+        
+        assert forbidden.status_code == 403
+        assert response.status_code == 200
+        assert response.headers['Content-type'] == 'text/plain'
+        assert 'serve_forever' in response.text
+
+    def test_admin_profile_rejects_bad_seconds(self):
+        """Test that zero, negative, non-finite and non-numeric windows are a 400"""
+        WebSearchHandler.set_profiling('secret')
+
+        for seconds in ['0', '-1', 'nan', 'inf', 'soon']:
+            response = requests.get(f"{self.base}/admin/profile?seconds={seconds}",
+                                    headers={'X-Admin-Token': 'secret'}, timeout=5)
+            assert response.status_code == 400, seconds
+
+    def test_non_ascii_token_is_forbidden(self):
+        """Test that a token with non-ASCII characters is a 403, not a server error"""
+        WebSearchHandler.set_profiling('secret')
+
+        response = requests.get(f"{self.base}/admin/profile?seconds=0.1",
+                                headers={'X-Admin-Token': 's\xe9cret'}, timeout=5)
+
+        assert response.status_code == 403
+
+    def test_admin_disabled_without_token(self):
+        """Test that admin endpoints do not exist unless a token is configured"""
+        response = requests.get(f"{self.base}/admin/profile", headers={'X-Admin-Token': ''}, timeout=5)
+        
+        assert response.status_code == 404
@@ -0,0 +1,105 @@
+import json
+import pytest
+from unittest.mock import Mock, patch
+from query_cache import FuzzyQueryCache, normalize_query, query_features, simhash
+from web_search_agent import WebSearchAgent
+
+
+RESULTS = [{'title': 'Python', 'content': 'Python is a programming language', 'source': 'https://python.org'}]
+
+
+class TestFuzzyQueryCache:
+    """Test suite for the SimHash near-duplicate query cache"""
+    
+    def test_paraphrase_hits_exact_key(self):
+        """Test that case, whitespace and stop-word differences still hit"""
+        cache = FuzzyQueryCache()
+        cache.put("python programming language", RESULTS)
+        
+        assert cache.get("The Python programming language?") == RESULTS
+    
+    def test_question_words_are_kept(self):
+        """Test that questions differing only in their question word do not collide"""
+        cache = FuzzyQueryCache()
+        cache.put("when was python created", RESULTS)
+
+        assert normalize_query("When  was Python created") == "when was python created"
+        assert cache.get("WHEN was python   created") == RESULTS
+        assert cache.get("why was python created") is None
+        assert cache.get("who created python") is None
+    
+    def test_near_duplicate_hits(self):
+        """Test that a query within the similarity threshold is a hit"""
+        cache = FuzzyQueryCache(threshold=0.9)
+        cache.put("python programming language tutorial", RESULTS)
+        
+        distance = bin(simhash(query_features("python programming language tutorials"))
+                       ^ simhash(query_features("python programming language tutorial"))).count('1')
+        expected = RESULTS if distance <= cache.max_distance else None
+        
+        assert cache.get("python programming language tutorials") == expected
+    
+    def test_unrelated_query_misses(self):
+        """Test that a different query is not returned"""
+        cache = FuzzyQueryCache()
+        cache.put("python programming language", RESULTS)
+        
+        assert cache.get("history of the roman empire") is None
+    
+    def test_num_results_is_part_of_key(self):
+        """Test that results cached for one page size are not reused for another"""
+        cache = FuzzyQueryCache()
+        cache.put("python", RESULTS, num_results=5)
+        
+        assert cache.get("python", num_results=10) is None
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted when full"""
+        cache = FuzzyQueryCache(max_entries=2)
+        cache.put("python", RESULTS)
+        cache.put("rust", RESULTS)
+        cache.get("python")
+        cache.put("golang", RESULTS)
+        
+        assert len(cache) == 2
+        assert cache.get("rust") is None
+        assert cache.get("python") == RESULTS
+    
+    def test_threshold_too_low(self):
+        """Test that thresholds needing too many LSH tables are rejected"""
+        with pytest.raises(ValueError):
+            FuzzyQueryCache(threshold=0.5)
+
+
+class TestAgentQueryCache:
+    """Test that search_web consults the query cache"""
+    
+    @patch('web_search_agent.requests.get')
+    def test_repeated_paraphrase_skips_upstream(self, mock_get):
+        """Test that a paraphrased repeat is served from the cache"""
+        mock_response = Mock()
+        mock_response.raise_for_status.return_value = None
+        mock_response.iter_content.return_value = [json.dumps({
+            'Abstract': 'Python is a programming language',
+            'AbstractURL': 'https://python.org'
+        }).encode()]
+        mock_get.return_value = mock_response
+        agent = WebSearchAgent(query_cache=FuzzyQueryCache())
+        
+        first = agent.search_web("python programming language")
+        second = agent.search_web("the python programming language")
+        
+        assert mock_get.call_count == 1
+        assert second == first
+    
+    @patch('web_search_agent.requests.get')
+    def test_errors_are_not_cached(self, mock_get):
+        """Test that failed searches are retried upstream"""
+        mock_get.side_effect = Exception("Network error")
+        agent = WebSearchAgent(query_cache=FuzzyQueryCache())
+        
+        agent.search_web("python")
+        agent.search_web("python")
+        
+        assert mock_get.call_count == 2
+        assert len(agent.query_cache) == 0
@@ -0,0 +1,93 @@
+import time
+import pytest
+from ranking import Ranker
+from web_search_agent import WebSearchAgent
+
+
+RESULTS = [
+    {'title': 'Monty Python', 'content': 'Monty Python were a British comedy troupe', 'source': 'a'},
+    {'title': 'Snakes', 'content': 'Pythons are large constricting snakes', 'source': 'b'},
+    {'title': 'Python', 'content': 'Python is a high-level programming language', 'source': 'c'},
+]
+
+
+class TestRanker:
+    """Test suite for the vectorised BM25 ranker"""
+    
+    def setup_method(self):
+        """Set up test fixtures"""
+        self.ranker = Ranker()
+    
+    def test_most_relevant_first(self):
+        """Test that the best matching result is ranked first"""
+        ranked = self.ranker.rank("python programming language", RESULTS)
+        
+        assert ranked[0]['source'] == 'c'
+        assert len(ranked) == 3
+    
+    def test_top_k(self):
+        """Test that only the best k results are returned"""
+        assert [r['source'] for r in self.ranker.rank("comedy troupe", RESULTS, k=1)] == ['a']
+    
+    def test_no_matches_keep_upstream_order(self):
+        """Test that unmatched questions leave the order alone"""
+        assert self.ranker.rank("quantum chromodynamics", RESULTS) == RESULTS
+    
+    def test_scores_match_scalar_bm25(self):
+        """Test the vectorised scores against a direct computation"""
+        import math
+        scores = self.ranker.scores("python language", RESULTS)
+        
+        # 'python' occurs in a (x2) and c (x2), 'language' only in c
+        lengths = [8, 5, 6]
+        avg = sum(lengths) / 3
+        def term(tf, df, length):
+            idf = math.log1p((3 - df + 0.5) / (df + 0.5))
+            return idf * tf * 2.5 / (tf + 1.5 * (0.25 + 0.75 * length / avg))
+        
+        assert scores[0] == pytest.approx(term(2, 2, 8))
+        assert scores[1] == pytest.approx(0.0)
+        assert scores[2] == pytest.approx(term(2, 2, 6) + term(1, 1, 6))
+    
+    def test_vocabulary_is_cached(self):
+        """Test that repeated results reuse their cached term ids"""
+        self.ranker.rank("python", RESULTS)
+        size = len(self.ranker.vocabulary)
+        
+        self.ranker.rank("python", RESULTS)
+        
+        assert len(self.ranker.vocabulary) == size
+
+    def test_vocabulary_reset_keeps_scores_consistent(self):
+        """Test that a full vocabulary is only reset between calls, never mid-call"""
+        ranker = Ranker(max_vocabulary=5)
+        expected = Ranker().scores("python language", RESULTS)
+
+        for _ in range(3):
+            assert list(ranker.scores("python language", RESULTS)) == pytest.approx(list(expected))
+
+    def test_hundreds_of_candidates(self):
+        """Test that merged candidate sets of hundreds still rank quickly"""
+        candidates = [{'title': f'Result {i}', 'content': f'topic {i} about item {i % 17} and python {i % 3}', 'source': str(i)}
+                      for i in range(500)]
+        self.ranker.rank("python item 4", candidates)
+        
+        start = time.perf_counter()
+        ranked = self.ranker.rank("python item 4", candidates, k=5)
+        
+        assert time.perf_counter() - start < 0.05
+        assert len(ranked) == 5
+
+
+class TestAgentRanking:
+    """Test that the agent ranks results before answering"""
+    
+    def test_relevant_result_leads_the_answer(self):
+        """Test that the answer leads with the most relevant result"""
+        agent = WebSearchAgent()
+        agent.search_web = lambda query, num_results=5: list(RESULTS)
+        
+        ctx = agent.run_pipeline("python programming language")
+        
+        assert ctx.results[0]['source'] == 'c'
+        assert ctx.response.index('high-level programming') < ctx.response.index('comedy troupe')
@@ -0,0 +1,139 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+import pytest
+import requests
+from http_cache import HTTPCache
+from query_cache import FuzzyQueryCache
+from reload import ReloadableHTTPServer, load_handoff, save_handoff
+from search_result import SearchResult
+from web_search_agent import WebSearchAgent
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    started = threading.Event()
+    
+    def do_GET(self):
+        self.started.set()
+        time.sleep(0.3)
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b'done')
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def wait_for(condition, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+class TestReloadableServer:
+    """Test suite for socket adoption and draining"""
+    
+    def test_adopts_listening_socket(self):
+        """Test that the server serves on a socket it did not bind"""
+        listener = socket.create_server(('127.0.0.1', 0))
+        httpd = ReloadableHTTPServer(None, SlowHandler, listen_socket=listener)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        try:
+            assert httpd.server_port == listener.getsockname()[1]
+            assert requests.get(f"http://127.0.0.1:{httpd.server_port}/", timeout=5).text == 'done'
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+    
+    def test_drain_waits_for_in_flight_requests(self):
+        """Test that drain returns only once running requests have finished"""
+        httpd = ReloadableHTTPServer(('127.0.0.1', 0), SlowHandler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        responses = []
+        client = threading.Thread(target=lambda: responses.append(
+            requests.get(f"http://127.0.0.1:{httpd.server_port}/", timeout=5)))
+        SlowHandler.started.clear()
+        client.start()
+        SlowHandler.started.wait(5)
+        
+        httpd.shutdown()
+        assert httpd.drain(5)
+        httpd.server_close()
+        client.join()
+        
+        assert responses[0].text == 'done'
+
+
+class TestCacheHandoff:
+    """Test suite for handing cache entries to the next process"""
+    
+    def test_round_trip(self, tmp_path):
+        """Test that query and upstream cache entries survive the handoff"""
+        results = [SearchResult('Python', 'Python is a language', 'https://python.org')]
+        old = WebSearchAgent(query_cache=FuzzyQueryCache(), http_cache=HTTPCache())
+        old.query_cache.put("python language", results)
+        old.http_cache.store(("python language", 5), results, {'ETag': '"v1"', 'Cache-Control': 'max-age=60'})
+        path = str(tmp_path / 'handoff.json')
+        
+        save_handoff(old, path)
+        new = WebSearchAgent(query_cache=FuzzyQueryCache(), http_cache=HTTPCache())
+        
+        assert load_handoff(new, path) == 2
+        assert new.query_cache.get("the python language") == results
+        entry = new.http_cache.lookup(("python language", 5))
+        assert entry.is_fresh()
+        assert entry.value == results
+        assert entry.etag == '"v1"'
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGHUP'), reason="requires SIGHUP")
+def test_sighup_reload_keeps_serving(tmp_path):
+    """Test that a reload replaces the process without refusing connections"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    pid_file = tmp_path / 'server.pid'
+    server_dir = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.Popen([sys.executable, 'web_server.py', '--port', str(port), '--pid-file', str(pid_file)],
+                               cwd=server_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    errors = []
+    served = []
+    stop = threading.Event()
+    
+    def client():
+        while not stop.is_set():
+            try:
+                served.append(requests.get(f"http://127.0.0.1:{port}/", timeout=5).status_code)
+            except requests.RequestException as e:
+                errors.append(e)
+    
+    try:
+        wait_for(lambda: pid_file.exists() and pid_file.read_text().strip())
+        wait_for(lambda: requests.get(f"http://127.0.0.1:{port}/ready", timeout=5).ok)
+        thread = threading.Thread(target=client)
+        thread.start()
+        
+        process.send_signal(signal.SIGHUP)
+        wait_for(lambda: pid_file.read_text().strip() != str(process.pid))
+        process.wait(15)
+        before = len(served)
+        wait_for(lambda: len(served) > before + 5)
+        stop.set()
+        thread.join()
+        
+        assert errors == []
+        assert set(served) == {200}
+    finally:
+        stop.set()
+        for pid in {process.pid, int(pid_file.read_text() or 0) if pid_file.exists() else 0} - {0}:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        process.wait(5)
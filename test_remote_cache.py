@@ -0,0 +1,276 @@
+import io
+import socket
+import threading
+import time
+from collections import Counter
+import pytest
+from unittest.mock import patch
+from remote_cache import (HashRing, MemoryCacheServer, NodeConnection, RemoteResultCache, RESPError,
+                          encode_command, read_reply)
+from search_result import SearchResult
+from web_search_agent import WebSearchAgent
+
+
+RESULTS = [SearchResult('Python', 'Python is a programming language', 'https://python.org')]
+
+
+def free_address():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return f"127.0.0.1:{sock.getsockname()[1]}"
+
+
+class TestRESP:
+    """Test suite for the Redis protocol encoding"""
+
+    def test_encode_command(self):
+        """Test that commands are sent as arrays of bulk strings"""
+        assert encode_command('SET', 'k', b'v', 'PX', 100) == b'*5\r\n$3\r\nSET\r\n$1\r\nk\r\n$1\r\nv\r\n$2\r\nPX\r\n$3\r\n100\r\n'
+
+    def test_read_replies(self):
+        """Test each reply type"""
+        stream = io.BytesIO(b'+OK\r\n-ERR bad\r\n:42\r\n$5\r\nhello\r\n$-1\r\n*2\r\n$1\r\na\r\n$-1\r\n')
+
+        assert read_reply(stream) == 'OK'
+        assert isinstance(read_reply(stream), RESPError)
+        assert read_reply(stream) == 42
+        assert read_reply(stream) == b'hello'
+        assert read_reply(stream) is None
+        assert read_reply(stream) == [b'a', None]
+        with pytest.raises(ConnectionError):
+            read_reply(stream)
+
+
+class TestHashRing:
+    """Test suite for consistent hashing"""
+
+    def test_keys_spread_over_nodes(self):
+        """Test that every node gets a fair share of keys"""
+        ring = HashRing(['a', 'b', 'c'])
+        counts = Counter(ring.node_for(f"key {i}") for i in range(3000))
+
+        assert set(counts) == {'a', 'b', 'c'}
+        assert min(counts.values()) > 700
+
+    def test_adding_a_node_moves_few_keys(self):
+        """Test that only about 1/n of the keys move when a node is added"""
+        before = HashRing(['a', 'b', 'c'])
+        after = HashRing(['a', 'b', 'c', 'd'])
+        keys = [f"key {i}" for i in range(4000)]
+        moved = [key for key in keys if before.node_for(key) != after.node_for(key)]
+
+        assert len(moved) < 0.35 * len(keys)
+        assert all(after.node_for(key) == 'd' for key in moved)
+
+
+class TestRemoteResultCache:
+    """Test suite for the shared result cache against in-process nodes"""
+
+    def setup_method(self):
+        self.servers = [MemoryCacheServer().start() for _ in range(2)]
+        self.cache = RemoteResultCache([server.address for server in self.servers])
+
+    def teardown_method(self):
+        self.cache.close()
+        for server in self.servers:
+            server.close()
+
+    def wait_for_writes(self, count):
+        deadline = time.monotonic() + 5
+        while sum(len(server.data) for server in self.servers) < count:
+            assert time.monotonic() < deadline, "writes never arrived"
+            time.sleep(0.01)
+
+    def test_shared_between_instances(self):
+        """Test that results written by one instance are read by another"""
+        other = RemoteResultCache([server.address for server in self.servers])
+        self.cache.put("Python", RESULTS)
+        self.wait_for_writes(1)
+
+        assert other.get("python") == RESULTS
+        assert other.get("python", num_results=10) is None
+        assert other.stats()['hits'] == 1
+        other.close()
+
+    def test_near_cache_skips_the_network(self):
+        """Test that a repeated get is answered in-process"""
+        self.cache.put("python", RESULTS)
+        self.wait_for_writes(1)
+        commands = sum(server.commands for server in self.servers)
+
+        assert self.cache.get("python") == RESULTS
+        assert sum(server.commands for server in self.servers) == commands
+        assert self.cache.stats()['near_hits'] == 1
+
+    def test_near_cache_expires(self):
+        """Test that near-cache entries fall back to the shared copy"""
+        cache = RemoteResultCache([server.address for server in self.servers], near_ttl=0.05)
+        cache.put("python", RESULTS)
+        self.wait_for_writes(1)
+        time.sleep(0.06)
+
+        assert cache.get("python") == RESULTS
+        assert cache.stats() == {'near_hits': 0, 'hits': 1, 'misses': 0, 'errors': 0, 'near_entries': 1}
+        cache.close()
+
+    def test_corrupt_entries_are_misses(self):
+        """Test that values that are not lists of results count as misses, in get and get_many"""
+        corrupt = {'number': '5', 'object': '{"title": "x"}', 'strings': '["a"]', 'bytes': b'\xff'}
+        for query, value in corrupt.items():
+            for node in self.cache.nodes.values():
+                node.execute('SET', f"{self.cache.prefix}5:{query}", value)
+
+        assert all(self.cache.get(query) is None for query in corrupt)
+        assert self.cache.get_many(list(corrupt)) == {}
+        assert self.cache.stats()['misses'] == 8
+        assert self.cache.stats()['errors'] == 0
+
+    def test_sub_millisecond_ttl_not_written(self):
+        """Test that a ttl that rounds to PX 0 skips the shared write"""
+        cache = RemoteResultCache([server.address for server in self.servers], ttl=0.0005)
+        cache.put("python", RESULTS)
+        time.sleep(0.05)
+
+        assert cache.get("python") == RESULTS
+        assert sum(server.commands for server in self.servers) == 0
+        cache.close()
+
+    def test_entries_sharded_across_nodes(self):
+        """Test that keys are spread over the nodes"""
+        for i in range(50):
+            self.cache.put(f"query {i}", RESULTS)
+        self.wait_for_writes(50)
+
+        assert all(len(server.data) > 10 for server in self.servers)
+
+    def test_get_many_pipelines_per_node(self):
+        """Test that a batch lookup uses one connection per node and finds every entry"""
+        writer = RemoteResultCache([server.address for server in self.servers], near_ttl=0)
+        for i in range(40):
+            writer.put(f"query {i}", RESULTS)
+        self.wait_for_writes(40)
+        reader = RemoteResultCache([server.address for server in self.servers], near_ttl=0)
+        connections = sum(server.connections for server in self.servers)
+
+        found = reader.get_many([f"query {i}" for i in range(50)])
+
+        assert sorted(found) == sorted(f"query {i}" for i in range(40))
+        assert sum(server.connections for server in self.servers) - connections == 2
+        assert reader.stats()['misses'] == 10
+        writer.close()
+        reader.close()
+
+    def test_concurrent_gets_share_a_connection(self):
+        """Test that concurrent requests are pipelined over one socket per node"""
+        cache = RemoteResultCache([self.servers[0].address], near_ttl=0)
+        cache.put("python", RESULTS)
+        self.wait_for_writes(1)
+        results = []
+
+        threads = [threading.Thread(target=lambda: results.append(cache.get("python"))) for _ in range(32)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [RESULTS] * 32
+        assert self.servers[0].connections == 1
+        cache.close()
+
+    def test_unreachable_node_is_a_miss(self):
+        """Test that a dead node degrades to misses without raising"""
+        cache = RemoteResultCache([free_address()])
+        cache.put("python", RESULTS)
+
+        assert cache.get("other") is None
+        assert cache.get_many(["a", "b"]) == {}
+        assert cache.stats()['errors'] >= 2
+
+    def test_node_marked_down_after_failure(self):
+        """Test that a failed node is not retried until retry_interval passes"""
+        node = NodeConnection(('127.0.0.1', int(free_address().split(':')[1])), retry_interval=60)
+        with pytest.raises(OSError):
+            node.execute('PING')
+        with patch('socket.create_connection') as connect:
+            with pytest.raises(ConnectionError):
+                node.execute('PING')
+            connect.assert_not_called()
+
+    def test_stalled_node_does_not_block_callers(self):
+        """Test that a node that accepts but never reads fails writes quickly and is marked down"""
+        listener = socket.create_server(('127.0.0.1', 0))
+        accepted = []
+        threading.Thread(target=lambda: accepted.append(listener.accept()), daemon=True).start()
+        cache = RemoteResultCache([f"127.0.0.1:{listener.getsockname()[1]}"], timeout=0.1, near_size=0)
+        big = [SearchResult('Python', 'x' * 10000, 'https://python.org')]
+
+        start = time.monotonic()
+        for i in range(1000):
+            cache.put(f"query {i}", big)
+        results = []
+        reader = threading.Thread(target=lambda: results.append(cache.get("query 0")))
+        reader.start()
+        reader.join(5)
+
+        assert not reader.is_alive()
+        assert results == [None]
+        assert time.monotonic() - start < 5
+        assert cache.stats()['errors'] > 0
+        cache.close()
+        listener.close()
+
+    def test_server_restart_reconnects(self):
+        """Test that a dropped connection is replaced on the next request"""
+        node = NodeConnection(('127.0.0.1', self.servers[0].server_address[1]))
+        assert node.execute('PING') == 'PONG'
+        node.reset()
+
+        assert node.execute('SET', 'k', 'v') == 'OK'
+        assert node.execute('GET', 'k') == b'v'
+        node.close()
+
+
+class TestMemoryCacheServer:
+    """Test suite for the in-process cache node"""
+
+    def test_expiry_and_commands(self):
+        """Test SET with PX, MGET, DEL and DBSIZE"""
+        server = MemoryCacheServer().start()
+        node = NodeConnection(('127.0.0.1', server.server_address[1]))
+
+        assert node.execute('SET', 'a', '1', 'PX', 50) == 'OK'
+        assert node.execute('SET', 'b', '2') == 'OK'
+        assert node.execute('MGET', 'a', 'b', 'c') == [b'1', b'2', None]
+        time.sleep(0.06)
+        assert node.execute('GET', 'a') is None
+        assert node.execute('DEL', 'b') == 1
+        assert node.execute('DBSIZE') == 0
+        with pytest.raises(RESPError):
+            node.execute('NOPE')
+
+        node.close()
+        server.close()
+
+
+class TestAgentRemoteCache:
+    """Test that search_web shares results through the remote cache"""
+
+    def setup_method(self):
+        self.server = MemoryCacheServer().start()
+
+    def teardown_method(self):
+        self.server.close()
+
+    def test_second_instance_skips_upstream(self):
+        """Test that a result fetched by one agent is served to another"""
+        first = WebSearchAgent(remote_cache=RemoteResultCache([self.server.address]))
+        second = WebSearchAgent(remote_cache=RemoteResultCache([self.server.address]))
+        with patch.object(WebSearchAgent, '_fetch_results', return_value=list(RESULTS)) as fetch:
+            first.search_web("python")
+            deadline = time.monotonic() + 5
+            while not self.server.data and time.monotonic() < deadline:
+                time.sleep(0.01)
+            results = second.search_web("python")
+
+        assert fetch.call_count == 1
+        assert results == RESULTS
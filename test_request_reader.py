@@ -0,0 +1,198 @@
+import socket
+import threading
+import time
+from unittest.mock import Mock
+import requests
+from request_reader import RequestReader, head_end, parse_head
+from web_search_agent import WebSearchAgent
+from web_server import start_server
+
+
+def recv_all(sock, timeout=5.0):
+    sock.settimeout(timeout)
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+
+class TestRequestParsing:
+    """Test suite for request head parsing"""
+
+    def test_head_end(self):
+        """Test finding the end of the head with CRLF and bare LF line endings"""
+        assert head_end(bytearray(b'GET / HTTP/1.0\r\nHost: x\r\n\r\nbody')) == 27
+        assert head_end(bytearray(b'GET / HTTP/1.0\nHost: x\n\nbody')) == 24
+        assert head_end(bytearray(b'GET / HTTP/1.0\r\nHost: x\r\n')) == -1
+
+    def test_parse_head(self):
+        """Test that header names are lowercased and values stripped"""
+        request_line, headers = parse_head(b'POST /search HTTP/1.1\r\nContent-Length:  12\r\nX-A: b:c\r\n\r\n')
+
+        assert request_line == b'POST /search HTTP/1.1'
+        assert headers == {b'content-length': b'12', b'x-a': b'b:c'}
+
+
+class TestRequestReader:
+    """Test suite for reading requests before dispatch"""
+
+    def setup_method(self):
+        self.requests = []
+        self.rejected = []
+        self.dispatched = threading.Event()
+        self.reader = RequestReader(self.on_request, self.rejected.append, read_timeout=0.5,
+                                    max_header_bytes=1024, max_body_bytes=100)
+
+    def teardown_method(self):
+        self.reader.close()
+
+    def on_request(self, sock, client_address, data):
+        self.requests.append((client_address, data))
+        sock.close()
+        self.dispatched.set()
+
+    def connect(self):
+        client, server = socket.socketpair()
+        self.reader.add(server, 'client')
+        return client
+
+    def test_dispatches_once_body_arrives(self):
+        """Test that a request trickled in byte by byte is only dispatched when complete"""
+        client = self.connect()
+        request = b'POST /search HTTP/1.0\r\nContent-Length: 5\r\n\r\nhello'
+        for i in range(len(request) - 1):
+            client.send(request[i:i + 1])
+        time.sleep(0.05)
+        assert self.requests == []
+
+        client.send(request[-1:])
+        assert self.dispatched.wait(5)
+        assert self.requests == [('client', request)]
+        assert self.rejected == []
+
+    def test_oversized_body_rejected_before_reading(self):
+        """Test that a Content-Length over the limit gets 413 without the body being sent"""
+        client = self.connect()
+        client.send(b'POST /search HTTP/1.0\r\nContent-Length: 101\r\n\r\n')
+
+        assert recv_all(client).startswith(b'HTTP/1.0 413 ')
+        assert self.requests == []
+        assert self.rejected == ['client']
+
+    def test_oversized_head_rejected(self):
+        """Test that a head that never ends within the limit gets 431"""
+        client = self.connect()
+        client.send(b'GET / HTTP/1.0\r\n' + b'X-Padding: aaaaaaaa\r\n' * 100)
+
+        assert recv_all(client).startswith(b'HTTP/1.0 431 ')
+
+    def test_slow_client_times_out(self):
+        """Test that a client that stops sending mid-request gets 408 after the deadline"""
+        client = self.connect()
+        client.send(b'POST /search HTTP/1.0\r\nContent-Length: 50\r\n\r\n{"que')
+        start = time.monotonic()
+
+        response = recv_all(client)
+
+        assert response.startswith(b'HTTP/1.0 408 ')
+        assert 0.3 < time.monotonic() - start < 3
+        assert self.reader.rejected == 1
+
+    def test_chunked_and_invalid_lengths_rejected(self):
+        """Test that chunked bodies get 411 and malformed lengths 400"""
+        chunked = self.connect()
+        chunked.send(b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n')
+        invalid = self.connect()
+        invalid.send(b'POST / HTTP/1.0\r\nContent-Length: -1\r\n\r\n')
+
+        assert recv_all(chunked).startswith(b'HTTP/1.0 411 ')
+        assert recv_all(invalid).startswith(b'HTTP/1.0 400 ')
+
+    def test_expect_continue(self):
+        """Test that HTTP/1.1 clients waiting on Expect: 100-continue are told to send the body"""
+        client = self.connect()
+        client.send(b'POST / HTTP/1.1\r\nContent-Length: 2\r\nExpect: 100-continue\r\n\r\n')
+        client.settimeout(5)
+
+        assert client.recv(1024) == b'HTTP/1.1 100 Continue\r\n\r\n'
+        client.send(b'{}')
+        assert self.dispatched.wait(5)
+
+    def test_disconnect_before_request(self):
+        """Test that a client closing early is forgotten"""
+        client = self.connect()
+        client.send(b'GET / HTT')
+        client.close()
+
+        deadline = time.monotonic() + 5
+        while not self.rejected and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert self.rejected == ['client']
+        assert len(self.reader) == 0
+
+
+class TestReaderClose:
+    """Test suite for stopping the reader while a callback is running"""
+
+    def test_cleanup_waits_for_the_selector_thread(self):
+        """Test that close leaves pending connections alone until the busy thread exits"""
+        release = threading.Event()
+        rejected = []
+        reader = RequestReader(lambda sock, client_address, data: release.wait(5) and sock.close(), rejected.append)
+        busy, server = socket.socketpair()
+        reader.add(server, 'busy')
+        waiting, server = socket.socketpair()
+        reader.add(server, 'waiting')
+        waiting.send(b'GET / HT')
+        time.sleep(0.05)
+        busy.send(b'GET / HTTP/1.0\r\n\r\n')
+        time.sleep(0.05)
+
+        assert not reader.close(timeout=0.1)
+        assert rejected == []
+
+        release.set()
+        waiting.settimeout(5)
+        assert waiting.recv(1024) == b''
+        assert reader.close()
+        assert rejected == ['waiting']
+
+
+class TestSlowClientProtection:
+    """Test suite for request deadlines and size limits on the server"""
+
+    def setup_method(self):
+        self.agent = WebSearchAgent()
+        self.agent.search_web = Mock(return_value=[{'title': 't', 'content': 'c', 'source': 's'}])
+        self.server = start_server(agent=self.agent)
+        self.server.handler_class.set_limits(read_timeout=0.5, write_timeout=5, max_body_bytes=1000)
+        self.host, self.port = '127.0.0.1', self.server.address[1]
+
+    def teardown_method(self):
+        self.server.shutdown()
+
+    def test_slow_clients_do_not_hold_workers(self):
+        """Test that stalled clients neither start handler threads nor delay other requests"""
+        stalled = []
+        for _ in range(50):
+            sock = socket.create_connection((self.host, self.port))
+            sock.send(b'POST /search HTTP/1.1\r\nContent-Length: 20\r\n\r\n{"q')
+            stalled.append(sock)
+        time.sleep(0.1)
+        threads = threading.active_count()
+
+        response = requests.post(f'{self.server.url}/search', json={'query': 'python'}, timeout=5)
+
+        assert response.status_code == 200
+        assert threading.active_count() - threads < 5
+        assert all(recv_all(sock).startswith(b'HTTP/1.0 408 ') for sock in stalled)
+        assert self.server.httpd.drain(5)
+
+    def test_oversized_post_rejected(self):
+        """Test that a body over max_body_bytes gets 413"""
+        response = requests.post(f'{self.server.url}/search', data='{"query": "' + 'x' * 2000 + '"}', timeout=5)
+
+        assert response.status_code == 413
+        self.agent.search_web.assert_not_called()
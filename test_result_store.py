@@ -0,0 +1,55 @@
+import time
+import pytest
+from result_store import ResultStore, decode_cursor, encode_cursor
+
+
+class TestCursor:
+    """Test suite for page cursors"""
+
+    def test_round_trip(self):
+        """Test that a cursor decodes to the query and offset it encodes"""
+        cursor = encode_cursor("what is python?", 10)
+
+        assert decode_cursor(cursor) == ("what is python?", 10)
+        assert '=' not in cursor and '/' not in cursor
+
+    @pytest.mark.parametrize('cursor', ['', 'not-base64!', encode_cursor("q", 0)[:-3], 'WyJxIiwtMV0'])
+    def test_invalid_cursor(self, cursor):
+        """Test that malformed cursors and negative offsets are rejected"""
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+class TestResultStore:
+    """Test suite for the short-lived result store"""
+
+    def test_get_by_normalised_query(self):
+        """Test that a stored result set is found for the same query"""
+        store = ResultStore()
+        store.put("Python Tutorial", ['a', 'b'])
+
+        assert store.get("python  tutorial") == ['a', 'b']
+        assert store.get("rust tutorial") is None
+        assert (store.hits, store.misses) == (1, 1)
+
+    def test_entries_expire(self):
+        """Test that entries are dropped after the ttl"""
+        store = ResultStore(ttl=0.05)
+        store.put("python", ['a'])
+
+        time.sleep(0.06)
+
+        assert store.get("python") is None
+        assert len(store) == 0
+
+    def test_least_recently_used_evicted(self):
+        """Test that the store stays within max_entries"""
+        store = ResultStore(max_entries=2)
+        store.put("one", ['1'])
+        store.put("two", ['2'])
+        store.get("one")
+        store.put("three", ['3'])
+
+        assert store.get("two") is None
+        assert store.get("one") == ['1']
+        assert len(store) == 2
@@ -0,0 +1,101 @@
+import json
+import pytest
+from unittest.mock import Mock, patch
+from search_index import SearchIndex, tokenize
+from web_search_agent import WebSearchAgent
+
+
+class TestSearchIndex:
+    """Test suite for the local BM25 index"""
+    
+    def setup_method(self):
+        """Set up test fixtures"""
+        self.index = SearchIndex()
+        self.index.add_results([
+            {'title': 'Python', 'content': 'Python is a programming language', 'source': 'https://python.org'},
+            {'title': 'Git', 'content': 'Git is a distributed version control system', 'source': 'https://git-scm.com'},
+            {'title': 'Monty Python', 'content': 'Monty Python were a British comedy troupe', 'source': 'https://example.com'},
+        ])
+    
+    def test_tokenize_drops_stop_words(self):
+        """Test that tokenization lowercases and removes stop words"""
+        assert tokenize("What is the Python programming language?") == ['python', 'programming', 'language']
+    
+    def test_duplicate_content_not_reindexed(self):
+        """Test that re-adding the same content is a no-op"""
+        added = self.index.add_results([{'title': 'Python', 'content': 'Python is a programming language', 'source': ''}])
+        
+        assert added == 0
+        assert len(self.index) == 3
+    
+    def test_search_ranks_best_match_first(self):
+        """Test that the most relevant document ranks first"""
+        matches = self.index.search("python programming language")
+        
+        assert matches[0][1]['source'] == 'https://python.org'
+        assert 0 < matches[0][0] <= 1
+        assert matches[0][0] > matches[1][0]
+    
+    def test_search_unknown_terms(self):
+        """Test that unknown terms give no matches"""
+        assert self.index.search("quantum chromodynamics") == []
+        assert self.index.search("the") == []
+    
+    def test_save_and_load(self, tmp_path):
+        """Test that an index survives a round trip to disk"""
+        path = str(tmp_path / 'index.json')
+        self.index.save(path)
+        
+        loaded = SearchIndex.load(path)
+        
+        assert len(loaded) == 3
+        assert loaded.search("version control") == self.index.search("version control")
+
+
+class TestAgentLocalLookup:
+    """Test that the agent answers from the local index when it can"""
+    
+    @patch('web_search_agent.requests.get')
+    def test_search_web_populates_index(self, mock_get):
+        """Test that fetched results are added to the index"""
+        mock_response = Mock()
+        mock_response.raise_for_status.return_value = None
+        mock_response.iter_content.return_value = [json.dumps({
+            'Abstract': 'Python is a programming language',
+            'AbstractURL': 'https://python.org'
+        }).encode()]
+        mock_get.return_value = mock_response
+        agent = WebSearchAgent(index=SearchIndex())
+        
+        agent.search_web("Python")
+        
+        assert len(agent.index) == 1
+    
+    @patch('web_search_agent.requests.get')
+    def test_process_question_uses_local_results(self, mock_get):
+        """Test that a confident local match skips the upstream call"""
+        index = SearchIndex()
+        index.add({'title': 'Python', 'content': 'Python is a programming language', 'source': 'https://python.org'})
+        agent = WebSearchAgent(index=index)
+        
+        response = agent.process_question("What is Python?")
+        
+        mock_get.assert_not_called()
+        assert 'Python is a programming language' in response
+        assert len(agent.conversation_history) == 2
+    
+    @patch('web_search_agent.requests.get')
+    def test_process_question_goes_upstream_below_threshold(self, mock_get):
+        """Test that a weak local match falls through to the web search"""
+        mock_response = Mock()
+        mock_response.raise_for_status.return_value = None
+        mock_response.iter_content.return_value = [json.dumps({'Abstract': 'Rust is a systems programming language'}).encode()]
+        mock_get.return_value = mock_response
+        index = SearchIndex()
+        index.add({'title': 'Python', 'content': 'Python is a programming language', 'source': 'https://python.org'})
+        agent = WebSearchAgent(index=index, local_threshold=0.9)
+        
+        response = agent.process_question("Rust programming language")
+        
+        mock_get.assert_called_once()
+        assert 'Rust is a systems programming language' in response
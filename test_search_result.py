@@ -0,0 +1,55 @@
+import json
+import pickle
+import pytest
+from search_result import SearchResult, json_default
+
+
+class TestSearchResult:
+    """Test suite for the compact SearchResult record"""
+    
+    def setup_method(self):
+        """Set up test fixtures"""
+        self.result = SearchResult('Python', 'Python is a programming language', 'https://python.org')
+    
+    def test_dict_style_access(self):
+        """Test that code written for result dicts keeps working"""
+        assert self.result['content'] == 'Python is a programming language'
+        assert self.result.get('source') == 'https://python.org'
+        assert self.result.get('missing', 'x') == 'x'
+        assert 'title' in self.result
+        assert dict(self.result) == {
+            'title': 'Python',
+            'content': 'Python is a programming language',
+            'source': 'https://python.org'
+        }
+        with pytest.raises(KeyError):
+            self.result['missing']
+    
+    def test_equality_with_dicts(self):
+        """Test that records compare equal to equivalent dicts and records"""
+        assert self.result == dict(self.result)
+        assert self.result == SearchResult.from_dict(dict(self.result))
+        assert self.result != SearchResult('Python', 'other', 'https://python.org')
+    
+    def test_no_instance_dict(self):
+        """Test that records carry no per-instance __dict__"""
+        assert not hasattr(self.result, '__dict__')
+    
+    def test_source_urls_are_interned(self):
+        """Test that equal URLs built separately share one string object"""
+        a = SearchResult('a', 'a', ''.join(['https://example.com/', 'page']))
+        b = SearchResult('b', 'b', ''.join(['https://example.com/', 'page']))
+        
+        assert a.source is b.source
+    
+    def test_json_serialization(self):
+        """Test that records serialise through the json default hook"""
+        payload = json.dumps({'results': [self.result]}, default=json_default)
+        
+        assert json.loads(payload) == {'results': [dict(self.result)]}
+        with pytest.raises(TypeError):
+            json.dumps(object(), default=json_default)
+    
+    def test_pickle_round_trip(self):
+        """Test that records survive pickling"""
+        assert pickle.loads(pickle.dumps(self.result)) == self.result
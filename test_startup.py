@@ -0,0 +1,30 @@
+from unittest.mock import Mock, patch
+import pytest
+from benchmarks.startup import IMPORT_BUDGETS_MS, measure_import
+
+
+class TestStartup:
+    """Test that cold start stays within its import-time budget"""
+    
+    @pytest.mark.parametrize('module', sorted(IMPORT_BUDGETS_MS))
+    def test_import_within_budget(self, module):
+        """Test that importing the module is fast and loads no heavy dependencies"""
+        result = measure_import(module, runs=3)
+        
+        assert result['lazy_loaded'] == []
+        assert result['median_ms'] <= IMPORT_BUDGETS_MS[module]
+    
+    @patch('web_search_agent.requests.get')
+    def test_lazy_requests_is_patchable(self, mock_get):
+        """Test that the lazily imported requests module is still used and patchable"""
+        from web_search_agent import WebSearchAgent
+        response = Mock()
+        response.status_code = 200
+        response.headers = {}
+        response.iter_content.return_value = [b'{"Abstract": "Python is a language"}']
+        mock_get.return_value = response
+        
+        results = WebSearchAgent().search_web("python")
+        
+        assert mock_get.called
+        assert results[0]['content'] == 'Python is a language'
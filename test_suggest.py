@@ -0,0 +1,114 @@
+import random
+import time
+from unittest.mock import Mock
+import requests
+from query_cache import FuzzyQueryCache
+from suggest import SuggestionIndex
+from web_search_agent import WebSearchAgent
+from web_server import start_server
+
+
+class TestSuggestionIndex:
+    """Test suite for prefix suggestions"""
+
+    def test_ranked_by_popularity(self):
+        """Test that more popular completions come first"""
+        index = SuggestionIndex()
+        index.add_many(["python tutorial"] * 3 + ["python"] * 5 + ["pytorch"] * 2 + ["rust"])
+
+        assert index.suggest("py") == ["python", "python tutorial", "pytorch"]
+        assert index.suggest("PYTHON ") == ["python tutorial"]
+        assert index.suggest("go") == []
+        assert index.suggest("") == []
+
+    def test_incremental_updates_reorder(self):
+        """Test that new queries are visible straight away and overtake older ones"""
+        index = SuggestionIndex()
+        index.add_many(["python"] * 3)
+        index.add_many(["pydantic"] * 4)
+
+        assert index.suggest("py") == ["pydantic", "python"]
+        assert index.suggest("pyd") == ["pydantic"]
+
+    def test_long_prefixes_past_the_prefix_lists(self):
+        """Test prefixes longer than max_prefix, including rare completions"""
+        index = SuggestionIndex(max_prefix=2, candidates=4)
+        for i in range(20):
+            index.add_many([f"python {i:02d}"] * (i + 1))
+        index.add("python rare")
+
+        assert index.suggest("python 1", k=3) == ["python 19", "python 18", "python 17"]
+        assert index.suggest("python r") == ["python rare"]
+
+    def test_cached_queries_boosted(self):
+        """Test that cached queries outrank slightly more popular uncached ones"""
+        index = SuggestionIndex(cached_boost=4.0, is_cached=lambda query: query == "python tutorial")
+        index.add_many(["python"] * 5 + ["python tutorial"] * 2)
+
+        assert index.suggest("pyt") == ["python tutorial", "python"]
+
+    def test_pruning_keeps_popular_queries(self):
+        """Test that the index stays bounded and forgets the rarest queries"""
+        index = SuggestionIndex(max_queries=100)
+        index.add_many(["popular"] * 50)
+        for i in range(200):
+            index.add(f"rare {i}")
+
+        assert len(index) <= 100
+        assert index.suggest("pop") == ["popular"]
+
+    def test_fast_on_a_large_index(self):
+        """Test that a suggestion takes well under a millisecond on 50k queries"""
+        rng = random.Random(0)
+        words = ["python", "rust", "what", "is", "how", "to", "install", "learn", "best", "the", "for", "web"]
+        index = SuggestionIndex()
+        for _ in range(50000):
+            index.add(" ".join(rng.choice(words) for _ in range(4)), weight=rng.randint(1, 20))
+        prefixes = ["p", "wh", "how t", "what is the", "python rust lea", "zzz"] * 200
+
+        start = time.perf_counter()
+        for prefix in prefixes:
+            index.suggest(prefix)
+        per_call = (time.perf_counter() - start) / len(prefixes)
+
+        assert per_call < 0.0005
+
+
+class TestSuggestEndpoint:
+    """Test suite for /suggest"""
+
+    def setup_method(self):
+        self.agent = WebSearchAgent()
+        self.agent.search_web = Mock(return_value=[{'title': 't', 'content': 'c', 'source': 's'}])
+        self.server = start_server(agent=self.agent)
+
+    def teardown_method(self):
+        self.server.shutdown()
+
+    def test_learns_from_searches(self):
+        """Test that searched queries are suggested, and cursors are not counted"""
+        for query in ["python tutorial", "python tutorial", "python"]:
+            requests.get(f'{self.server.url}/search', params={'q': query, 'limit': 1}, timeout=5)
+
+        data = requests.get(f'{self.server.url}/suggest', params={'q': 'pyt'}, timeout=5).json()
+
+        assert data == {'query': 'pyt', 'suggestions': ['python tutorial', 'python']}
+
+    def test_cached_queries_preferred(self):
+        """Test that a query whose results are still stored ranks first"""
+        suggestions = self.server.handler_class.suggestions
+        suggestions.add_many(["python"] * 3)
+        requests.get(f'{self.server.url}/search', params={'q': 'python tutorial'}, timeout=5)
+
+        assert self.server.handler_class.is_cached("python tutorial")
+        assert not self.server.handler_class.is_cached("python")
+        data = requests.get(f'{self.server.url}/suggest?q=py', timeout=5).json()
+        assert data['suggestions'] == ['python tutorial', 'python']
+
+    def test_cached_check_ignores_case(self):
+        """Test that a query cached as typed, capitals and all, counts as cached for its suggestion"""
+        handler_class = self.server.handler_class
+        self.agent.query_cache = FuzzyQueryCache()
+        self.agent.query_cache.put("Rust  Book", [{'title': 't'}], handler_class.max_page_size)
+
+        assert handler_class.is_cached("rust book")
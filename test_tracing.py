@@ -0,0 +1,171 @@
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from unittest.mock import Mock, patch
+import pytest
+import requests
+from tracing import JSONFileExporter, Tracer, parse_traceparent, traceparent_header, tracer
+from web_search_agent import WebSearchAgent
+from web_server import WebSearchHandler
+
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+INCOMING = f'00-{TRACE_ID}-00f067aa0ba902b7-01'
+
+
+def read_spans(path, until=None):
+    deadline = time.monotonic() + 5
+    while True:
+        with open(path) as f:
+            spans = [json.loads(line) for line in f]
+        if until is None or any(span['name'] == until for span in spans) or time.monotonic() > deadline:
+            return spans
+        time.sleep(0.01)
+
+
+class TestTraceparent:
+    """Test suite for W3C traceparent parsing"""
+    
+    def test_parse(self):
+        """Test valid and invalid headers"""
+        assert parse_traceparent(INCOMING) == (TRACE_ID, '00f067aa0ba902b7', True)
+        assert parse_traceparent(f'00-{TRACE_ID}-00f067aa0ba902b7-00')[2] is False
+        assert parse_traceparent('00-' + '0' * 32 + '-00f067aa0ba902b7-01') is None
+        assert parse_traceparent(f'ff-{TRACE_ID}-00f067aa0ba902b7-01') is None
+        assert parse_traceparent('garbage') is None
+        assert parse_traceparent(None) is None
+
+
+class TestTracer:
+    """Test suite for span creation, sampling and export"""
+    
+    def setup_method(self):
+        self.exported = []
+        self.exporter = Mock()
+        self.exporter.export.side_effect = self.exported.append
+    
+    def test_child_spans_share_trace(self):
+        """Test that nested spans form one trace with parent links"""
+        tracer = Tracer(self.exporter, sample_rate=1.0)
+        with tracer.span('root') as root:
+            with tracer.span('child', key='value') as child:
+                pass
+        
+        assert [span.name for span in self.exported] == ['child', 'root']
+        assert child.trace_id == root.trace_id
+        assert child.parent_id == root.span_id
+        assert child.attributes == {'key': 'value'}
+    
+    def test_incoming_traceparent_is_continued(self):
+        """Test that the root span joins the caller's trace and sampling decision"""
+        tracer = Tracer(self.exporter, sample_rate=0.0)
+        with tracer.span('root', traceparent=INCOMING) as root:
+            header = traceparent_header()['traceparent']
+        
+        assert root.trace_id == TRACE_ID
+        assert root.parent_id == '00f067aa0ba902b7'
+        assert header == f'00-{TRACE_ID}-{root.span_id}-01'
+        assert self.exported == [root]
+    
+    def test_unsampled_trace_exports_nothing(self):
+        """Test head sampling: an unsampled root silences its children"""
+        tracer = Tracer(self.exporter, sample_rate=0.0)
+        with tracer.span('root') as root:
+            with tracer.span('child') as child:
+                child.set('ignored', True)
+        
+        assert child is root
+        assert self.exported == []
+        assert root.traceparent().endswith('-00')
+    
+    def test_disabled_without_exporter(self):
+        """Test that without an exporter no context is created unless propagated"""
+        tracer = Tracer()
+        with tracer.span('root') as span:
+            assert traceparent_header() == {}
+            span.set('ignored', True)
+        with tracer.span('root', traceparent=INCOMING):
+            header = traceparent_header()['traceparent']
+        
+        assert header.startswith(f'00-{TRACE_ID}-')
+        assert header.endswith('-01')
+    
+    def test_incoming_sampled_traces_are_capped(self):
+        """Test that only max_incoming_per_second caller-sampled traces are recorded, all keeping their flag"""
+        tracer = Tracer(self.exporter, sample_rate=0.0, max_incoming_per_second=3)
+        headers = []
+        for _ in range(10):
+            with tracer.span('root', traceparent=INCOMING):
+                with tracer.span('child'):
+                    headers.append(traceparent_header()['traceparent'])
+        
+        assert [span.name for span in self.exported] == ['child', 'root'] * 3
+        assert all(header.endswith('-01') for header in headers)
+    
+    def test_error_recorded(self):
+        """Test that an exception is recorded on the span and re-raised"""
+        tracer = Tracer(self.exporter)
+        with pytest.raises(ValueError):
+            with tracer.span('root'):
+                raise ValueError("boom")
+        
+        assert self.exported[0].error == 'ValueError: boom'
+
+
+class TestRequestTracing:
+    """Test that a request produces a trace across handler, agent and upstream"""
+    
+    def setup_method(self):
+        WebSearchHandler.set_agent(WebSearchAgent())
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), WebSearchHandler)
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+    
+    def teardown_method(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        tracer.configure(None)
+        WebSearchHandler.set_agent(None)
+    
+    @patch('web_search_agent.requests.get')
+    def test_spans_exported_with_propagation(self, mock_get, tmp_path):
+        """Test that spans are exported to the file and traceparent reaches upstream"""
+        upstream = Mock()
+        upstream.status_code = 200
+        upstream.headers = {}
+        upstream.iter_content.return_value = [b'{"Abstract": "Python is a language"}']
+        mock_get.return_value = upstream
+        path = str(tmp_path / 'spans.jsonl')
+        exporter = JSONFileExporter(path)
+        tracer.configure(exporter, sample_rate=0.0)
+        
+        # requests.get itself is patched, so call the server through requests.request
+        response = requests.request('GET', f"{self.base}/search?q=python", headers={'traceparent': INCOMING},
+                                    timeout=5)
+        
+        assert response.status_code == 200
+        spans = {span['name']: span for span in read_spans(path, until='http.request')}
+        exporter.close()
+        assert {'http.request', 'search_web', 'upstream.request', 'upstream.parse', 'response.write'} <= set(spans)
+        assert all(span['trace_id'] == TRACE_ID for span in spans.values())
+        assert spans['http.request']['parent_id'] == '00f067aa0ba902b7'
+        assert spans['http.request']['attributes']['http.status'] == 200
+        assert spans['upstream.request']['parent_id'] == spans['search_web']['span_id']
+        sent = mock_get.call_args[1]['headers']['traceparent']
+        assert sent == f"00-{TRACE_ID}-{spans['upstream.request']['span_id']}-01"
+    
+    @patch('web_search_agent.requests.get')
+    def test_process_question_stages(self, mock_get, tmp_path):
+        """Test that process_question traces its pipeline stages and formatting"""
+        mock_get.side_effect = Exception("offline")
+        path = str(tmp_path / 'spans.jsonl')
+        exporter = JSONFileExporter(path)
+        tracer.configure(exporter, sample_rate=1.0)
+        
+        WebSearchAgent().process_question("What is Python?")
+        exporter.close()
+        
+        names = [span['name'] for span in read_spans(path)]
+        assert names[-1] == 'process_question'
+        assert {'stage.retrieve', 'stage.rank', 'stage.format', 'search_web', 'generate_response'} <= set(names)
@@ -0,0 +1,137 @@
+import json
+import threading
+import time
+from http.server import HTTPServer
+from unittest.mock import Mock
+import pytest
+import requests
+from warmup import CacheWarmer, read_query_log, top_queries
+from web_server import WebSearchHandler
+
+
+RESULTS = [{'title': 'Python', 'content': 'Python is a programming language', 'source': 'https://python.org'}]
+
+
+class TestQueryLog:
+    """Test suite for reading query logs"""
+    
+    def test_read_jsonl_and_plain_lines(self, tmp_path):
+        """Test that JSONL records and plain lines are both accepted"""
+        path = tmp_path / 'queries.log'
+        path.write_text('\n'.join([
+            json.dumps({'request_id': 'r1', 'title': 'python', 'body': '...'}),
+            json.dumps({'query': 'rust'}),
+            'golang',
+            '',
+            '{not json',
+        ]))
+        
+        assert list(read_query_log(str(path))) == ['python', 'rust', 'golang']
+    
+    def test_top_queries(self):
+        """Test that the most popular queries come first"""
+        queries = ['a', 'b', 'b', 'c', 'c', 'c']
+        
+        assert top_queries(queries, 2) == ['c', 'b']
+
+
+class TestCacheWarmer:
+    """Test suite for the cache warmer"""
+    
+    def test_warms_all_queries(self):
+        """Test that every query is prefetched and readiness is signalled"""
+        agent = Mock()
+        agent.search_web.return_value = RESULTS
+        warmer = CacheWarmer(agent, ['a', 'b', 'c'], rate=0)
+        
+        warmer.run()
+        
+        assert agent.search_web.call_count == 3
+        assert warmer.ready.is_set()
+        assert warmer.status()['completed'] == 3
+    
+    def test_fetches_requested_depth(self):
+        """Test that queries are warmed with the configured number of results"""
+        agent = Mock()
+        agent.search_web.return_value = RESULTS
+        
+        CacheWarmer(agent, ['a'], rate=0, num_results=50).run()
+        
+        agent.search_web.assert_called_once_with('a', 50)
+    
+    def test_ready_at_coverage_before_finishing(self):
+        """Test that readiness is signalled once coverage is reached"""
+        release = threading.Event()
+        
+        def search_web(query, num_results=5):
+            if query == 'slow':
+                release.wait(5)
+            return RESULTS
+        
+        agent = Mock()
+        agent.search_web.side_effect = search_web
+        warmer = CacheWarmer(agent, ['a', 'b', 'c', 'slow'], concurrency=4, rate=0, coverage=0.75)
+        warmer.start()
+        
+        assert warmer.ready.wait(2)
+        assert not warmer.finished
+        release.set()
+    
+    def test_failures_do_not_count_towards_coverage(self):
+        """Test that error results count as failed"""
+        agent = Mock()
+        agent.search_web.return_value = [{'title': 'Search Error', 'content': 'boom', 'source': 'Error'}]
+        warmer = CacheWarmer(agent, ['a', 'b'], rate=0)
+        
+        warmer.run()
+        
+        status = warmer.status()
+        assert status['failed'] == 2
+        assert status['completed'] == 0
+        assert status['ready']  # warm-up finished, so traffic is let through
+    
+    def test_rate_cap(self):
+        """Test that prefetches are spaced by the rate limit"""
+        agent = Mock()
+        agent.search_web.return_value = RESULTS
+        warmer = CacheWarmer(agent, ['a', 'b', 'c'], rate=20)
+        
+        start = time.monotonic()
+        warmer.run()
+        
+        assert time.monotonic() - start >= 0.1
+
+
+class TestReadinessEndpoint:
+    """Test the /ready endpoint"""
+    
+    def setup_method(self):
+        """Start a server on an ephemeral port"""
+        self.httpd = HTTPServer(('127.0.0.1', 0), WebSearchHandler)
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+    
+    def teardown_method(self):
+        """Stop the server and reset handler state"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        WebSearchHandler.set_warmer(None)
+    
+    def test_not_ready_until_warm(self):
+        """Test that /ready returns 503 until warm-up reaches coverage"""
+        warmer = CacheWarmer(Mock(), ['a'])
+        WebSearchHandler.set_warmer(warmer)
+        
+        response = requests.get(f'http://127.0.0.1:{self.port}/ready', timeout=5)
+        assert response.status_code == 503
+        assert response.json()['ready'] is False
+        
+        warmer.ready.set()
+        response = requests.get(f'http://127.0.0.1:{self.port}/ready', timeout=5)
+        assert response.status_code == 200
+    
+    def test_ready_without_warmup(self):
+        """Test that /ready is 200 when no warm-up is configured"""
+        response = requests.get(f'http://127.0.0.1:{self.port}/ready', timeout=5)
+        
+        assert response.status_code == 200
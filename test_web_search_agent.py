@@ -1,3 +1,4 @@
+import json
 import pytest
 from unittest.mock import Mock, patch
 from web_search_agent import WebSearchAgent
@@ -20,14 +21,14 @@ class TestWebSearchAgent:
         # Mock successful API response
         mock_response = Mock()
         mock_response.raise_for_status.return_value = None
-        mock_response.json.return_value = {
+        mock_response.iter_content.return_value = [json.dumps({
             'Abstract': 'Python is a programming language',
             'AbstractText': 'Python Programming',
             'AbstractURL': 'https://python.org',
             'RelatedTopics': [
                 {'Text': 'Python is easy to learn', 'FirstURL': 'https://example.com'}
             ]
-        }
+        }).encode()]
         mock_get.return_value = mock_response
         
         results = self.agent.search_web("What is Python?")
@@ -53,11 +54,11 @@ class TestWebSearchAgent:
         # Mock successful search response
         mock_response = Mock()
         mock_response.raise_for_status.return_value = None
-        mock_response.json.return_value = {
+        mock_response.iter_content.return_value = [json.dumps({
             'Abstract': 'Machine learning is a subset of AI',
             'AbstractText': 'ML Overview',
             'AbstractURL': 'https://ml.org'
-        }
+        }).encode()]
         mock_get.return_value = mock_response
         
         question = "What is machine learning?"
@@ -100,7 +101,7 @@ class TestWebSearchAgent:
         # Mock response
         mock_response = Mock()
         mock_response.raise_for_status.return_value = None
-        mock_response.json.return_value = {'Abstract': 'Test response'}
+        mock_response.iter_content.return_value = [json.dumps({'Abstract': 'Test response'}).encode()]
         mock_get.return_value = mock_response
         
         # Ask multiple questions
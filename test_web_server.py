@@ -1,31 +1,26 @@
 #!/usr/bin/env python3
 import pytest
 import json
-import time
-import threading
 import requests
-from web_server import run_server
-import signal
-import sys
+from unittest.mock import Mock
+from web_server import start_server
 
 class TestWebServer:
     """Test suite for web server functionality"""
     
-    server_thread = None
-    server_port = 8001  # Use different port to avoid conflicts
+    server = None
+    server_port = None
     
     @classmethod
     def setup_class(cls):
-        """Start web server in background thread"""
-        def start_server():
-            try:
-                run_server(cls.server_port)
-            except Exception as e:
-                print(f"Server error: {e}")
-        
-        cls.server_thread = threading.Thread(target=start_server, daemon=True)
-        cls.server_thread.start()
-        time.sleep(2)  # Give server time to start
+        """Start web server in background thread on a free port"""
+        cls.server = start_server(port=0)
+        cls.server_port = cls.server.address[1]
+    
+    @classmethod
+    def teardown_class(cls):
+        """Stop web server after tests"""
+        cls.server.shutdown()
     
     def test_server_starts(self):
         """Test that server starts and responds"""
@@ -104,29 +99,117 @@ class TestWebServer:
         assert response.status_code == 404
 
 
+class TestEmbeddedServer:
+    """Test suite for starting servers in-process"""
+    
+    def test_ephemeral_port_and_ready(self):
+        """Test that port 0 binds a free port and the server is ready on return"""
+        with start_server(port=0) as server:
+            assert server.ready.is_set()
+            assert server.address[1] != 0
+            assert requests.get(f'{server.url}/ready', timeout=5).json() == {'ready': True}
+    
+    def test_instances_are_independent(self):
+        """Test that each server has its own handler state and agent"""
+        agents = []
+        for name in ('first', 'second'):
+            agent = Mock()
+            agent.search_web.return_value = [{'title': name, 'content': name, 'source': ''}]
+            agents.append(agent)
+        
+        with start_server(agent=agents[0]) as first, start_server(agent=agents[1]) as second:
+            assert first.handler_class is not second.handler_class
+            assert requests.get(f'{first.url}/search?q=x', timeout=5).json()['results'][0]['title'] == 'first'
+            assert requests.get(f'{second.url}/search?q=x', timeout=5).json()['results'][0]['title'] == 'second'
+    
+    def test_shutdown_releases_port(self):
+        """Test that shutdown stops serving and closes the socket"""
+        server = start_server()
+        server.shutdown()
+        
+        assert not server.thread.is_alive()
+        with pytest.raises(requests.ConnectionError):
+            requests.get(f'{server.url}/', timeout=2)
+
+
+
+class TestPagination:
+    """Test suite for limit and cursor on /search"""
+    
+    def setup_method(self):
+        self.agent = Mock()
+        self.agent.search_web.return_value = [{'title': f'r{i}', 'content': '', 'source': ''} for i in range(12)]
+        self.server = start_server(agent=self.agent)
+    
+    def teardown_method(self):
+        self.server.shutdown()
+    
+    def test_default_page(self):
+        """Test that without a limit the first five results are returned"""
+        data = requests.get(f'{self.server.url}/search?q=python', timeout=5).json()
+        
+        assert [r['title'] for r in data['results']] == ['r0', 'r1', 'r2', 'r3', 'r4']
+        assert data['next_cursor']
+    
+    def test_later_pages_served_from_store(self):
+        """Test that following cursors walks the result set with one upstream search"""
+        titles = []
+        data = requests.post(f'{self.server.url}/search', json={'query': 'python', 'limit': 5}, timeout=5).json()
+        titles += [r['title'] for r in data['results']]
+        while data['next_cursor']:
+            data = requests.get(f'{self.server.url}/search', params={'cursor': data['next_cursor'], 'limit': 5},
+                                timeout=5).json()
+            titles += [r['title'] for r in data['results']]
+        
+        assert titles == [f'r{i}' for i in range(12)]
+        assert self.agent.search_web.call_count == 1
+    
+    def test_small_limit(self):
+        """Test that a client can ask for fewer results"""
+        data = requests.get(f'{self.server.url}/search?q=python&limit=1', timeout=5).json()
+        
+        assert len(data['results']) == 1
+    
+    @pytest.mark.parametrize('params', [{'q': 'python', 'limit': '0'}, {'q': 'python', 'limit': '1000'},
+                                        {'q': 'python', 'limit': 'x'}, {'q': 'python', 'limit': '2.7'},
+                                        {'q': 'python', 'limit': '-1'}, {'q': 'python', 'limit': ' 3'},
+                                        {'cursor': 'garbage'}])
+    def test_invalid_parameters(self, params):
+        """Test that bad limits and cursors are rejected with 400"""
+        response = requests.get(f'{self.server.url}/search', params=params, timeout=5)
+        
+        assert response.status_code == 400
+        assert self.agent.search_web.call_count == 0
+    
+    @pytest.mark.parametrize('limit', [True, 2.7, 3.0, '3.0', [3]])
+    def test_json_limit_must_be_an_integer(self, limit):
+        """Test that JSON booleans, floats and other types are not coerced into a limit"""
+        response = requests.post(f'{self.server.url}/search', json={'query': 'python', 'limit': limit}, timeout=5)
+        
+        assert response.status_code == 400
+        assert self.agent.search_web.call_count == 0
+    
+    def test_json_integer_limit(self):
+        """Test that integer and digit-string limits are accepted in JSON"""
+        for limit in (3, '3'):
+            data = requests.post(f'{self.server.url}/search', json={'query': 'python', 'limit': limit}, timeout=5).json()
+            assert len(data['results']) == 3
+
+
 def test_web_server_integration():
     """Integration test that simulates the full user flow"""
-    import subprocess
-    import time
-    import signal
-    
-    # Start server in subprocess
-    server_process = subprocess.Popen([
-        'bash', '-c', 
-        'source venv/bin/activate && python3 web_server.py'
-    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Start server in-process on a free port
+    server = start_server(port=0)
     
     try:
-        time.sleep(3)  # Let server start
-        
         # Test HTML page loads
-        response = requests.get('http://localhost:8000/', timeout=5)
+        response = requests.get(f'{server.url}/', timeout=5)
         assert response.status_code == 200
         assert 'Web Search Agent' in response.text
         
         # Test search functionality
         search_response = requests.post(
-            'http://localhost:8000/search',
+            f'{server.url}/search',
             headers={'Content-Type': 'application/json'},
             json={'query': 'test search'},
             timeout=10
@@ -144,8 +227,7 @@ def test_web_server_integration():
         
     finally:
         # Clean up
-        server_process.terminate()
-        server_process.wait(timeout=5)
+        server.shutdown()
 
 
 if __name__ == '__main__':
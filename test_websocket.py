@@ -0,0 +1,303 @@
+import base64
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from unittest.mock import Mock
+import pytest
+import requests
+from search_result import SearchResult
+from web_search_agent import WebSearchAgent
+from web_server import ChatSession, start_server
+from websocket import (OP_BINARY, OP_CLOSE, OP_CONTINUATION, OP_PING, OP_PONG, OP_TEXT, FrameParser,
+                       ProtocolError, WebSocketHub, accept_key, encode_frame)
+
+
+def client_frame(opcode, payload=b'', fin=True, mask=True):
+    """A frame as a client sends it: masked with a random key"""
+    header = bytes([(0x80 if fin else 0) | opcode])
+    length = len(payload)
+    bit = 0x80 if mask else 0
+    if length < 126:
+        header += bytes([bit | length])
+    elif length < 1 << 16:
+        header += bytes([bit | 126]) + struct.pack('!H', length)
+    else:
+        header += bytes([bit | 127]) + struct.pack('!Q', length)
+    if not mask:
+        return header + payload
+    key = os.urandom(4)
+    return header + key + bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+
+
+class TestFrames:
+    """Test suite for the WebSocket framing"""
+
+    def test_accept_key(self):
+        """Test the handshake example from RFC 6455"""
+        assert accept_key('dGhlIHNhbXBsZSBub25jZQ==') == 's3pPLMBiTxaQ9kYGzzhZRbK+xOo='
+
+    def test_encode_lengths(self):
+        """Test the three payload length encodings"""
+        assert encode_frame(OP_TEXT, b'hi') == b'\x81\x02hi'
+        assert encode_frame(OP_TEXT, b'x' * 300)[:4] == b'\x81\x7e\x01\x2c'
+        assert encode_frame(OP_BINARY, b'x' * 70000)[:2] == b'\x82\x7f'
+
+    def test_parse_split_across_reads(self):
+        """Test that a frame arriving a byte at a time is parsed once complete"""
+        parser = FrameParser()
+        data = client_frame(OP_TEXT, 'héllo'.encode() * 50)
+        messages = []
+        for i in range(len(data)):
+            messages += parser.feed(data[i:i + 1])
+
+        assert messages == [(OP_TEXT, 'héllo'.encode() * 50)]
+
+    def test_fragments_with_interleaved_ping(self):
+        """Test that fragments are joined and control frames pass through"""
+        parser = FrameParser()
+        data = (client_frame(OP_TEXT, b'hello ', fin=False) + client_frame(OP_PING, b'p')
+                + client_frame(OP_CONTINUATION, b'world'))
+
+        assert parser.feed(data) == [(OP_PING, b'p'), (OP_TEXT, b'hello world')]
+
+    @pytest.mark.parametrize('data, code', [
+        (client_frame(OP_TEXT, b'x', mask=False), 1002),
+        (client_frame(OP_CONTINUATION, b'x'), 1002),
+        (client_frame(OP_PING, b'x', fin=False), 1002),
+        (client_frame(OP_TEXT, b'x' * 2000), 1009),
+    ])
+    def test_protocol_errors(self, data, code):
+        """Test that malformed or oversized frames raise with the close code"""
+        parser = FrameParser(max_message_bytes=1024)
+        with pytest.raises(ProtocolError) as error:
+            parser.feed(data)
+
+        assert error.value.code == code
+
+
+class WebSocketClient:
+    """Minimal blocking client for tests"""
+
+    def __init__(self, url):
+        host, port = url.split('//')[1].split(':')
+        self.sock = socket.create_connection((host, int(port)), timeout=5)
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.sock.sendall((f"GET /ws HTTP/1.1\r\nHost: {host}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                           f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        self.buffer = b''
+        while b'\r\n\r\n' not in self.buffer:
+            self.buffer += self.sock.recv(4096)
+        head, self.buffer = self.buffer.split(b'\r\n\r\n', 1)
+        self.head = head.decode()
+        assert f"Sec-WebSocket-Accept: {accept_key(key)}" in self.head
+
+    def _read(self, n):
+        while len(self.buffer) < n:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("closed")
+            self.buffer += chunk
+        data, self.buffer = self.buffer[:n], self.buffer[n:]
+        return data
+
+    def receive(self):
+        first, second = self._read(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', self._read(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self._read(8))[0]
+        return first & 0x0F, self._read(length)
+
+    def receive_json(self):
+        opcode, payload = self.receive()
+        assert opcode == OP_TEXT
+        return json.loads(payload)
+
+    def send(self, opcode, payload=b''):
+        self.sock.sendall(client_frame(opcode, payload))
+
+    def ask(self, question):
+        self.send(OP_TEXT, json.dumps({'question': question}).encode())
+        messages = [self.receive_json()]
+        while messages[-1]['type'] not in ('answer', 'error'):
+            messages.append(self.receive_json())
+        return messages
+
+    def close(self):
+        self.sock.close()
+
+
+class TestHubWrites:
+    """Test suite for keeping the hub's selector thread free of blocking writes"""
+
+    def setup_method(self):
+        self.hub = WebSocketHub(lambda: None, send_timeout=2.0)
+
+    def teardown_method(self):
+        self.hub.close()
+
+    def connect(self, buffer_size=None):
+        client, server = socket.socketpair()
+        if buffer_size:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, buffer_size)
+            client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, buffer_size)
+        self.hub.add(server)
+        return client
+
+    def test_client_that_never_reads_does_not_stall_others(self):
+        """Test that pongs owed to a client with a full buffer do not delay other connections"""
+        stuck = self.connect(buffer_size=4096)
+        threading.Thread(target=lambda: [stuck.sendall(client_frame(OP_PING, b'x' * 125)) for _ in range(2000)],
+                         daemon=True).start()
+        time.sleep(0.2)
+        other = self.connect()
+        other.settimeout(5)
+        start = time.monotonic()
+
+        other.sendall(client_frame(OP_PING, b'still there?'))
+
+        assert other.recv(1024) == encode_frame(OP_PONG, b'still there?')
+        assert time.monotonic() - start < 0.5
+        stuck.close()
+        other.close()
+
+
+class TestHubQueueLimit:
+    """Test suite for bounding the messages queued per connection"""
+
+    def test_flooding_client_is_closed(self):
+        """Test that a client queueing more than max_pending_messages is closed with 1008"""
+        release = threading.Event()
+        handled = []
+
+        class SlowSession:
+            def on_message(self, connection, text):
+                release.wait(5)
+                handled.append(text)
+
+        hub = WebSocketHub(SlowSession, max_pending_messages=4)
+        client, server = socket.socketpair()
+        hub.add(server)
+        client.settimeout(5)
+
+        client.sendall(b''.join(client_frame(OP_TEXT, str(i).encode()) for i in range(10)))
+
+        assert client.recv(1024) == encode_frame(OP_CLOSE, struct.pack('!H', 1008) + b'too many queued messages')
+        release.set()
+        hub.close()
+        client.close()
+        assert len(handled) <= 5
+
+    def test_queued_bytes_are_bounded(self):
+        """Test that max_pending_bytes caps queued text, and draining frees it again"""
+        hub = WebSocketHub(lambda: None, max_pending_bytes=10)
+        connection = hub.add(socket.socketpair()[1])
+        connection.busy = True
+
+        assert hub._queue(connection, 'x' * 6)
+        assert not hub._queue(connection, 'x' * 6)
+        assert connection.pending_bytes == 6
+        hub.close()
+
+
+class TestWebSocketEndpoint:
+    """Test suite for per-connection agent sessions over /ws"""
+
+    def setup_method(self):
+        self.agent = WebSearchAgent()
+        self.agent.search_web = lambda query, num_results=5: [
+            SearchResult(f"About {query}", f"{query} is a topic with plenty to say about it", 'https://example.com')]
+        self.server = start_server(agent=self.agent)
+
+    def teardown_method(self):
+        self.server.shutdown()
+
+    def test_results_then_answer(self):
+        """Test that ranked results are pushed before the answer"""
+        client = WebSocketClient(self.server.url)
+        messages = client.ask("python")
+        client.close()
+
+        assert [message['type'] for message in messages] == ['results', 'answer']
+        assert messages[0]['results'][0]['title'] == 'About python'
+        assert 'python is a topic' in messages[1]['answer']
+
+    def test_history_per_connection(self):
+        """Test that each connection keeps its own conversation history"""
+        first, second = WebSocketClient(self.server.url), WebSocketClient(self.server.url)
+        first.ask("python")
+        first.ask("rust")
+        second.ask("golang")
+        sessions = [connection.session for connection in self.server.handler_class.websockets.connections]
+        first.close()
+        second.close()
+
+        assert sorted(len(session.history) for session in sessions) == [2, 4]
+        assert self.agent.conversation_history == []
+
+    def test_history_is_bounded(self):
+        """Test that a session only keeps its last max_history entries"""
+        session = ChatSession(self.agent)
+        connection = Mock()
+        for i in range(ChatSession.max_history):
+            session.on_message(connection, f"question {i}")
+
+        assert len(session.history) == ChatSession.max_history
+        assert session.history[0]['content'] == f"question {ChatSession.max_history // 2}"
+
+    def test_plain_text_question_and_errors(self):
+        """Test plain text questions and the error for an empty one"""
+        client = WebSocketClient(self.server.url)
+        client.send(OP_TEXT, b'python')
+        while client.receive_json()['type'] != 'answer':
+            pass
+        client.send(OP_TEXT, b'{"question": ""}')
+        error = client.receive_json()
+        client.close()
+
+        assert error == {'type': 'error', 'error': 'No question provided'}
+
+    def test_ping_and_close(self):
+        """Test that pings are answered and a close is echoed"""
+        client = WebSocketClient(self.server.url)
+        client.send(OP_PING, b'are you there')
+        assert client.receive() == (OP_PONG, b'are you there')
+
+        client.send(OP_CLOSE, struct.pack('!H', 1000))
+        assert client.receive() == (OP_CLOSE, struct.pack('!H', 1000))
+        client.close()
+
+    def test_idle_connections_use_no_threads(self):
+        """Test that idle connections are held without a thread each"""
+        first = WebSocketClient(self.server.url)
+        baseline = threading.active_count()
+        clients = [WebSocketClient(self.server.url) for _ in range(200)]
+        hub = self.server.handler_class.websockets
+
+        assert hub.status()['connections'] == 201
+        assert threading.active_count() - baseline < 5
+        assert clients[-1].ask("python")[-1]['type'] == 'answer'
+        for client in clients + [first]:
+            client.close()
+
+    def test_plain_get_rejected(self):
+        """Test that /ws without an upgrade is a 400"""
+        response = requests.get(f'{self.server.url}/ws', timeout=5)
+
+        assert response.status_code == 400
+
+    def test_shutdown_sends_going_away(self):
+        """Test that stopping the server closes WebSockets with 1001"""
+        client = WebSocketClient(self.server.url)
+        client.ask("python")
+        self.server.handler_class.websockets.close()
+
+        opcode, payload = client.receive()
+        client.close()
+
+        assert opcode == OP_CLOSE
+        assert struct.unpack('!H', payload[:2])[0] == 1001
@@ -0,0 +1,192 @@
+import json
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+TRACEPARENT = re.compile(r'^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+_current: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """
+    Parse a W3C traceparent header into (trace_id, parent_span_id, sampled)
+    """
+    match = TRACEPARENT.match((value or '').strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == 'ff' or trace_id == '0' * 32 or span_id == '0' * 16:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+
+class Span:
+    """
+    A timed operation within a trace
+
+    sampled is the trace's flag, propagated to upstream requests as is;
+    recording says whether this process exports the span. Spans that are
+    not recorded only carry the trace context.
+    """
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'sampled', 'recording', 'attributes', 'start',
+                 'duration', 'error')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool,
+                 attributes: Optional[Dict[str, Any]] = None, recording: Optional[bool] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.recording = sampled if recording is None else recording
+        self.attributes = attributes or {}
+        self.start = time.time()
+        self.duration = 0.0
+        self.error: Optional[str] = None
+
+    def set(self, key: str, value: Any):
+        if self.recording:
+            self.attributes[key] = value
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': self.duration * 1000,
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+
+class JSONFileExporter:
+    """
+    Append finished spans to a file as JSON lines
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a')
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class Tracer:
+    """
+    Creates spans and hands sampled ones to an exporter
+
+    Sampling is decided once per trace at its root span (head-based): an
+    incoming traceparent's sampled flag is honoured, otherwise a trace is
+    sampled with probability sample_rate. Callers can set the flag freely,
+    so at most max_incoming_per_second of their sampled traces are
+    recorded; the rest keep the flag but are not exported. Spans of
+    unrecorded traces, and all spans while no exporter is configured, cost
+    one context lookup; without an exporter a trace is only carried along
+    when the caller sent a traceparent, so it still reaches upstream
+    requests with the caller's flag unchanged.
+    """
+
+    def __init__(self, exporter=None, sample_rate: float = 1.0, max_incoming_per_second: float = 10.0):
+        self._lock = threading.Lock()
+        self.configure(exporter, sample_rate, max_incoming_per_second)
+
+    def configure(self, exporter=None, sample_rate: float = 1.0, max_incoming_per_second: float = 10.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.max_incoming_per_second = max_incoming_per_second
+        with self._lock:
+            self._tokens = max_incoming_per_second
+            self._refilled = time.monotonic()
+
+    def _admit_incoming(self) -> bool:
+        # Token bucket holding up to one second's worth of caller-sampled traces
+        with self._lock:
+            now = time.monotonic()
+            rate = self.max_incoming_per_second
+            self._tokens = min(rate, self._tokens + (now - self._refilled) * rate)
+            self._refilled = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @contextmanager
+    def span(self, name: str, traceparent: Optional[str] = None, **attributes) -> Iterator[Span]:
+        """
+        Run the body of a with-block as a span, a child of the current one
+
+        With no current span a new trace is started, continuing the
+        incoming traceparent header when one is given.
+        """
+        parent = _current.get()
+        if parent is not None:
+            if not parent.recording or self.exporter is None:
+                yield parent
+                return
+            span = Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes, recording=True)
+        else:
+            incoming = parse_traceparent(traceparent)
+            if incoming is None and self.exporter is None:
+                yield _DISABLED
+                return
+            if incoming is not None:
+                trace_id, parent_id, sampled = incoming
+                recording = sampled and self.exporter is not None and self._admit_incoming()
+            else:
+                trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+                sampled = random.random() < self.sample_rate
+                recording = sampled
+            span = Span(name, trace_id, parent_id, sampled, attributes if recording else None, recording)
+
+        token = _current.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            _current.reset(token)
+            if span.recording:
+                self.exporter.export(span)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def traceparent_header() -> Dict[str, str]:
+    """
+    Headers that propagate the current trace to an outgoing request
+    """
+    span = _current.get()
+    return {'traceparent': span.traceparent()} if span is not None else {}
+
+
+# Stand-in yielded when tracing is off, so callers can always call span.set()
+_DISABLED = Span('disabled', '0' * 32, None, False)
+
+# Process-wide tracer; exports nothing until configured with an exporter
+tracer = Tracer()
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List
+
+
+QUERY_FIELDS = ('query', 'question', 'q', 'title')
+
+
+def read_query_log(path: str) -> Iterator[str]:
+    """
+    Yield queries from a log file, one per line
+
+    Lines may be JSON objects (requests.jsonl style, taking the first of
+    query/question/q/title) or plain query strings.
+    """
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                query = next((record[field] for field in QUERY_FIELDS if record.get(field)), None)
+                if isinstance(query, str) and query.strip():
+                    yield query.strip()
+            else:
+                yield line
+
+
+def top_queries(queries: Iterable[str], n: int) -> List[str]:
+    """
+    Return the n most frequent queries, most popular first
+    """
+    return [query for query, count in Counter(queries).most_common(n)]
+
+
+class CacheWarmer:
+    """
+    Prefetch popular queries through an agent to fill its caches
+
+    Queries are submitted no faster than rate per second and run on
+    concurrency worker threads. The ready event is set once the fraction of
+    queries warmed successfully reaches coverage, or when warm-up finishes.
+    Queries are fetched with num_results, which must match what requests
+    ask for to fill the same cache entries.
+    """
+
+    def __init__(self, agent, queries: List[str], concurrency: int = 4,
+                 rate: float = 5.0, coverage: float = 0.9, num_results: int = 5):
+        self.agent = agent
+        self.num_results = num_results
+        self.queries = list(queries)
+        self.concurrency = concurrency
+        self.rate = rate
+        self.coverage = coverage
+        self.ready = threading.Event()
+        self.completed = 0
+        self.failed = 0
+        self.finished = False
+        self._lock = threading.Lock()
+        if not self.queries:
+            self.finished = True
+            self.ready.set()
+
+    def start(self) -> threading.Thread:
+        """
+        Run warm-up in a background thread
+        """
+        thread = threading.Thread(target=self.run, name='cache-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def run(self):
+        """
+        Prefetch every query, blocking until all have been attempted
+        """
+        interval = 1.0 / self.rate if self.rate > 0 else 0.0
+        next_start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='warmup') as pool:
+            for query in self.queries:
+                delay = next_start - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_start = max(next_start, time.monotonic()) + interval
+                pool.submit(self._warm, query)
+        self.finished = True
+        self.ready.set()
+
+    def _warm(self, query: str):
+        try:
+            results = self.agent.search_web(query, self.num_results)
+            ok = bool(results) and results[0].get('source') != 'Error'
+        except Exception:
+            ok = False
+
+        with self._lock:
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+            if self.completed >= self.coverage * len(self.queries):
+                self.ready.set()
+
+    def status(self) -> dict:
+        """
+        Summarise warm-up progress for the readiness endpoint
+        """
+        with self._lock:
+            return {
+                'ready': self.ready.is_set(),
+                'finished': self.finished,
+                'total': len(self.queries),
+                'completed': self.completed,
+                'failed': self.failed
+            }
+
+
+def warmer_from_log(agent, path: str, top_n: int = 100, **kwargs) -> CacheWarmer:
+    """
+    Build a CacheWarmer for the top_n queries of a log file
+    """
+    return CacheWarmer(agent, top_queries(read_query_log(path), top_n), **kwargs)
@@ -1,97 +1,254 @@
-import asyncio
-import requests
+import argparse
 import json
-from typing import List, Dict
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, TYPE_CHECKING, Iterable, List, Dict, Optional
+
+from ddg_parser import MAX_RESPONSE_BYTES, parse_instant_answer
+from http_cache import HTTPCache
+from negative_cache import EMPTY, NegativeCache
+from pipeline import Pipeline, PipelineContext, Stage
+from query_cache import FuzzyQueryCache
+from ranking import Ranker
+from search_index import SearchIndex
+from search_result import SearchResult
+from tracing import traceparent_header, tracer
+
+if TYPE_CHECKING:
+    from page_fetcher import PageFetcher
+    from remote_cache import RemoteResultCache
+
+
+def __getattr__(name):
+    # requests (with urllib3, certifi, ...) is imported on first use, so
+    # --help and offline use start fast; web_search_agent.requests still works
+    if name == 'requests':
+        import requests
+        return requests
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class WebSearchAgent:
-    def __init__(self):
+    # Using DuckDuckGo instant answer API (no API key required)
+    api_url = "https://api.duckduckgo.com/"
+    max_response_bytes = MAX_RESPONSE_BYTES
+    answer_size = 3
+    
+    def __init__(self, index: Optional[SearchIndex] = None, local_threshold: float = 0.6,
+                 query_cache: Optional[FuzzyQueryCache] = None, ranker: Optional[Ranker] = None,
+                 page_fetcher: Optional['PageFetcher'] = None, http_cache: Optional[HTTPCache] = None,
+                 negative_cache: Optional[NegativeCache] = None, remote_cache: Optional['RemoteResultCache'] = None):
         self.conversation_history = []
+        self.index = index
+        self.local_threshold = local_threshold
+        self.query_cache = query_cache
+        self.ranker = ranker if ranker is not None else Ranker()
+        self.page_fetcher = page_fetcher
+        self.http_cache = http_cache
+        self.negative_cache = negative_cache
+        self.remote_cache = remote_cache
+        self.pipeline = Pipeline([
+            Stage('retrieve', self._retrieve_stage),
+            Stage('filter', self._filter_stage),
+            Stage('rank', self._rank_stage),
+            Stage('format', self._format_stage),
+            Stage('record', self._record_stage),
+        ])
+        if page_fetcher is not None:
+            self.pipeline.insert_after('rank', Stage('enrich', self._enrich_stage))
     
-    def search_web(self, query: str, num_results: int = 5) -> List[Dict[str, str]]:
+    def search_web(self, query: str, num_results: int = 5) -> List[SearchResult]:
         """
         Search the web using DuckDuckGo's instant answer API
         """
+        with tracer.span('search_web', query=query) as span:
+            return self._search_web(query, num_results, span)
+    
+    def _search_web(self, query: str, num_results: int, span) -> List[SearchResult]:
         try:
-            # Using DuckDuckGo instant answer API (no API key required)
-            url = "https://api.duckduckgo.com/"
-            params = {
-                'q': query,
-                'format': 'json',
-                'no_html': '1',
-                'skip_disambig': '1'
-            }
+            if self.query_cache is not None:
+                cached = self.query_cache.get(query, num_results)
+                span.set('query_cache.hit', cached is not None)
+                if cached is not None:
+                    return cached
             
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            # Results another server instance already fetched
+            if self.remote_cache is not None:
+                shared = self.remote_cache.get(query, num_results)
+                span.set('remote_cache.hit', shared is not None)
+                if shared is not None:
+                    if self.query_cache is not None:
+                        self.query_cache.put(query, shared, num_results)
+                    return shared
             
-            results = []
+            if self.negative_cache is not None:
+                outcome = self.negative_cache.lookup(query)
+                span.set('negative_cache.hit', outcome)
+                if outcome == EMPTY:
+                    return self._no_results(query)
+                if outcome is not None:
+                    return self._search_error(query, "the search service failed moments ago")
             
-            # Get abstract if available
-            if data.get('Abstract'):
-                results.append({
-                    'title': data.get('AbstractText', 'Summary'),
-                    'content': data['Abstract'],
-                    'source': data.get('AbstractURL', '')
-                })
+            results = self._fetch_results(query, num_results)
             
-            # Get related topics
-            for topic in data.get('RelatedTopics', [])[:num_results]:
-                if isinstance(topic, dict) and topic.get('Text'):
-                    results.append({
-                        'title': topic.get('Text', '')[:100] + '...' if len(topic.get('Text', '')) > 100 else topic.get('Text', ''),
-                        'content': topic.get('Text', ''),
-                        'source': topic.get('FirstURL', '')
-                    })
-            
-            # If no results, try a different approach with web scraping
-            if not results:
-                results.append({
-                    'title': 'Search Result',
-                    'content': f'I searched for "{query}" but could not find specific results. Let me provide what I know about this topic.',
-                    'source': 'General knowledge'
-                })
+            if results:
+                if self.index is not None:
+                    self.index.add_results(results)
+                if self.query_cache is not None:
+                    self.query_cache.put(query, results, num_results)
+                if self.remote_cache is not None:
+                    self.remote_cache.put(query, results, num_results)
+            else:
+                if self.negative_cache is not None:
+                    self.negative_cache.add_empty(query)
+                results = self._no_results(query)
             
             return results
             
         except Exception as e:
-            return [{
-                'title': 'Search Error',
-                'content': f'I encountered an error while searching: {str(e)}. Let me provide what I know about "{query}".',
-                'source': 'Error'
-            }]
+            span.set('error', str(e))
+            if self.negative_cache is not None:
+                self.negative_cache.add_error(query)
+            return self._search_error(query, str(e))
+    
+    def _no_results(self, query: str) -> List[SearchResult]:
+        # If no results, try a different approach with web scraping
+        return [SearchResult(
+            title='Search Result',
+            content=f'I searched for "{query}" but could not find specific results. Let me provide what I know about this topic.',
+            source='General knowledge'
+        )]
+    
+    def _search_error(self, query: str, error: str) -> List[SearchResult]:
+        return [SearchResult(
+            title='Search Error',
+            content=f'I encountered an error while searching: {error}. Let me provide what I know about "{query}".',
+            source='Error'
+        )]
     
-    def process_question(self, question: str) -> str:
+    def _fetch_results(self, query: str, num_results: int) -> List[SearchResult]:
         """
-        Process a user question by searching the web and generating an answer
+        Fetch and parse results for a query from the upstream API
         """
-        # Search the web for information
-        search_results = self.search_web(question)
+        url = self.api_url
+        params = {
+            'q': query,
+            'format': 'json',
+            'no_html': '1',
+            'skip_disambig': '1'
+        }
         
-        # Add to conversation history
-        self.conversation_history.append({"role": "user", "content": question})
+        # Reuse a fresh upstream response, or revalidate a stale one
+        key = (query, num_results)
+        entry = self.http_cache.lookup(key) if self.http_cache is not None else None
+        if entry is not None and entry.is_fresh():
+            return list(entry.value)
+        headers = entry.conditional_headers() if entry is not None else {}
         
-        # Generate response based on search results
-        if search_results and not search_results[0]['content'].startswith('I searched for'):
-            response = self.generate_response(question, search_results)
-        else:
-            response = f"I searched for information about '{question}' but could not find specific current results. This could be due to the search API limitations or the specific nature of your question."
+        # Stream the body so huge payloads are never fully buffered or decoded
+        import requests
+        with tracer.span('upstream.request', url=url) as span:
+            headers.update(traceparent_header())
+            response = requests.get(url, params=params, timeout=10, stream=True, headers=headers)
+            span.set('http.status', response.status_code)
+        try:
+            if entry is not None and response.status_code == 304:
+                return list(self.http_cache.refresh(key, entry, response.headers).value)
+            response.raise_for_status()
+            with tracer.span('upstream.parse') as span:
+                results = parse_instant_answer(response.iter_content(chunk_size=16384), num_results,
+                                               self.max_response_bytes)
+                span.set('results', len(results))
+        finally:
+            response.close()
         
-        # Add response to history
-        self.conversation_history.append({"role": "assistant", "content": response})
+        if self.http_cache is not None:
+            self.http_cache.store(key, results, response.headers)
+        return results
+    
+    def search_local(self, query: str, num_results: int = 5) -> Optional[List[SearchResult]]:
+        """
+        Look the query up in the local index of previously fetched results
+
+        Returns None when there is no index or the best match scores below
+        local_threshold, meaning the caller should go upstream instead.
+        """
+        if self.index is None:
+            return None
         
-        return response
+        matches = self.index.search(query, num_results)
+        if not matches or matches[0][0] < self.local_threshold:
+            return None
+        return [result for score, result in matches]
+    
+    def process_question(self, question: str, remember: bool = True) -> str:
+        """
+        Process a user question by searching the web and generating an answer
+
+        Pass remember=False to leave conversation_history untouched, e.g. for
+        independent questions in batch jobs.
+        """
+        return self.run_pipeline(question, remember).response
+    
+    def run_pipeline(self, question: str, remember: bool = True, history: Optional[list] = None,
+                     on_stage=None) -> PipelineContext:
+        """
+        Run a question through the pipeline and return its context, which
+        carries the results, the response and per-stage timings
+
+        The exchange is recorded in history when given (e.g. a per-connection
+        session's), else in conversation_history. on_stage(name, ctx) is
+        called after each stage, so callers can report progress.
+        """
+        if history is None:
+            history = self.conversation_history
+        with tracer.span('process_question'):
+            return self.pipeline.run(PipelineContext(question, history if remember else None), on_stage)
+    
+    def _retrieve_stage(self, ctx: PipelineContext):
+        # Answer from previously fetched results when they match well enough
+        ctx.results = self.search_local(ctx.question)
+        if ctx.results is None:
+            ctx.results = self.search_web(ctx.question)
+    
+    def _filter_stage(self, ctx: PipelineContext):
+        ctx.results = [result for result in ctx.results if not result['content'].startswith('I searched for')]
+    
+    def _rank_stage(self, ctx: PipelineContext):
+        # Keep the candidates most relevant to the question, best first
+        ctx.results = self.ranker.rank(ctx.question, ctx.results, self.answer_size)
+    
+    def _enrich_stage(self, ctx: PipelineContext):
+        # Swap one-line snippets for the main text of the source pages
+        ctx.results = self.page_fetcher.enrich(ctx.results, self.answer_size)
+    
+    def _format_stage(self, ctx: PipelineContext):
+        # Generate response based on search results
+        if ctx.results:
+            ctx.response = self.generate_response(ctx.question, ctx.results)
+        else:
+            ctx.response = f"I searched for information about '{ctx.question}' but could not find specific current results. This could be due to the search API limitations or the specific nature of your question."
+    
+    def _record_stage(self, ctx: PipelineContext):
+        if ctx.history is not None:
+            ctx.history.append({"role": "user", "content": ctx.question})
+            ctx.history.append({"role": "assistant", "content": ctx.response})
     
     def generate_response(self, question: str, search_results: List[Dict[str, str]]) -> str:
         """
         Generate a response based on search results
         """
+        with tracer.span('generate_response', results=len(search_results)):
+            return self._generate_response(question, search_results)
+    
+    def _generate_response(self, question: str, search_results: List[Dict[str, str]]) -> str:
         response_parts = []
         
         response_parts.append(f"Based on my web search for '{question}', here's what I found:\n")
         
-        for i, result in enumerate(search_results[:3], 1):  # Use top 3 results
+        for i, result in enumerate(search_results[:self.answer_size], 1):  # Use top 3 results
             if result['content'] and not result['content'].startswith('I searched for'):
                 response_parts.append(f"{i}. {result['content']}")
                 if result['source']:
@@ -131,11 +288,100 @@ class WebSearchAgent:
                 break
             except Exception as e:
                 print(f"Error: {str(e)}")
+    
+    def _answer_record(self, line: str) -> Dict[str, object]:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            return {'error': 'Invalid JSON'}
+        
+        if isinstance(record, str):
+            record = {'question': record}
+        if not isinstance(record, dict):
+            return {'error': 'No question provided'}
+        question = record.get('question') or record.get('query')
+        if not isinstance(question, str) or not question.strip():
+            return {'error': 'No question provided'}
+        
+        answer = {'id': record['id']} if 'id' in record else {}
+        answer['question'] = question
+        try:
+            answer['answer'] = self.process_question(question, remember=False)
+        except Exception as e:
+            answer['error'] = str(e)
+        return answer
+    
+    def batch_loop(self, lines: Iterable[str], output: IO[str], parallelism: int = 8,
+                   progress: Optional[IO[str]] = sys.stderr, progress_interval: float = 5.0) -> Dict[str, float]:
+        """
+        Answer JSONL questions concurrently, writing JSONL answers in input order
+
+        Each input line is a JSON object with a "question" (or "query") and an
+        optional "id" that is echoed back, or a bare JSON string. At most
+        4 * parallelism questions are in flight, so memory stays flat for
+        arbitrarily long inputs. Batch questions are not added to
+        conversation_history.
+        """
+        start = time.monotonic()
+        last_report = start
+        processed = 0
+        errors = 0
+        pending = deque()
+        
+        def emit(future):
+            nonlocal processed, errors, last_report
+            answer = future.result()
+            output.write(json.dumps(answer, ensure_ascii=False) + "\n")
+            processed += 1
+            if 'error' in answer:
+                errors += 1
+            now = time.monotonic()
+            if progress is not None and now - last_report >= progress_interval:
+                last_report = now
+                output.flush()
+                print(f"Processed {processed} questions ({processed / (now - start):.1f}/s, {errors} errors)",
+                      file=progress)
+        
+        with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='batch') as pool:
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                pending.append(pool.submit(self._answer_record, line))
+                while len(pending) >= 4 * parallelism or (pending and pending[0].done()):
+                    emit(pending.popleft())
+            while pending:
+                emit(pending.popleft())
+        output.flush()
+        
+        elapsed = time.monotonic() - start
+        stats = {
+            'processed': processed,
+            'errors': errors,
+            'elapsed': elapsed,
+            'throughput': processed / elapsed if elapsed > 0 else 0.0
+        }
+        if progress is not None:
+            print(f"Done: {processed} questions in {elapsed:.1f}s ({stats['throughput']:.1f}/s, {errors} errors)",
+                  file=progress)
+        return stats
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Web Search Agent")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="answer JSONL questions from FILE ('-' for stdin) and write JSONL answers to stdout")
+    parser.add_argument('--parallelism', type=int, default=8, help="questions processed concurrently in batch mode")
+    args = parser.parse_args()
+    
     agent = WebSearchAgent()
-    agent.chat_loop()
+    if args.batch is None:
+        agent.chat_loop()
+    elif args.batch == '-':
+        agent.batch_loop(sys.stdin, sys.stdout, args.parallelism)
+    else:
+        with open(args.batch, 'r') as f:
+            agent.batch_loop(f, sys.stdout, args.parallelism)
 
 
 if __name__ == "__main__":
@@ -1,33 +1,160 @@
 #!/usr/bin/env python3
+import argparse
+import hmac
 import json
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import math
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler
 from urllib.parse import parse_qs, urlparse
-from web_search_agent import WebSearchAgent
+from admission import Overloaded, default_lanes
+from http_cache import HTTPCache
+from memory import allocation_tracer, measure, rss_bytes
+from negative_cache import NegativeCache
+from profiler import SamplingProfiler, profile_for
+from query_cache import FuzzyQueryCache
+from reload import (HANDOFF_ENV, ReloadableHTTPServer, inherited_socket, load_handoff, notify_ready,
+                    save_handoff, spawn_successor)
+from result_store import ResultStore, decode_cursor, encode_cursor
+from search_result import json_default
+from suggest import SuggestionIndex
+from tracing import JSONFileExporter, tracer
+from warmup import read_query_log, warmer_from_log
+from websocket import WebSocketHub, accept_key
 
 class WebSearchHandler(BaseHTTPRequestHandler):
     agent = None
+    warmer = None
+    admission = None
+    api_key_lanes = {}
+    route_lanes = {'POST': 'interactive', 'GET': 'bulk'}
+    admin_token = None
+    profile_dir = 'profiles'
+    profile_path = None
+    max_profile_seconds = 60.0
+    trace_span = None
+    result_store = None
+    page_size = 5
+    max_page_size = 50
+    websockets = None
+    suggestions = None
+    # Deadline for a whole request to arrive (None reads on the handler thread)
+    read_timeout = 15.0
+    max_header_bytes = 65536
+    max_body_bytes = 1 << 20
+    # Socket timeout once a request is handled, bounding each response write
+    timeout = 30.0
     
     @classmethod
     def set_agent(cls, agent):
         cls.agent = agent
+    
+    @classmethod
+    def set_warmer(cls, warmer):
+        cls.warmer = warmer
+    
+    @classmethod
+    def set_admission(cls, admission, api_key_lanes=None):
+        api_key_lanes = dict(api_key_lanes or {})
+        unknown = sorted(set(api_key_lanes.values()) - set(admission.lanes if admission else ()))
+        if unknown:
+            raise ValueError(f"API keys mapped to unknown lanes: {', '.join(unknown)}")
+        cls.admission = admission
+        cls.api_key_lanes = api_key_lanes
+    
+    @classmethod
+    def set_profiling(cls, admin_token, profile_dir='profiles'):
+        cls.admin_token = admin_token
+        cls.profile_dir = profile_dir
+    
+    @classmethod
+    def set_result_store(cls, result_store):
+        cls.result_store = result_store
+    
+    @classmethod
+    def set_websockets(cls, websockets):
+        cls.websockets = websockets
+    
+    @classmethod
+    def set_suggestions(cls, suggestions):
+        cls.suggestions = suggestions
+    
+    @classmethod
+    def set_limits(cls, read_timeout=15.0, write_timeout=30.0, max_body_bytes=1 << 20):
+        cls.read_timeout = read_timeout
+        cls.timeout = write_timeout
+        cls.max_body_bytes = max_body_bytes
+    
+    @classmethod
+    def is_cached(cls, query):
+        """
+        Whether a first page of results for query can be served without going upstream
+        
+        Only caches keyed by the normalised query are consulted: suggestions
+        are lowercased, so they cannot match the raw query keys of HTTPCache.
+        """
+        if cls.result_store is not None and query in cls.result_store:
+            return True
+        agent = cls.agent
+        return (agent is not None and agent.query_cache is not None
+                and agent.query_cache.contains(query, cls.max_page_size))
+
+    @classmethod
+    def memory_structures(cls):
+        """The agent's and server's long-lived data structures, by name"""
+        structures = {}
+        agent = cls.agent
+        if agent is not None:
+            structures.update(
+                conversation_history=agent.conversation_history,
+                search_index=agent.index,
+                query_cache=agent.query_cache,
+                http_cache=agent.http_cache,
+                page_cache=agent.page_fetcher.cache if agent.page_fetcher is not None else None,
+                negative_cache=agent.negative_cache,
+                remote_cache=agent.remote_cache,
+            )
+        structures.update(
+            result_store=cls.result_store,
+            suggestions=cls.suggestions,
+            websocket_sessions=cls.websockets.connections if cls.websockets else None,
+        )
+        return {name: obj for name, obj in structures.items() if obj is not None}
 
     def do_GET(self):
-        if self.path == '/' or self.path == '/index.html':
-            self.send_html()
-        elif self.path == '/debug':
-            self.send_debug_html()
-        elif self.path.startswith('/search'):
-            self.handle_search()
-        else:
-            self.send_response(404)
-            self.end_headers()
+        with self.tracing(), self.profiling():
+            if self.path == '/' or self.path == '/index.html':
+                self.send_html()
+            elif self.path == '/debug':
+                self.send_debug_html()
+            elif self.path == '/ready':
+                self.send_readiness()
+            elif self.path == '/ws' and self.websockets:
+                self.handle_websocket()
+            elif self.path.startswith('/suggest') and self.suggestions is not None:
+                self.send_suggestions()
+            elif self.path.startswith('/search'):
+                self.handle_search()
+            elif self.path.startswith('/admin/profile') and self.admin_token:
+                self.send_profile()
+            elif self.path.startswith('/admin/memory') and self.admin_token:
+                self.send_memory()
+            else:
+                self.send_response(404)
+                self.end_headers()
 
     def do_POST(self):
-        if self.path == '/search':
-            self.handle_search_post()
-        else:
-            self.send_response(404)
-            self.end_headers()
+        with self.tracing(), self.profiling():
+            if self.path == '/search':
+                self.handle_search_post()
+            else:
+                self.send_response(404)
+                self.end_headers()
     
     def do_OPTIONS(self):
         """Handle OPTIONS requests for CORS"""
@@ -41,6 +168,47 @@ class WebSearchHandler(BaseHTTPRequestHandler):
         """Handle HEAD requests"""
         self.do_GET()
     
+    @contextmanager
+    def tracing(self):
+        """Trace this request, continuing the caller's trace from a traceparent header"""
+        with tracer.span('http.request', traceparent=self.headers.get('traceparent'),
+                         method=self.command, path=urlparse(self.path).path) as span:
+            self.trace_span = span
+            yield span
+    
+    def send_response(self, code, message=None):
+        if self.trace_span is not None:
+            self.trace_span.set('http.status', code)
+        super().send_response(code, message)
+    
+    def end_headers(self):
+        if self.profile_path:
+            self.send_header('X-Profile-Output', self.profile_path)
+        super().end_headers()
+    
+    def is_admin(self, header='X-Admin-Token'):
+        token = self.headers.get(header)
+        if not (self.admin_token and token):
+            return False
+        # compare_digest only takes ASCII str, and headers may carry any byte
+        return hmac.compare_digest(token.encode('utf-8', 'surrogateescape'),
+                                   self.admin_token.encode('utf-8', 'surrogateescape'))
+    
+    @contextmanager
+    def profiling(self):
+        """Sample this request's stack when it carries the admin token in X-Profile"""
+        if not self.admin_token or 'X-Profile' not in self.headers or not self.is_admin('X-Profile'):
+            yield
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.profile_path = os.path.join(self.profile_dir, f"request-{time.time_ns()}.folded")
+        profiler = SamplingProfiler(thread_ids=[threading.get_ident()]).start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            profiler.write(self.profile_path)
+    
     def log_message(self, format, *args):
         """Override to add more detailed logging"""
         print(f"{self.address_string()} - {format % args}")
@@ -69,7 +237,8 @@ class WebSearchHandler(BaseHTTPRequestHandler):
 <body>
     <h1>Web Search Agent</h1>
     <div class="search-box">
-        <input type="text" id="query" placeholder="Enter your search query..." />
+        <input type="text" id="query" list="suggestions" autocomplete="off" placeholder="Enter your search query..." />
+        <datalist id="suggestions"></datalist>
         <button onclick="search()">Search</button>
     </div>
     <div id="results"></div>
@@ -130,6 +299,27 @@ class WebSearchHandler(BaseHTTPRequestHandler):
             return div.innerHTML;
         }
         
+        let suggestTimer = null;
+        document.getElementById('query').addEventListener('input', function(e) {
+            clearTimeout(suggestTimer);
+            const prefix = e.target.value;
+            suggestTimer = setTimeout(() => {
+                if (!prefix) return;
+                fetch('/suggest?q=' + encodeURIComponent(prefix))
+                    .then(response => response.json())
+                    .then(data => {
+                        const list = document.getElementById('suggestions');
+                        list.innerHTML = '';
+                        data.suggestions.forEach(suggestion => {
+                            const option = document.createElement('option');
+                            option.value = suggestion;
+                            list.appendChild(option);
+                        });
+                    })
+                    .catch(() => {});
+            }, 100);
+        });
+        
         document.getElementById('query').addEventListener('keypress', function(e) {
             if (e.key === 'Enter') {
                 search();
@@ -154,30 +344,187 @@ class WebSearchHandler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(html.encode())
 
+    def send_readiness(self):
+        """Report whether cache warm-up has reached its target coverage"""
+        if not self.warmer:
+            self.send_json_response({'ready': True})
+            return
+        
+        status = self.warmer.status()
+        self.send_json_response(status, 200 if status['ready'] else 503)
+
+    def send_profile(self):
+        """Sample all threads for ?seconds=N and return collapsed stacks"""
+        if not self.is_admin():
+            self.send_json_response({'error': 'Forbidden'}, 403)
+            return
+        
+        params = parse_qs(urlparse(self.path).query)
+        try:
+            seconds = float(params.get('seconds', ['10'])[0])
+        except ValueError:
+            seconds = math.nan
+        if not math.isfinite(seconds) or seconds <= 0:
+            self.send_json_response({'error': 'seconds must be a positive number'}, 400)
+            return
+        seconds = min(seconds, self.max_profile_seconds)
+        
+        body = profile_for(seconds).collapsed().encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'text/plain')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_memory(self):
+        """
+        Report memory held by each structure, or drive tracemalloc
+        
+        /admin/memory measures the structures; /admin/memory/trace?action=start
+        (with optional frames=N) or action=stop turns allocation tracing on
+        and off; /admin/memory/snapshot?top=20&by=lineno returns the top
+        allocation sites and what changed since the previous snapshot.
+        """
+        if not self.is_admin():
+            self.send_json_response({'error': 'Forbidden'}, 403)
+            return
+        
+        parsed_url = urlparse(self.path)
+        params = parse_qs(parsed_url.query)
+        try:
+            if parsed_url.path == '/admin/memory':
+                structures = measure(self.memory_structures(), exclude=[self.agent, self.admission])
+                self.send_json_response({'rss_bytes': rss_bytes(), 'structures': structures,
+                                         'tracemalloc': allocation_tracer.status()})
+            elif parsed_url.path == '/admin/memory/trace':
+                action = params.get('action', [''])[0]
+                if action == 'start':
+                    allocation_tracer.start(int(params.get('frames', ['1'])[0]))
+                elif action == 'stop':
+                    allocation_tracer.stop()
+                else:
+                    raise ValueError("action must be start or stop")
+                self.send_json_response(allocation_tracer.status())
+            elif parsed_url.path == '/admin/memory/snapshot':
+                self.send_json_response(allocation_tracer.snapshot(
+                    int(params.get('top', ['20'])[0]), params.get('by', ['lineno'])[0]))
+            else:
+                self.send_json_response({'error': 'Not found'}, 404)
+        except ValueError as e:
+            self.send_json_response({'error': str(e)}, 400)
+        except RuntimeError as e:
+            self.send_json_response({'error': f"{e}; start it with /admin/memory/trace?action=start"}, 409)
+
+    def request_lane(self):
+        """
+        Classify the request into a priority lane
+        
+        A known X-API-Key decides the lane, otherwise the route: the browser
+        UI POSTs and is interactive, GET /search is used by API clients and
+        is bulk. An X-Priority header naming a lane is honoured only if that
+        lane's weight is no higher, so clients can lower their priority but
+        not raise it.
+        """
+        api_key = self.headers.get('X-API-Key')
+        if api_key in self.api_key_lanes:
+            return self.api_key_lanes[api_key]
+        lane = self.route_lanes.get(self.command, 'bulk')
+        priority = self.headers.get('X-Priority', '').strip().lower()
+        lanes = self.admission.lanes
+        if priority in lanes and lane in lanes and lanes[priority].weight <= lanes[lane].weight:
+            return priority
+        return lane
+
+    def search(self, query, num_results=5):
+        """Run a search, waiting for a slot in the request's lane"""
+        if not self.admission:
+            return self.agent.search_web(query, num_results)
+        lane = self.request_lane()
+        with tracer.span('admission.wait', lane=lane):
+            self.admission.acquire(lane)
+        try:
+            return self.agent.search_web(query, num_results)
+        finally:
+            self.admission.release(lane)
+
+    def search_page(self, query, limit=None, cursor=None):
+        """
+        Return one page of results and the cursor of the next page, if any
+        
+        Every page searches for up to max_page_size results, so all pages
+        share the agent's cache entries, and the first keeps them in the
+        result store; pages after it are sliced from the store. Raises
+        ValueError for an invalid limit or cursor.
+        """
+        offset = 0
+        if cursor:
+            query, offset = decode_cursor(cursor)
+        if limit is None or limit == '':
+            limit = self.page_size
+        elif isinstance(limit, str) and limit.isascii() and limit.isdigit():
+            limit = int(limit)
+        elif not isinstance(limit, int) or isinstance(limit, bool):
+            raise ValueError("limit must be a whole number")
+        if not 1 <= limit <= self.max_page_size:
+            raise ValueError(f"limit must be between 1 and {self.max_page_size}")
+        end = offset + limit
+        
+        if not cursor and self.suggestions is not None:
+            self.suggestions.add(query)
+        
+        results = self.result_store.get(query) if self.result_store is not None else None
+        if results is None:
+            results = self.search(query, self.max_page_size)
+            # Errors are transient; the agent's negative cache decides when to retry
+            if self.result_store is not None and (not results or results[0].get('source') != 'Error'):
+                self.result_store.put(query, results)
+        
+        return {
+            'results': results[offset:end],
+            'next_cursor': encode_cursor(query, end) if end < len(results) else None
+        }
+
+    def send_overloaded(self, error):
+        self.send_json_response({'error': 'Server busy, please retry', 'lane': error.lane}, 503,
+                                headers={'Retry-After': '1'})
+
+    def send_suggestions(self):
+        """Complete a partial query from past queries, favouring cached ones"""
+        prefix = parse_qs(urlparse(self.path).query).get('q', [''])[0]
+        self.send_json_response({'query': prefix, 'suggestions': self.suggestions.suggest(prefix)})
+
     def handle_search(self):
         parsed_url = urlparse(self.path)
         params = parse_qs(parsed_url.query)
         query = params.get('q', [''])[0]
+        cursor = params.get('cursor', [''])[0]
         
-        if not query:
+        if not query and not cursor:
             self.send_json_response({'error': 'No query provided'}, 400)
             return
         
         try:
-            results = self.agent.search_web(query)
-            self.send_json_response({'results': results})
+            page = self.search_page(query, params.get('limit', [None])[0], cursor)
+            self.send_json_response(page)
+        except ValueError as e:
+            self.send_json_response({'error': str(e)}, 400)
+        except Overloaded as e:
+            self.send_overloaded(e)
         except Exception as e:
             self.send_json_response({'error': str(e)}, 500)
 
     def handle_search_post(self):
         try:
             content_length = int(self.headers['Content-Length'])
+            if content_length > self.max_body_bytes:
+                self.send_json_response({'error': f'Request body larger than {self.max_body_bytes} bytes'}, 413)
+                return
             post_data = self.rfile.read(content_length)
             
             data = json.loads(post_data.decode())
             query = data.get('query', '')
+            cursor = data.get('cursor')
             
-            if not query:
+            if not query and not cursor:
                 self.send_json_response({'error': 'No query provided'}, 400)
                 return
             
@@ -185,35 +532,315 @@ class WebSearchHandler(BaseHTTPRequestHandler):
                 self.send_json_response({'error': 'Search agent not initialized'}, 500)
                 return
             
-            results = self.agent.search_web(query)
-            self.send_json_response({'results': results})
+            page = self.search_page(query, data.get('limit'), cursor)
+            self.send_json_response(page)
             
         except json.JSONDecodeError:
             self.send_json_response({'error': 'Invalid JSON'}, 400)
+        except (TypeError, ValueError) as e:
+            self.send_json_response({'error': str(e)}, 400)
+        except Overloaded as e:
+            self.send_overloaded(e)
         except Exception as e:
             print(f"Search error: {e}")
             self.send_json_response({'error': str(e)}, 500)
 
-    def send_json_response(self, data, status=200):
-        self.send_response(status)
-        self.send_header('Content-type', 'application/json')
+    def handle_websocket(self):
+        """Complete the WebSocket opening handshake and hand the connection to the hub"""
+        key = self.headers.get('Sec-WebSocket-Key')
+        if (self.headers.get('Upgrade', '').lower() != 'websocket' or not key
+                or 'upgrade' not in self.headers.get('Connection', '').lower()
+                or self.headers.get('Sec-WebSocket-Version') != '13'):
+            self.send_json_response({'error': 'Expected a WebSocket upgrade'}, 400,
+                                    headers={'Sec-WebSocket-Version': '13'})
+            return
+        
+        # Clients send nothing before the 101, so the hub can own the socket first
+        try:
+            self.websockets.add(self.request)
+        except RuntimeError:
+            self.send_json_response({'error': 'Server shutting down'}, 503)
+            return
+        self.server.detach(self.request)
+        self.close_connection = True
+        
+        # Browsers only accept a 101 with an HTTP/1.1 status line
+        self.protocol_version = 'HTTP/1.1'
+        self.send_response(101, 'Switching Protocols')
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept_key(key))
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
 
-def run_server(port=8000):
+    def send_json_response(self, data, status=200, headers=None):
+        with tracer.span('response.write'):
+            self.send_response(status)
+            self.send_header('Content-type', 'application/json')
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(json.dumps(data, default=json_default).encode())
+
+class ChatSession:
+    """
+    The conversation on one WebSocket connection
+
+    Each message is a question, as plain text or as {"question": ...}.
+    Results are pushed as soon as the rank (and enrich) stages finish, then
+    the answer. Each exchange is recorded in this session's own history,
+    apart from other connections and the agent's conversation_history, and
+    only the last max_history entries are kept. Answers are not built from
+    the history; every question is searched on its own.
+    """
+    
+    lane = 'interactive'
+    result_stages = ('rank', 'enrich')
+    max_history = 20
+    
+    def __init__(self, agent, admission=None):
+        self.agent = agent
+        self.admission = admission
+        self.history = []
+    
+    def on_message(self, connection, text):
+        try:
+            data = json.loads(text)
+            question = data.get('question', '') if isinstance(data, dict) else ''
+        except json.JSONDecodeError:
+            question = text.strip()
+        if not question:
+            connection.send_json({'type': 'error', 'error': 'No question provided'})
+            return
+        
+        def push_results(stage, ctx):
+            if stage in self.result_stages:
+                connection.send_json({'type': 'results', 'stage': stage, 'results': ctx.results},
+                                     default=json_default)
+        
+        if self.admission:
+            try:
+                self.admission.acquire(self.lane)
+            except Overloaded as e:
+                connection.send_json({'type': 'error', 'error': 'Server busy, please retry', 'lane': e.lane})
+                return
+        try:
+            ctx = self.agent.run_pipeline(question, history=self.history, on_stage=push_results)
+        finally:
+            if self.admission:
+                self.admission.release(self.lane)
+        del self.history[:-self.max_history]
+        connection.send_json({'type': 'answer', 'question': question, 'answer': ctx.response})
+
+class ServerHandle:
+    """
+    A web server running on a background thread
+
+    address is the bound (host, port), so port 0 can be used to get a free
+    ephemeral port. ready is set once the server is accepting connections.
+    Each handle has its own handler class, so several servers can run in
+    one process with different agents.
+    """
+    
+    def __init__(self, httpd, handler_class):
+        self.httpd = httpd
+        self.handler_class = handler_class
+        self.address = httpd.server_address[:2]
+        host = self.address[0] if self.address[0] not in ('', '0.0.0.0') else 'localhost'
+        self.url = f"http://{host}:{self.address[1]}"
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._serve, name=f"web-server-{self.address[1]}", daemon=True)
+    
+    def _serve(self):
+        self.ready.set()
+        self.httpd.serve_forever(poll_interval=0.05)
+    
+    def shutdown(self, timeout=5.0):
+        """Stop accepting, wait up to timeout for in-flight requests and close the socket"""
+        self.httpd.shutdown()
+        if self.handler_class.websockets:
+            self.handler_class.websockets.close()
+        self.httpd.drain(timeout)
+        self.httpd.server_close()
+        self.thread.join(timeout)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+def start_server(port=0, host='127.0.0.1', agent=None, admission=None, api_key_lanes=None,
+                 log_requests=False):
+    """
+    Start a server in a background thread and return its ServerHandle
+    
+    The socket is bound and listening before this returns, so requests
+    can be sent straight away. Without an agent a WebSearchAgent with an
+    upstream HTTP cache is created.
+    """
+    attributes = {} if log_requests else {'log_message': lambda self, format, *args: None}
+    handler_class = type('WebSearchHandler', (WebSearchHandler,), attributes)
+    if agent is None:
+        from web_search_agent import WebSearchAgent
+        agent = WebSearchAgent(http_cache=HTTPCache())
+    handler_class.set_agent(agent)
+    handler_class.set_admission(admission, api_key_lanes)
+    handler_class.set_result_store(ResultStore())
+    handler_class.set_websockets(WebSocketHub(lambda: ChatSession(handler_class.agent, handler_class.admission)))
+    handler_class.set_suggestions(SuggestionIndex(is_cached=handler_class.is_cached))
+    
+    server = ServerHandle(ReloadableHTTPServer((host, port), handler_class), handler_class)
+    server.thread.start()
+    server.ready.wait()
+    return server
+
+def run_server(port=8000, warmup_log=None, warmup_top_n=100, warmup_concurrency=4,
+               warmup_rate=5.0, warmup_coverage=0.9, upstream_cache_ttl=300.0, api_key_lanes=None,
+               pid_file=None, drain_timeout=30.0, admin_token=None, profile_dir='profiles',
+               trace_file=None, trace_sample_rate=0.01, negative_ttl=60.0, negative_error_ttl=5.0,
+               page_ttl=120.0, remote_cache=None, remote_cache_ttl=300.0, read_timeout=15.0,
+               write_timeout=30.0, max_body_bytes=1 << 20):
+    # Slow or oversized requests are turned away before they reach a worker thread
+    WebSearchHandler.set_limits(read_timeout, write_timeout, max_body_bytes)
+    # Bind first so connections queue in the backlog instead of being refused while we start up
+    server_address = ('', port)
+    httpd = ReloadableHTTPServer(server_address, WebSearchHandler, listen_socket=inherited_socket())
+    
     # Initialize the agent
-    agent = WebSearchAgent()
+    from web_search_agent import WebSearchAgent
+    shared_cache = None
+    if remote_cache:
+        from remote_cache import RemoteResultCache
+        shared_cache = RemoteResultCache(remote_cache, ttl=remote_cache_ttl)
+    agent = WebSearchAgent(
+        query_cache=FuzzyQueryCache() if warmup_log else None,
+        http_cache=HTTPCache(default_ttl=upstream_cache_ttl),
+        negative_cache=NegativeCache(negative_ttl, negative_error_ttl) if negative_ttl > 0 else None,
+        remote_cache=shared_cache
+    )
     WebSearchHandler.set_agent(agent)
     
-    server_address = ('', port)
-    httpd = HTTPServer(server_address, WebSearchHandler)
-    print(f"Web Search Agent server running on http://localhost:{port}")
+    # Pick up the hot cache entries of the process we are replacing
+    handoff_path = os.environ.pop(HANDOFF_ENV, None)
+    if handoff_path:
+        try:
+            print(f"Restored {load_handoff(agent, handoff_path)} cache entries from previous server")
+        except (OSError, ValueError) as e:
+            print(f"Could not restore cache handoff: {e}")
+        finally:
+            if os.path.exists(handoff_path):
+                os.remove(handoff_path)
+    
+    # Keep the browser UI responsive while bulk API clients are busy
+    WebSearchHandler.set_admission(default_lanes(), api_key_lanes)
+    WebSearchHandler.set_profiling(admin_token, profile_dir)
+    # Later pages of a result set are served from memory
+    WebSearchHandler.set_result_store(ResultStore(ttl=page_ttl) if page_ttl > 0 else None)
+    WebSearchHandler.set_websockets(WebSocketHub(lambda: ChatSession(agent, WebSearchHandler.admission)))
+    suggestions = SuggestionIndex(is_cached=WebSearchHandler.is_cached)
+    WebSearchHandler.set_suggestions(suggestions)
+    if trace_file:
+        tracer.configure(JSONFileExporter(trace_file), trace_sample_rate)
+    
+    # Prefetch popular queries while the server starts accepting traffic
+    if warmup_log:
+        warmer = warmer_from_log(agent, warmup_log, warmup_top_n, concurrency=warmup_concurrency,
+                                 rate=warmup_rate, coverage=warmup_coverage,
+                                 num_results=WebSearchHandler.max_page_size)
+        WebSearchHandler.set_warmer(warmer)
+        warmer.start()
+        print(f"Warming cache with {len(warmer.queries)} queries from {warmup_log}")
+        suggestions.add_many(read_query_log(warmup_log))
+    
+    if pid_file:
+        with open(pid_file, 'w') as f:
+            f.write(f"{os.getpid()}\n")
+    notify_ready()
+    print(f"Web Search Agent server running on http://localhost:{httpd.server_port}")
     print("Press Ctrl+C to stop the server")
+    
+    def hand_over():
+        fd, path = tempfile.mkstemp(prefix='web-search-handoff-', suffix='.json')
+        os.close(fd)
+        save_handoff(agent, path)
+        successor = spawn_successor(httpd, sys.argv, path)
+        if successor is None:
+            os.remove(path)
+            print("Replacement server did not start; still serving")
+            return
+        print(f"Handed listening socket to process {successor.pid}, draining...")
+        httpd.shutdown()
+    
+    # SIGHUP starts a replacement process on the same socket, then this one drains and exits
+    if hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(target=hand_over, daemon=True).start())
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
         print("\nShutting down server...")
-        httpd.shutdown()
+    # Open WebSockets are told to reconnect, which a reload's new process will accept
+    WebSearchHandler.websockets.close()
+    if not httpd.drain(drain_timeout):
+        print("Gave up waiting for in-flight requests")
+    httpd.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Web Search Agent server")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--warmup-log', help="query log (JSONL or one query per line) to prefetch at startup")
+    parser.add_argument('--warmup-top-n', type=int, default=100, help="number of most popular queries to prefetch")
+    parser.add_argument('--warmup-concurrency', type=int, default=4)
+    parser.add_argument('--warmup-rate', type=float, default=5.0, help="maximum prefetches started per second")
+    parser.add_argument('--warmup-coverage', type=float, default=0.9,
+                        help="fraction of queries warmed before /ready reports ready")
+    parser.add_argument('--upstream-cache-ttl', type=float, default=300.0,
+                        help="seconds to cache upstream responses that carry no caching headers")
+    parser.add_argument('--api-key', action='append', default=[], metavar='KEY=LANE',
+                        help="route requests with this X-API-Key to a lane (interactive or bulk); repeatable")
+    parser.add_argument('--pid-file', help="write the server's process id here (used by start_server.sh reload)")
+    parser.add_argument('--drain-timeout', type=float, default=30.0,
+                        help="seconds to wait for in-flight requests when stopping or reloading")
+    parser.add_argument('--admin-token', default=os.environ.get('WEB_SEARCH_ADMIN_TOKEN'),
+                        help="enables /admin endpoints and per-request profiling (X-Profile header)")
+    parser.add_argument('--profile-dir', default='profiles', help="where per-request profiles are written")
+    parser.add_argument('--trace-file', help="append sampled request spans to this file as JSON lines")
+    parser.add_argument('--trace-sample-rate', type=float, default=0.01,
+                        help="fraction of traces sampled when the caller sends no traceparent")
+    parser.add_argument('--negative-ttl', type=float, default=60.0,
+                        help="seconds to remember queries with no results (0 disables)")
+    parser.add_argument('--negative-error-ttl', type=float, default=5.0,
+                        help="seconds to remember queries whose upstream request failed (0 disables)")
+    parser.add_argument('--page-ttl', type=float, default=120.0,
+                        help="seconds a result set is kept for fetching later pages with a cursor (0 disables)")
+    parser.add_argument('--remote-cache', metavar='HOST:PORT[,HOST:PORT...]',
+                        help="share search results between instances through these Redis-protocol cache nodes")
+    parser.add_argument('--remote-cache-ttl', type=float, default=300.0,
+                        help="seconds search results are kept in the remote cache")
+    parser.add_argument('--read-timeout', type=float, default=15.0,
+                        help="seconds a client has to send its whole request before getting 408")
+    parser.add_argument('--write-timeout', type=float, default=30.0,
+                        help="seconds a client has to accept each response before it is dropped")
+    parser.add_argument('--max-body-bytes', type=int, default=1 << 20,
+                        help="largest request body accepted; larger ones get 413")
+    args = parser.parse_args()
+    if any('=' not in item for item in args.api_key):
+        parser.error("--api-key takes KEY=LANE")
+    api_key_lanes = dict(item.split('=', 1) for item in args.api_key)
+    unknown = sorted(set(api_key_lanes.values()) - set(default_lanes().lanes))
+    if unknown:
+        parser.error(f"--api-key names unknown lanes: {', '.join(unknown)} (choose from {', '.join(default_lanes().lanes)})")
+    
+    run_server(args.port, warmup_log=args.warmup_log, warmup_top_n=args.warmup_top_n,
+               warmup_concurrency=args.warmup_concurrency, warmup_rate=args.warmup_rate,
+               warmup_coverage=args.warmup_coverage, upstream_cache_ttl=args.upstream_cache_ttl,
+               api_key_lanes=api_key_lanes, pid_file=args.pid_file, drain_timeout=args.drain_timeout,
+               admin_token=args.admin_token, profile_dir=args.profile_dir,
+               trace_file=args.trace_file, trace_sample_rate=args.trace_sample_rate,
+               negative_ttl=args.negative_ttl, negative_error_ttl=args.negative_error_ttl,
+               page_ttl=args.page_ttl,
+               remote_cache=args.remote_cache.split(',') if args.remote_cache else None,
+               remote_cache_ttl=args.remote_cache_ttl, read_timeout=args.read_timeout,
+               write_timeout=args.write_timeout, max_body_bytes=args.max_body_bytes)
 
 if __name__ == '__main__':
-    run_server()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,392 @@
+import base64
+import hashlib
+import json
+import selectors
+import socket
+import struct
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+
+GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+def accept_key(key: str) -> str:
+    """
+    Sec-WebSocket-Accept value for a client's Sec-WebSocket-Key (RFC 6455)
+    """
+    return base64.b64encode(hashlib.sha1((key + GUID).encode()).digest()).decode()
+
+
+def encode_frame(opcode: int, payload: bytes = b'') -> bytes:
+    """
+    A single unmasked, final frame as sent by a server
+    """
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def close_payload(code: int, reason: str = '') -> bytes:
+    return struct.pack('!H', code) + reason.encode()[:123]
+
+
+class ProtocolError(Exception):
+    """
+    A client broke the protocol; the connection is closed with code
+    """
+
+    def __init__(self, code: int, reason: str):
+        super().__init__(reason)
+        self.code = code
+        self.reason = reason
+
+
+class FrameParser:
+    """
+    Incremental parser for client frames
+
+    Bytes are fed as they arrive; complete messages come out as (opcode,
+    payload) with fragments joined. Control frames are returned as soon as
+    they are complete, even in the middle of a fragmented message.
+    """
+
+    def __init__(self, max_message_bytes: int = 65536):
+        self.max_message_bytes = max_message_bytes
+        self._buffer = bytearray()
+        self._opcode: Optional[int] = None
+        self._fragments: List[bytes] = []
+        self._size = 0
+
+    def feed(self, data: bytes) -> List[Tuple[int, bytes]]:
+        self._buffer += data
+        messages = []
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                return messages
+            message = self._assemble(*frame)
+            if message is not None:
+                messages.append(message)
+
+    def _next_frame(self) -> Optional[Tuple[bool, int, bytes]]:
+        buffer = self._buffer
+        if len(buffer) < 2:
+            return None
+        first, second = buffer[0], buffer[1]
+        if first & 0x70:
+            raise ProtocolError(1002, "reserved bits set")
+        if not second & 0x80:
+            raise ProtocolError(1002, "client frames must be masked")
+        length = second & 0x7F
+        offset = 2
+        if length == 126:
+            if len(buffer) < 4:
+                return None
+            length = struct.unpack_from('!H', buffer, 2)[0]
+            offset = 4
+        elif length == 127:
+            if len(buffer) < 10:
+                return None
+            length = struct.unpack_from('!Q', buffer, 2)[0]
+            offset = 10
+        if self._size + length > self.max_message_bytes:
+            raise ProtocolError(1009, "message too big")
+        if len(buffer) < offset + 4 + length:
+            return None
+
+        mask = bytes(buffer[offset:offset + 4])
+        start = offset + 4
+        payload = bytes(buffer[start:start + length])
+        del buffer[:start + length]
+        if length:
+            # XOR with the repeated mask as one big-int operation
+            key = (mask * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+        return bool(first & 0x80), first & 0x0F, payload
+
+    def _assemble(self, fin: bool, opcode: int, payload: bytes) -> Optional[Tuple[int, bytes]]:
+        if opcode >= OP_CLOSE:
+            if not fin or len(payload) > 125:
+                raise ProtocolError(1002, "invalid control frame")
+            return opcode, payload
+        if opcode == OP_CONTINUATION:
+            if self._opcode is None:
+                raise ProtocolError(1002, "unexpected continuation frame")
+        elif opcode in (OP_TEXT, OP_BINARY):
+            if self._opcode is not None:
+                raise ProtocolError(1002, "expected continuation frame")
+            self._opcode = opcode
+        else:
+            raise ProtocolError(1002, f"unknown opcode {opcode}")
+
+        self._fragments.append(payload)
+        self._size += len(payload)
+        if not fin:
+            return None
+        message = (self._opcode, b''.join(self._fragments))
+        self._opcode, self._fragments, self._size = None, [], 0
+        return message
+
+
+class Connection:
+    """
+    One upgraded WebSocket connection
+
+    Sends may come from any thread. Received text messages are queued and
+    handled one at a time, in order, by the hub's workers.
+    """
+
+    def __init__(self, sock: socket.socket, session, max_message_bytes: int):
+        self.sock = sock
+        self.session = session
+        self.parser = FrameParser(max_message_bytes)
+        self.pending: deque = deque()
+        self.pending_bytes = 0
+        self.busy = False
+        self.closed = False
+        self.pong: Optional[bytes] = None
+        self.ponging = False
+        self._send_lock = threading.Lock()
+
+    def send(self, opcode: int, payload: bytes = b''):
+        with self._send_lock:
+            if self.closed:
+                return
+            try:
+                self.sock.sendall(encode_frame(opcode, payload))
+            except OSError:
+                # Leave the socket to the hub, which drops it on the next read
+                self.closed = True
+
+    def send_text(self, text: str):
+        self.send(OP_TEXT, text.encode())
+
+    def send_json(self, data, default=None):
+        self.send_text(json.dumps(data, default=default))
+
+    def close(self, code: int = 1000, reason: str = ''):
+        self.send(OP_CLOSE, close_payload(code, reason))
+        self.closed = True
+
+
+class WebSocketHub:
+    """
+    Serves upgraded WebSocket connections without a thread per connection
+
+    A single selector thread waits on every connection and parses frames as
+    they arrive, so an idle connection costs a socket, a parser and its
+    session. Complete text messages are handed to the session's
+    on_message(connection, text) on a pool of worker threads; messages of
+    one connection are handled in order, never two at once. The thread and
+    pool start with the first connection. The selector thread never
+    writes: pongs and close frames are sent by the workers too, so a
+    client that stops reading cannot stall the other connections. A client
+    that sends faster than its messages are handled is closed with 1008
+    once it has more than max_pending_messages or max_pending_bytes queued.
+    """
+
+    def __init__(self, session_factory: Callable[[], object], workers: int = 8,
+                 max_message_bytes: int = 65536, send_timeout: float = 10.0,
+                 max_pending_messages: int = 16, max_pending_bytes: int = 256 * 1024):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.max_message_bytes = max_message_bytes
+        self.max_pending_messages = max_pending_messages
+        self.max_pending_bytes = max_pending_bytes
+        self.send_timeout = send_timeout
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._added: deque = deque()
+        self._selector = None
+        self._thread = None
+        self._pool = None
+        self._closing = False
+
+    def _start(self):
+        self._selector = selectors.DefaultSelector()
+        self._wakeup, self._wakeup_writer = socket.socketpair()
+        self._wakeup.setblocking(False)
+        self._selector.register(self._wakeup, selectors.EVENT_READ)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='websocket')
+        self._thread = threading.Thread(target=self._run, name='websocket-hub', daemon=True)
+        self._thread.start()
+
+    def add(self, sock: socket.socket) -> Connection:
+        """
+        Take over a socket that has completed the opening handshake
+        """
+        # Reads only happen once the selector reports data; sends may wait up to send_timeout
+        sock.settimeout(self.send_timeout)
+        connection = Connection(sock, self.session_factory(), self.max_message_bytes)
+        with self._lock:
+            if self._closing:
+                raise RuntimeError("WebSocket hub is closed")
+            if self._thread is None:
+                self._start()
+            self.connections.add(connection)
+            self._added.append(connection)
+        self._wakeup_writer.send(b'\0')
+        return connection
+
+    def _run(self):
+        while not self._closing:
+            for key, _ in self._selector.select():
+                if key.fileobj is self._wakeup:
+                    self._register_added()
+                else:
+                    self._read(key.data)
+
+    def _register_added(self):
+        try:
+            self._wakeup.recv(4096)
+        except BlockingIOError:
+            pass
+        with self._lock:
+            while self._added:
+                connection = self._added.popleft()
+                self._selector.register(connection.sock, selectors.EVENT_READ, connection)
+
+    def _read(self, connection: Connection):
+        try:
+            data = connection.sock.recv(65536)
+        except (BlockingIOError, InterruptedError, socket.timeout):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._drop(connection)
+            return
+
+        try:
+            messages = connection.parser.feed(data)
+        except ProtocolError as e:
+            self._close(connection, e.code, e.reason)
+            return
+        for opcode, payload in messages:
+            if opcode == OP_PING:
+                self._pong(connection, payload)
+            elif opcode == OP_CLOSE:
+                self._close(connection, struct.unpack('!H', payload[:2])[0] if len(payload) >= 2 else 1000)
+                return
+            elif opcode == OP_TEXT:
+                try:
+                    text = payload.decode()
+                except UnicodeDecodeError:
+                    self._close(connection, 1007, "invalid UTF-8")
+                    return
+                if not self._queue(connection, text):
+                    self._close(connection, 1008, "too many queued messages")
+                    return
+            elif opcode == OP_BINARY:
+                self._close(connection, 1003, "binary messages are not supported")
+                return
+
+    def _pong(self, connection: Connection, payload: bytes):
+        # Only the latest ping needs an answer (RFC 6455 5.5.3), so at most one pong is ever queued
+        with self._lock:
+            connection.pong = payload
+            if connection.ponging:
+                return
+            connection.ponging = True
+        self._pool.submit(self._send_pongs, connection)
+
+    def _send_pongs(self, connection: Connection):
+        while True:
+            with self._lock:
+                payload, connection.pong = connection.pong, None
+                if payload is None or connection.closed:
+                    connection.ponging = False
+                    return
+            connection.send(OP_PONG, payload)
+
+    def _close(self, connection: Connection, code: int, reason: str = ''):
+        # Stop reading now; the close frame is written by a worker
+        self._unregister(connection)
+        self._pool.submit(self._send_close, connection, code, reason)
+
+    @staticmethod
+    def _send_close(connection: Connection, code: int, reason: str):
+        connection.close(code, reason)
+        connection.sock.close()
+
+    def _queue(self, connection: Connection, text: str) -> bool:
+        with self._lock:
+            if (len(connection.pending) >= self.max_pending_messages
+                    or connection.pending_bytes + len(text) > self.max_pending_bytes):
+                return False
+            connection.pending.append(text)
+            connection.pending_bytes += len(text)
+            if connection.busy:
+                return True
+            connection.busy = True
+        self._pool.submit(self._work, connection)
+        return True
+
+    def _work(self, connection: Connection):
+        while True:
+            with self._lock:
+                if not connection.pending or connection.closed:
+                    connection.pending.clear()
+                    connection.pending_bytes = 0
+                    connection.busy = False
+                    return
+                text = connection.pending.popleft()
+                connection.pending_bytes -= len(text)
+            try:
+                connection.session.on_message(connection, text)
+            except Exception as e:
+                connection.send_json({'type': 'error', 'error': str(e)})
+
+    def _unregister(self, connection: Connection):
+        try:
+            self._selector.unregister(connection.sock)
+        except (KeyError, ValueError):
+            pass
+        with self._lock:
+            self.connections.discard(connection)
+
+    def _drop(self, connection: Connection):
+        connection.closed = True
+        self._unregister(connection)
+        connection.sock.close()
+
+    def status(self) -> dict:
+        with self._lock:
+            return {'connections': len(self.connections),
+                    'busy': sum(1 for connection in self.connections if connection.busy)}
+
+    def close(self, timeout: float = 5.0):
+        """
+        Send every connection a going-away close frame and stop the hub
+        """
+        with self._lock:
+            if self._closing:
+                return
+            self._closing = True
+            started = self._thread is not None
+        if not started:
+            return
+        self._wakeup_writer.send(b'\0')
+        self._thread.join(timeout)
+        for connection in list(self.connections):
+            connection.close(1001, "server shutting down")
+            self._drop(connection)
+        self._pool.shutdown(wait=False)
+        self._selector.close()
+        self._wakeup.close()
+        self._wakeup_writer.close()